@@ -48,9 +48,10 @@ export default function Chatbot({ onBack }: { onBack: () => void }) {
     setInputText("");
     setIsLoading(true);
 
-    // Simulate API call to backend chatbot
+    // Stream the reply from the backend chatbot (Server-Sent Events)
+    const assistantId = (Date.now() + 1).toString();
     try {
-      const response = await fetch("http://machine-virat.eastus2.cloudapp.azure.com:5000/chat", {
+      const response = await fetch("http://machine-virat.eastus2.cloudapp.azure.com:5000/chat/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -61,22 +62,45 @@ export default function Chatbot({ onBack }: { onBack: () => void }) {
         }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        const assistantMessage: Message = {
-          id: (Date.now() + 1).toString(),
-          text: data.response || "I'm sorry, I couldn't process your request. Please try again.",
-          sender: "assistant",
-          timestamp: new Date(),
-        };
-        setMessages(prev => [...prev, assistantMessage]);
-      } else {
+      if (!response.ok || !response.body) {
         throw new Error("Failed to get response");
       }
+
+      // The assistant bubble is created on the first chunk and grows as chunks arrive
+      const appendText = (delta: string) =>
+        setMessages(prev =>
+          prev.some(m => m.id === assistantId)
+            ? prev.map(m => (m.id === assistantId ? { ...m, text: m.text + delta } : m))
+            : [...prev, { id: assistantId, text: delta, sender: "assistant", timestamp: new Date() }]
+        );
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let received = false;
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() || "";
+        for (const evt of events) {
+          const dataLine = evt.split("\n").find(line => line.startsWith("data: "));
+          if (!dataLine || evt.startsWith("event: done")) continue;
+          const payload = JSON.parse(dataLine.slice(6));
+          if (payload.delta) {
+            received = true;
+            appendText(payload.delta);
+          }
+        }
+      }
+      if (!received) {
+        appendText("I'm sorry, I couldn't process your request. Please try again.");
+      }
     } catch (error) {
       console.error("Chat error:", error);
       const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: (Date.now() + 2).toString(),
         text: "I'm having trouble connecting right now. Please try again later or contact our support team.",
         sender: "assistant",
         timestamp: new Date(),
@@ -0,0 +1,220 @@
+from __future__ import annotations
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from loan_calculator import _D, _cents, _half_up_cents, _q2
+from lease_calculator import _residual_rate_for_term
+
+# Terms the profile form offers (customer_finance_inputs CHECK constraints)
+LOAN_TERMS = (36, 48, 60, 72, 84)
+LEASE_TERMS = (24, 36, 48, 60)
+MAX_AFFORDABILITY_QUOTES = 10_000   # budgets x terms per request
+MAX_MONTHLY_BUDGET = 1_000_000      # USD; keeps every amount exact in float64 / int64 cents
+MAX_TERM_MONTHS = 120
+_MAX_CENTS = 2 ** 53                # largest amount (cents) the vectorized search handles exactly
+_MAX_WIDENINGS = 64
+
+
+# ---------- Search ----------
+#
+# Payments are linear in the vehicle amount up to cent rounding, so the
+# closed-form inverse lands within a few payment-cents of the answer. The
+# exact maximum is then found by bisecting a small bracket around it with the
+# calculators' own rounding (vectorized, integer cents); payments never
+# decrease as the amount grows, so the bracket holds exactly one boundary.
+
+def _max_amount(
+    payment: Callable[[np.ndarray], np.ndarray],
+    budget: np.ndarray,
+    estimate: np.ndarray,
+    slope: np.ndarray,
+    floor: np.ndarray,
+) -> np.ndarray:
+    """Largest amount (cents, >= floor) with payment(amount) <= budget, -1 where even `floor` is over."""
+    if not np.isfinite(estimate).all() or (np.abs(estimate) + floor >= _MAX_CENTS).any():
+        raise ValueError("vehicle amount out of range; lower the budget or down payment")
+    slack = np.ceil(4 / slope).astype(np.int64) + 2   # amount-cents per 4 payment-cents
+    lo = np.maximum(np.floor(estimate).astype(np.int64) - slack, floor)
+    hi = lo + 2 * slack
+    affordable = payment(floor) <= budget
+    # Widen the bracket where the estimate missed (never expected; keeps the search
+    # exact). Capped, so inputs the estimate cannot handle fail instead of spinning.
+    for _ in range(_MAX_WIDENINGS):
+        low_over = affordable & (payment(lo) > budget)
+        if not low_over.any():
+            break
+        lo = np.where(low_over, np.maximum(floor, lo - 4 * slack), lo)
+    else:
+        raise ValueError("affordability search did not converge")
+    for _ in range(_MAX_WIDENINGS):
+        high_under = payment(hi) <= budget
+        if not high_under.any():
+            break
+        lo = np.where(high_under, hi, lo)
+        hi = np.where(high_under, hi + 4 * slack, hi)
+        if (hi >= _MAX_CENTS).any():
+            raise ValueError("vehicle amount out of range; lower the budget or down payment")
+    else:
+        raise ValueError("affordability search did not converge")
+
+    while (hi - lo > 1).any():
+        mid = (lo + hi) // 2
+        ok = payment(mid) <= budget
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+    return np.where(affordable, lo, -1)
+
+
+def _grid(monthly_budgets: Sequence[float | Decimal], term_months: Sequence[int]):
+    """Every (budget, term) pair, budget-major, as cents / int arrays"""
+    if not monthly_budgets:
+        raise ValueError("at least one monthly budget is required")
+    if not term_months:
+        raise ValueError("at least one term is required")
+    size = len(monthly_budgets) * len(term_months)
+    if size > MAX_AFFORDABILITY_QUOTES:
+        raise ValueError(f"budgets x terms is {size}; at most {MAX_AFFORDABILITY_QUOTES} per request")
+    terms = [int(n) for n in term_months]
+    if any(not 1 <= n <= MAX_TERM_MONTHS for n in terms):
+        raise ValueError(f"term_months must be between 1 and {MAX_TERM_MONTHS}")
+    budgets = [_cents(_q2(_D(b))) for b in monthly_budgets]
+    if any(not 0 <= b <= MAX_MONTHLY_BUDGET * 100 for b in budgets):
+        raise ValueError(f"monthly budgets must be between 0 and {MAX_MONTHLY_BUDGET}")
+    budget = np.repeat(np.array(budgets, dtype=np.int64), len(terms))
+    n = np.tile(np.array(terms, dtype=np.int64), len(budgets))
+    return budgets, terms, budget, n
+
+
+def _rows(budgets: List[int], terms: List[int], per_term: Callable[[int], Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "monthly_budget": b / 100,
+            "terms": [{"term_months": n, **per_term(k * len(terms) + t)} for t, n in enumerate(terms)],
+        }
+        for k, b in enumerate(budgets)
+    ]
+
+
+# ---------- Loan ----------
+
+def loan_affordability(
+    *,
+    monthly_budgets: Sequence[float | Decimal],
+    term_months: Sequence[int] = LOAN_TERMS,
+    apr_percent: float | Decimal,
+    down_payment_cash: float | Decimal = 0,
+    tax_rate: float | Decimal = 0.0825,
+) -> List[Dict[str, Any]]:
+    """
+    Most expensive vehicle whose /loan/Calculator monthly_payment_total (tax
+    included) fits each budget, for every term.
+
+    Returns one row per budget, in order:
+      { monthly_budget, terms: [{ term_months, max_vehicle_amount,
+        amount_financed, monthly_payment_total }] }
+    Pricing `max_vehicle_amount` with /loan/Calculator gives exactly
+    `monthly_payment_total`; one cent more goes over the budget.
+    """
+    budgets, terms, budget, n = _grid(monthly_budgets, term_months)
+    dp = _cents(_q2(_D(down_payment_cash)))
+    rate = _D(apr_percent) / Decimal(100) / Decimal(12)
+    tax = _D(tax_rate)
+    i = float(rate)
+
+    def payment(amount: np.ndarray) -> np.ndarray:
+        financed = np.maximum(amount - dp, 0)
+
+        def _exact_payment(k: int) -> int:
+            fin, m = Decimal(int(financed[k])) / 100, int(n[k])
+            if rate == 0:
+                return _cents(_q2(fin / Decimal(m)))
+            return _cents(_q2(rate * fin / (Decimal(1) - (Decimal(1) + rate) ** (Decimal(-m)))))
+
+        if rate == 0:
+            raw = financed / n
+        else:
+            raw = i * financed / -np.expm1(-n * np.log1p(i))
+        base = _half_up_cents(raw, _exact_payment)
+        monthly_tax = _half_up_cents(base * float(tax), lambda k: _cents(_q2(Decimal(int(base[k])) / 100 * tax)))
+        return base + monthly_tax
+
+    # payment ~ financed * k * (1 + tax), k = i / (1 - (1 + i)^-n)
+    k = 1 / n if rate == 0 else i / -np.expm1(-n * np.log1p(i))
+    slope = k * (1 + float(tax))
+    amount = _max_amount(payment, budget, dp + budget / slope, slope, np.full_like(budget, dp))
+    paid = payment(np.maximum(amount, 0)).tolist()
+    amount_l = amount.tolist()
+
+    return _rows(budgets, terms, lambda j: {
+        "max_vehicle_amount": amount_l[j] / 100,
+        "amount_financed": max(amount_l[j] - dp, 0) / 100,
+        "monthly_payment_total": paid[j] / 100,
+    })
+
+
+# ---------- Lease ----------
+
+def _round_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """num / den rounded half away from zero (Decimal ROUND_HALF_UP), integers"""
+    return np.sign(num) * ((2 * np.abs(num) + den) // (2 * den))
+
+
+def lease_affordability(
+    *,
+    monthly_budgets: Sequence[float | Decimal],
+    term_months: Sequence[int] = LEASE_TERMS,
+    money_factor: float | Decimal = 0.00190,
+    acquisition_fee: float | Decimal = 695.00,
+    down_payment: float | Decimal = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Most expensive vehicle whose /lease/calculator monthly_payment_total fits
+    each budget, for every term.
+
+    The residual rate depends on the term (anchors, interpolation and clamps
+    of _residual_rate_for_term), so each term is inverted with its own rate.
+    `down_payment` is a cap cost reduction: the same payment as
+    /lease/calculator with acquisition_fee lowered by it.
+
+    Returns one row per budget, in order:
+      { monthly_budget, terms: [{ term_months, max_vehicle_amount,
+        residual_value, monthly_payment_total }] }
+    max_vehicle_amount is null when the fee alone exceeds the budget.
+    """
+    budgets, terms, budget, n = _grid(monthly_budgets, term_months)
+    mf = _D(money_factor)
+    down = _cents(_q2(_D(down_payment)))
+    fees = _cents(_q2(_D(acquisition_fee))) - down
+    rates = {t: _residual_rate_for_term(t) for t in terms}
+    resid = [rates[t] for t in n.tolist()]
+    r = np.array([float(x) for x in resid])
+
+    def residual(amount: np.ndarray) -> np.ndarray:
+        return _half_up_cents(amount * r, lambda k: _cents(_q2(Decimal(int(amount[k])) / 100 * resid[k])))
+
+    def payment(amount: np.ndarray) -> np.ndarray:
+        adj_cap = amount + fees
+        res = residual(amount)
+        depreciation = _round_div(adj_cap - res, n)
+        base = adj_cap + res
+        finance = _half_up_cents(base * float(mf), lambda k: _cents(_q2(Decimal(int(base[k])) / 100 * mf)))
+        return depreciation + finance
+
+    # payment ~ amount * ((1 - r) / n + (1 + r) * mf) + fees * (1 / n + mf)
+    slope = (1 - r) / n + (1 + r) * float(mf)
+    estimate = (budget - fees * (1 / n + float(mf))) / slope
+    # A cap cost reduction cannot exceed the vehicle price
+    floor = np.full_like(budget, down)
+    amount = _max_amount(payment, budget, np.maximum(estimate, 0), slope, floor)
+    found = amount >= 0
+    priced = np.where(found, amount, floor)
+    paid, res = payment(priced).tolist(), residual(priced).tolist()
+    amount_l, found_l = amount.tolist(), found.tolist()
+
+    return _rows(budgets, terms, lambda j: {
+        "max_vehicle_amount": amount_l[j] / 100 if found_l[j] else None,
+        "residual_value": res[j] / 100 if found_l[j] else None,
+        "monthly_payment_total": paid[j] / 100 if found_l[j] else None,
+    })
@@ -0,0 +1,131 @@
+"""
+Cost of the calculator builders behind /loan/Calculator, /lease/calculator
+and /getInterest across term and vehicle-price grids, of the affordability
+solvers over a sweep of budgets, and of ranking recommendations for a
+nightly-sized batch of synthetic profiles.
+
+asv picks up the time_* methods (parameterized over the grids); for a quick
+report run from backend/:
+
+    python -m benchmarks.bench_calculators
+"""
+
+import random
+import time
+import timeit
+
+from affordability_calculator import lease_affordability, loan_affordability
+from credit_score_calculator import apr_percent_from_credit_score
+from lease_calculator import build_lease_chartjs_data_no_tax
+from loan_calculator import LOAN_ENGINES, build_loan_chartjs_data
+from rate_card import get_rate_cards
+from recommender import get_catalog, profiles_from_rows, recommend
+
+TERMS = [24, 36, 48, 60, 72, 84]
+VEHICLE_AMOUNTS = [18500.0, 32999.99, 64000.0]
+CREDIT_SCORES = list(range(300, 851))
+PROFILE_COUNTS = [1_000, 100_000]
+BUDGETS = [float(b) for b in range(250, 2250)]
+
+
+def synthetic_profiles(count: int, seed: int = 7):
+    """Profiles spread over the customer_finance_inputs value ranges"""
+    rnd = random.Random(seed)
+    return profiles_from_rows([
+        (
+            f"p{k}",
+            rnd.randint(300, 850),
+            rnd.choice((0, 1500, 2500, 5000, 10000)),
+            rnd.randrange(250, 1200),
+            rnd.choice((36, 48, 60, 72, 84, None)),
+            rnd.choice((24, 36, 48, 60, None)),
+            rnd.choice(("sedan", "suv", "truck", "minivan", "hatchback", "coupe", None)),
+            rnd.choice(("gas", "hybrid", "electric", None)),
+        )
+        for k in range(count)
+    ])
+
+
+class LoanSuite:
+    params = (TERMS, VEHICLE_AMOUNTS, list(LOAN_ENGINES))
+    param_names = ["term_months", "vehicle_amount", "engine"]
+
+    def time_build_loan(self, term_months, vehicle_amount, engine):
+        build_loan_chartjs_data(
+            vehicle_amount=vehicle_amount,
+            down_payment_cash=2500,
+            term_months=term_months,
+            apr_percent=6.49,
+            engine=engine,
+        )
+
+
+class LeaseSuite:
+    params = (TERMS, VEHICLE_AMOUNTS)
+    param_names = ["term_months", "vehicle_amount"]
+
+    def time_build_lease(self, term_months, vehicle_amount):
+        build_lease_chartjs_data_no_tax(vehicle_amount=vehicle_amount, term_months=term_months)
+
+
+class CreditScoreSuite:
+    def time_apr_full_range(self):
+        for score in CREDIT_SCORES:
+            apr_percent_from_credit_score(score)
+
+
+class AffordabilitySuite:
+    def time_loan_affordability(self):
+        loan_affordability(monthly_budgets=BUDGETS, apr_percent=6.49, down_payment_cash=2500)
+
+    def time_lease_affordability(self):
+        lease_affordability(monthly_budgets=BUDGETS)
+
+
+class RecommenderSuite:
+    params = PROFILE_COUNTS
+    param_names = ["profiles"]
+    timeout = 300
+
+    def setup(self, profiles):
+        self.profiles = synthetic_profiles(profiles)
+        get_catalog()
+
+    def time_recommend(self, profiles):
+        recommend(self.profiles)
+
+
+def main() -> None:
+    rounds = 50
+    print(f"{'builder':<14} {'engine':<8} {'term':>4} {'vehicle':>10} {'us/call':>10}")
+    for term in TERMS:
+        for amount in VEHICLE_AMOUNTS:
+            for engine in LOAN_ENGINES:
+                best = min(timeit.repeat(
+                    lambda: build_loan_chartjs_data(vehicle_amount=amount, down_payment_cash=2500,
+                                                    term_months=term, apr_percent=6.49, engine=engine),
+                    number=rounds, repeat=5))
+                print(f"{'loan':<14} {engine:<8} {term:>4} {amount:>10.2f} {best / rounds * 1e6:10.1f}")
+            best = min(timeit.repeat(
+                lambda: build_lease_chartjs_data_no_tax(vehicle_amount=amount, term_months=term),
+                number=rounds, repeat=5))
+            print(f"{'lease':<14} {'-':<8} {term:>4} {amount:>10.2f} {best / rounds * 1e6:10.1f}")
+    best = min(timeit.repeat(lambda: [apr_percent_from_credit_score(s) for s in CREDIT_SCORES], number=rounds, repeat=5))
+    print(f"apr_percent_from_credit_score {best / rounds / len(CREDIT_SCORES) * 1e9:.0f} ns/score")
+    applicants = CREDIT_SCORES * 18   # ~10k, one /getInterest/batch request
+    cards = get_rate_cards()
+    best = min(timeit.repeat(lambda: cards.lookup_many(applicants, [60] * len(applicants)), number=rounds, repeat=5))
+    print(f"rate card lookup_many {len(applicants)} applicants: {best / rounds * 1e3:.2f} ms")
+    best = min(timeit.repeat(lambda: loan_affordability(monthly_budgets=BUDGETS, apr_percent=6.49), number=5, repeat=3))
+    print(f"loan_affordability {len(BUDGETS)} budgets x 5 terms: {best / 5 * 1e3:.1f} ms")
+    best = min(timeit.repeat(lambda: lease_affordability(monthly_budgets=BUDGETS), number=5, repeat=3))
+    print(f"lease_affordability {len(BUDGETS)} budgets x 4 terms: {best / 5 * 1e3:.1f} ms")
+    for count in PROFILE_COUNTS:
+        profiles = synthetic_profiles(count)
+        start = time.perf_counter()
+        recommend(profiles)
+        print(f"recommend {count} profiles x {len(get_catalog())} vehicles: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
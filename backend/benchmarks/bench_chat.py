@@ -0,0 +1,84 @@
+"""
+Per-turn cost of the chat pipeline with the mock provider (no network):
+the canned fallback reply, a chatbot.chat() turn, and POST /chat end to end
+through FastAPI (routing, validation, history, JSON) via the test client.
+
+asv picks up the time_* methods; for a quick report run from backend/:
+
+    python -m benchmarks.bench_chat
+"""
+
+import itertools
+import os
+import statistics
+import time
+
+from benchmarks.bench_fallback import load_corpus
+
+_MOCK_ENV = {
+    "CHATBOT_PROVIDER": "mock",
+    "CHATBOT_FALLBACK_PROVIDERS": "",
+    "CHATBOT_HISTORY_BACKEND": "memory",
+    "CHATBOT_RESPONSE_CACHE": "false",
+}
+
+
+def mock_chatbot():
+    """A fresh chatbot on the mock provider, installed as the process-wide instance"""
+    os.environ.update(_MOCK_ENV)
+    import chatbot
+
+    chatbot.chatbot = chatbot.ToyotaFinanceChatbot()
+    return chatbot.chatbot
+
+
+class ChatSuite:
+    def setup(self):
+        from fastapi.testclient import TestClient
+
+        import main
+
+        self.corpus = load_corpus()
+        self.bot = mock_chatbot()
+        self.client = TestClient(main.app)
+        self.turns = itertools.cycle(enumerate(self.corpus))
+
+    def teardown(self):
+        self.client.close()
+
+    def time_fallback_response(self):
+        for message in self.corpus:
+            self.bot._get_fallback_response(message)
+
+    def time_chat_turn(self):
+        i, message = next(self.turns)
+        self.bot.chat(f"bench-{i % 50}", message)
+
+    def time_chat_endpoint(self):
+        i, message = next(self.turns)
+        self.client.post("/chat", json={"user_id": f"bench-{i % 50}", "message": message})
+
+
+def main() -> None:
+    suite = ChatSuite()
+    suite.setup()
+    try:
+        for name, fn, rounds in (
+            ("fallback response (corpus)", suite.time_fallback_response, 200),
+            ("chatbot.chat() turn", suite.time_chat_turn, 2000),
+            ("POST /chat", suite.time_chat_endpoint, 1000),
+        ):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            p99 = samples[int(0.99 * (len(samples) - 1))]
+            print(f"{name:<28} p50 {statistics.median(samples) * 1e6:9.1f} us   p99 {p99 * 1e6:9.1f} us")
+    finally:
+        suite.teardown()
+
+
+if __name__ == "__main__":
+    main()
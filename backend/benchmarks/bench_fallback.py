@@ -0,0 +1,62 @@
+"""
+Per-message cost of the fallback intent matcher (fallback_responder).
+
+asv picks up the time_* methods; for a quick report run from backend/:
+
+    python -m benchmarks.bench_fallback
+"""
+
+import timeit
+from pathlib import Path
+from typing import List
+
+from fallback_responder import INTENTS, fallback_responder
+
+CORPUS_PATH = Path(__file__).parent / "data" / "chat_corpus.txt"
+
+
+def load_corpus() -> List[str]:
+    return [line.strip() for line in CORPUS_PATH.read_text().splitlines() if line.strip()]
+
+
+def legacy_respond(message: str) -> str:
+    """The substring scan _get_fallback_response used before the compiled matcher"""
+    message_lower = message.lower()
+    for _, keywords, reply in INTENTS:
+        if any(word in message_lower for word in keywords):
+            return reply
+    return ""
+
+
+class FallbackResponderSuite:
+    def setup(self):
+        self.corpus = load_corpus()
+
+    def time_respond(self):
+        for message in self.corpus:
+            fallback_responder.respond(message)
+
+    def time_classify(self):
+        for message in self.corpus:
+            fallback_responder.classify(message)
+
+    def time_legacy_substring_scan(self):
+        for message in self.corpus:
+            legacy_respond(message)
+
+
+def main() -> None:
+    corpus = load_corpus()
+    rounds = 200
+    print(f"corpus: {len(corpus)} messages from {CORPUS_PATH.name}")
+    for name, fn in (
+        ("compiled respond", fallback_responder.respond),
+        ("compiled classify", fallback_responder.classify),
+        ("legacy substring scan", legacy_respond),
+    ):
+        best = min(timeit.repeat(lambda: [fn(m) for m in corpus], number=rounds, repeat=5))
+        print(f"{name:<24} {best / rounds / len(corpus) * 1e6:8.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+HTTP load profile for the API: concurrent clients replay a weighted mix of
+chat and calculator requests and report p50/p90/p99 latency per endpoint.
+
+By default the app is served in-process by uvicorn with its LLM provider
+pointed at the local stub (benchmarks.stub_llm), so a run measures this
+server's own overhead on top of a fixed provider latency. Pass --url to
+load an already running deployment instead.
+
+    python -m benchmarks.load_profile --concurrency 32 --duration 20
+    python -m benchmarks.load_profile --max-p99-ms chat=400 --max-p99-ms loan=50
+
+With --max-p99-ms the run exits non-zero when an endpoint's p99 is over
+budget, so it can gate a deploy.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench_fallback import load_corpus
+from benchmarks.stub_llm import start_stub_llm
+
+# name -> (weight, path, body factory)
+Scenario = Tuple[int, str, Callable[[random.Random], Dict[str, Any]]]
+
+
+def _scenarios(corpus: List[str]) -> Dict[str, Scenario]:
+    return {
+        "chat": (4, "/chat", lambda rng: {
+            "user_id": f"load-{rng.randrange(200)}", "message": rng.choice(corpus)}),
+        "loan": (3, "/loan/Calculator", lambda rng: {
+            "vehicle_amount": rng.choice([24500, 28999.99, 33500, 41250]),
+            "down_payment_cash": rng.choice([0, 2000, 5000]),
+            "term_months": rng.choice([36, 48, 60, 72]),
+            "apr_percent": rng.choice([3.9, 5.9, 7.9])}),
+        "lease": (2, "/lease/calculator", lambda rng: {
+            "vehicle_amount": rng.choice([24500, 28999.99, 33500, 41250]),
+            "term_months": rng.choice([24, 36, 48])}),
+        "interest": (1, "/getInterest", lambda rng: {"credit_score": rng.randint(300, 850)}),
+        "compare": (1, "/compare", lambda rng: {
+            "vehicle_amount": rng.choice([28999.99, 33500]), "term_months": 36, "apr_percent": 4.5}),
+    }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_app(llm_latency: float, llm_jitter: float) -> Tuple[str, Callable[[], None]]:
+    """Start the stub LLM and main.app under uvicorn; returns (base url, stop)"""
+    import uvicorn
+
+    stub = start_stub_llm(latency=llm_latency, jitter=llm_jitter)
+    os.environ.update({
+        "CHATBOT_PROVIDER": "openai",
+        "CHATBOT_FALLBACK_PROVIDERS": "",
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}/v1",
+        "LLM_HTTP2": "false",  # the stub speaks HTTP/1.1 only
+    })
+    import main
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+
+    def stop() -> None:
+        server.should_exit = True
+        thread.join(timeout=10)
+        stub.shutdown()
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+async def run_load(
+    base_url: str,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    only: Optional[List[str]] = None,
+    seed: int = 0,
+) -> Dict[str, Dict[str, Any]]:
+    """Drive `concurrency` clients for warmup + duration seconds; per-endpoint stats for the measured part"""
+    scenarios = _scenarios(load_corpus())
+    if only:
+        scenarios = {name: scenarios[name] for name in only}
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+
+    measure_from = time.monotonic() + warmup
+    deadline = measure_from + duration
+
+    async def client_loop(client: httpx.AsyncClient, rng: random.Random) -> None:
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            _, path, body = scenarios[name]
+            start = time.monotonic()
+            try:
+                response = await client.post(path, json=body(rng))
+                # /chat reports provider failures in a 200 body
+                failed = response.status_code >= 400 or (name == "chat" and response.json().get("provider") == "error")
+            except httpx.HTTPError:
+                failed = True
+            if start >= measure_from:
+                samples[name].append(time.monotonic() - start)
+                errors[name] += failed
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(client_loop(client, random.Random(seed + i)) for i in range(concurrency)))
+
+    report = {}
+    for name in names:
+        ordered = sorted(samples[name])
+        if not ordered:
+            continue
+        report[name] = {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / duration, 1),
+            "errors": errors[name],
+            "p50_ms": round(_percentile(ordered, 0.50) * 1e3, 2),
+            "p90_ms": round(_percentile(ordered, 0.90) * 1e3, 2),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1e3, 2),
+            "max_ms": round(ordered[-1] * 1e3, 2),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP load profile for the Toyota Finance API")
+    parser.add_argument("--url", help="base URL of a running server (default: serve main.app in-process)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds first")
+    parser.add_argument("--llm-latency", type=float, default=0.25, help="stub provider latency (in-process only)")
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--only", action="append", help="restrict to an endpoint (chat, loan, lease, interest, compare)")
+    parser.add_argument("--max-p99-ms", action="append", default=[], metavar="ENDPOINT=MS",
+                        help="fail the run when ENDPOINT's p99 exceeds MS")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    budgets = {}
+    for item in args.max_p99_ms:
+        name, _, ms = item.partition("=")
+        budgets[name] = float(ms)
+
+    stop = None
+    base_url = args.url
+    if base_url is None:
+        base_url, stop = serve_app(args.llm_latency, args.llm_jitter)
+    try:
+        report = asyncio.run(run_load(base_url, args.concurrency, args.duration, args.warmup, args.only))
+    finally:
+        if stop is not None:
+            stop()
+
+    print(f"{args.concurrency} clients, {args.duration:.0f}s against {base_url}")
+    print(f"{'endpoint':<10} {'requests':>8} {'rps':>8} {'errors':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, row in report.items():
+        print(f"{name:<10} {row['requests']:>8} {row['rps']:>8} {row['errors']:>6} "
+              f"{row['p50_ms']:>8} {row['p90_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    over = [f"{name} p99 {report[name]['p99_ms']}ms > {ms}ms"
+            for name, ms in budgets.items() if name in report and report[name]["p99_ms"] > ms]
+    failed = [f"{name}: {row['errors']} errors" for name, row in report.items() if row["errors"]]
+    for line in over + failed:
+        print(f"FAIL {line}")
+    sys.exit(1 if over or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
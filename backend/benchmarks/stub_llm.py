@@ -0,0 +1,142 @@
+"""
+Local stand-in for the OpenAI and Anthropic HTTP APIs, for load tests.
+
+Answers /v1/chat/completions and /v1/messages (plain and streaming) with a
+fixed reply after a configurable latency, so the server's own overhead can
+be measured without network calls or API spend. Point the chatbot at it
+with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 (or ANTHROPIC_BASE_URL
+without the /v1) and any non-empty API key.
+
+    python -m benchmarks.stub_llm --port 8765 --latency 0.25 --jitter 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Tuple
+
+REPLY = (
+    "The 2025 Toyota Camry Hybrid is a great fit. With $3,000 down over 60 months "
+    "at 5.9% APR your payment is about $540 per month."
+)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    latency = 0.05
+    jitter = 0.0
+    chunks = 8
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.path.endswith("/chat/completions"):
+            if body.get("stream"):
+                self._stream((None, json.dumps(self._openai_chunk(piece))) for piece in self._pieces())
+                return
+            self._json(self._openai_completion(body))
+        elif self.path.endswith("/messages"):
+            if body.get("stream"):
+                self._stream(self._anthropic_events(body))
+                return
+            self._json(self._anthropic_message(body))
+        else:
+            self.send_error(404)
+
+    def _pieces(self) -> Iterable[str]:
+        size = max(1, len(REPLY) // self.chunks)
+        return (REPLY[i:i + size] for i in range(0, len(REPLY), size))
+
+    @staticmethod
+    def _openai_completion(body) -> dict:
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @staticmethod
+    def _openai_chunk(piece: str) -> dict:
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": "stub",
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+
+    @staticmethod
+    def _anthropic_message(body) -> dict:
+        return {
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": REPLY}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 0, "output_tokens": 0},
+        }
+
+    def _anthropic_events(self, body) -> Iterable[Tuple[str, str]]:
+        message = dict(self._anthropic_message(body), content=[], stop_reason=None)
+        yield "message_start", json.dumps({"type": "message_start", "message": message})
+        yield "content_block_start", json.dumps(
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for piece in self._pieces():
+            yield "content_block_delta", json.dumps(
+                {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+        yield "content_block_stop", json.dumps({"type": "content_block_stop", "index": 0})
+        yield "message_delta", json.dumps({"type": "message_delta", "delta": {"stop_reason": "end_turn",
+                                           "stop_sequence": None}, "usage": {"output_tokens": 0}})
+        yield "message_stop", json.dumps({"type": "message_stop"})
+
+    def _json(self, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, events: Iterable[Tuple[str, str]]) -> None:
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        for event, data in events:
+            self._chunk((f"event: {event}\n" if event else "") + f"data: {data}\n\n")
+        if self.path.endswith("/chat/completions"):
+            self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+    def _chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub_llm(port: int = 0, latency: float = 0.05, jitter: float = 0.0) -> ThreadingHTTPServer:
+    """Serve the stub on 127.0.0.1:`port` (0 = any free port) from a daemon thread"""
+    handler = type("StubLLM", (StubLLMHandler,), {"latency": latency, "jitter": jitter})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of uniform noise on the latency")
+    args = parser.parse_args()
+    server = start_stub_llm(args.port, args.latency, args.jitter)
+    print(f"stub LLM on http://127.0.0.1:{server.server_address[1]}/v1 (latency {args.latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
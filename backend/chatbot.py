@@ -4,15 +4,90 @@ Supports multiple LLM providers via environment variables
 """
 
 import os
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator
 from datetime import datetime
 import json
+import hashlib
+
+from fallback_responder import fallback_responder
+import llm_transport
+from context_builder import ContextBuilder, create_context_builder
+from history_store import HistoryStore, create_history_store
+from turn_coordinator import TurnAbandoned, TurnCoordinator
+from provider_router import NoProviderAvailable, ProviderRouter, create_provider_router
+from response_cache import CachedResponse, ResponseCache, create_response_cache
+from context_builder import count_tokens
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Env vars that identify a provider client; a change yields a new shared client
+_PROVIDER_ENV = {
+    "openai": ("OPENAI_API_KEY", "OPENAI_BASE_URL"),
+    "azure": ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_DEPLOYMENT", "AZURE_OPENAI_API_VERSION"),
+    "anthropic": ("ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL"),
+    "google": ("GOOGLE_API_KEY",),
+}
+
+# Models for fallback providers when <PROVIDER>_MODEL is not set
+_DEFAULT_MODELS = {
+    "openai": "gpt-3.5-turbo",
+    "azure": "gpt-3.5-turbo",
+    "anthropic": "claude-3-sonnet-20240229",
+    "google": "gemini-pro",
+}
+
+# Provider clients are created on first use and shared by every chatbot in the process
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.RLock()  # re-entrant: a factory may need another shared client
+_env_loaded = False
+
+
+def _load_env() -> None:
+    """Load the .env file once per process"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass  # dotenv not available, use system env vars
+    _env_loaded = True
+
+
+class _FallbackReply(str):
+    """Canned reply used in place of a provider answer; never written to the response cache"""
+
+
+class _ProviderReply(str):
+    """Provider answer tagged with who produced it (not the configured provider after failover)"""
+
+    def __new__(cls, text: str, provider: str, model: str):
+        reply = super().__new__(cls, text)
+        reply.provider = provider
+        reply.model = model
+        return reply
+
+
+def _shared_client(key: tuple, factory):
+    """Return the process-wide client for `key`, building it with `factory` once"""
+    try:
+        return _clients[key]
+    except KeyError:
+        pass
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+
 class ToyotaFinanceChatbot:
     """
     Toyota Finance Chatbot that supports multiple LLM providers
@@ -20,11 +95,7 @@ class ToyotaFinanceChatbot:
     
     def __init__(self):
         # Load environment variables from .env file
-        try:
-            from dotenv import load_dotenv
-            load_dotenv()
-        except ImportError:
-            pass  # dotenv not available, use system env vars
+        _load_env()
         
         self.provider = os.getenv("CHATBOT_PROVIDER", "openai").lower()
         self.model = os.getenv("CHATBOT_MODEL", "gpt-3.5-turbo")
@@ -75,28 +146,94 @@ FORMATTING GUIDELINES:
 Be friendly, professional, and sales-focused. Always try to get users to the interactive dashboards for quotes."""
         )
         
-        # Initialize the appropriate LLM client
-        self.client = self._initialize_client()
+        # Shared per-turn context: deduped current message, token-budgeted history, prompt caching
+        self.context_builder: ContextBuilder = create_context_builder(self.system_prompt)
+        
+        # Failover order: the configured provider, then CHATBOT_FALLBACK_PROVIDERS that have credentials
+        fallbacks = [p.strip().lower() for p in os.getenv("CHATBOT_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+        self.providers = [self.provider] + [
+            p for p in dict.fromkeys(fallbacks)
+            if p != self.provider and p in _PROVIDER_ENV and os.getenv(_PROVIDER_ENV[p][0])
+        ]
+        self.models = {
+            p: self.model if p == self.provider else os.getenv(f"{p.upper()}_MODEL", _DEFAULT_MODELS[p])
+            for p in self.providers
+        }
+        self.router: ProviderRouter = create_provider_router(self.providers)
+        
+        # LLM clients are imported and created lazily, one per provider (see `_client_for`)
+        self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+        self._client_keys = {
+            p: (p, *(os.getenv(v) for v in _PROVIDER_ENV.get(p, ()))) for p in self.providers
+        }
+        self._sync_clients: Dict[str, Any] = {}
+        self._async_clients: Dict[str, Any] = {}
+        
+        # Cap on concurrent in-flight LLM requests per provider (async path)
+        self._in_flight: Dict[str, asyncio.Semaphore] = {}
+        
+        # Chat history storage: bounded in-memory LRU or SQLite (CHATBOT_HISTORY_BACKEND)
+        self.history_store: HistoryStore = create_history_store()
         
-        # Chat history storage (in production, use a database)
-        self.chat_history: Dict[str, List[Dict[str, Any]]] = {}
+        # Per-user turn ordering and sharing of double-submitted messages
+        self.turns = TurnCoordinator()
+        
+        # Opt-in cache of provider replies (CHATBOT_RESPONSE_CACHE); None when disabled
+        self.response_cache: Optional[ResponseCache] = create_response_cache()
+        self._cache_scope = (
+            self.model, self.deployment_name, self.temperature, self.max_tokens,
+            hashlib.blake2b(self.system_prompt.encode("utf-8"), digest_size=8).hexdigest(),
+        )
+    
+    @property
+    def client(self):
+        """Sync client for the configured provider: created on first use, shared per process"""
+        return self._client_for(self.provider)
+    
+    @property
+    def async_client(self):
+        """Native async client for the configured provider, or None (use the threadpool)"""
+        return self._async_client_for(self.provider)
     
-    def _initialize_client(self):
+    def _configured_providers(self) -> List[str]:
+        """Providers in failover order whose client could be created (empty: answer with the mock)"""
+        return [p for p in self.providers if not isinstance(self._client_for(p), MockLLMClient)]
+    
+    def _client_for(self, provider: str):
+        """Sync LLM client for `provider` (a MockLLMClient when it cannot be initialized)"""
+        client = self._sync_clients.get(provider)
+        if client is None:
+            client = self._sync_clients[provider] = _shared_client(
+                ("sync",) + self._client_keys[provider], lambda: self._initialize_client(provider)
+            )
+        return client
+    
+    def _async_client_for(self, provider: str):
+        """Native async LLM client for `provider`, or None when it has none"""
+        client = self._async_clients.get(provider)
+        if client is None:
+            client = self._async_clients[provider] = _shared_client(
+                ("async",) + self._client_keys[provider], lambda: self._initialize_async_client(provider) or False
+            )
+        return client or None
+    
+    def _initialize_client(self, provider: Optional[str] = None):
         """Initialize the appropriate LLM client based on provider"""
+        provider = provider or self.provider
         try:
-            if self.provider == "openai":
+            if provider == "openai":
                 return self._init_openai()
-            elif self.provider == "azure":
+            elif provider == "azure":
                 return self._init_azure_openai()
-            elif self.provider == "anthropic":
+            elif provider == "anthropic":
                 return self._init_anthropic()
-            elif self.provider == "google":
+            elif provider == "google":
                 return self._init_google()
             else:
-                logger.warning(f"Unknown provider: {self.provider}, falling back to mock")
+                logger.warning(f"Unknown provider: {provider}, falling back to mock")
                 return self._init_mock()
         except Exception as e:
-            logger.error(f"Failed to initialize {self.provider} client: {e}")
+            logger.error(f"Failed to initialize {provider} client: {e}")
             logger.info("Falling back to mock client")
             return self._init_mock()
     
@@ -108,7 +245,7 @@ Be friendly, professional, and sales-focused. Always try to get users to the int
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment")
             
-            client = OpenAI(api_key=api_key)
+            client = OpenAI(api_key=api_key, http_client=llm_transport.http_client())
             return client
         except ImportError:
             raise ImportError("OpenAI package not installed. Run: pip install openai")
@@ -133,7 +270,8 @@ Be friendly, professional, and sales-focused. Always try to get users to the int
             client = AzureOpenAI(
                 api_key=api_key,
                 api_version=api_version,
-                azure_endpoint=endpoint
+                azure_endpoint=endpoint,
+                http_client=llm_transport.http_client()
             )
             
             # Store deployment name for use in API calls
@@ -151,7 +289,7 @@ Be friendly, professional, and sales-focused. Always try to get users to the int
             if not api_key:
                 raise ValueError("ANTHROPIC_API_KEY not found in environment")
             
-            return anthropic.Anthropic(api_key=api_key)
+            return anthropic.Anthropic(api_key=api_key, http_client=llm_transport.http_client())
         except ImportError:
             raise ImportError("Anthropic package not installed. Run: pip install anthropic")
     
@@ -172,6 +310,57 @@ Be friendly, professional, and sales-focused. Always try to get users to the int
         """Initialize mock client for testing"""
         return MockLLMClient()
     
+    def _initialize_async_client(self, provider: Optional[str] = None):
+        """Initialize the native async client for the provider, or None to use the sync client"""
+        provider = provider or self.provider
+        if isinstance(self._client_for(provider), MockLLMClient):
+            return None
+        try:
+            if provider == "openai":
+                from openai import AsyncOpenAI
+                return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=llm_transport.async_http_client())
+            elif provider == "azure":
+                from openai import AsyncAzureOpenAI
+                return AsyncAzureOpenAI(
+                    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+                    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                    http_client=llm_transport.async_http_client()
+                )
+            elif provider == "anthropic":
+                import anthropic
+                return anthropic.AsyncAnthropic(
+                    api_key=os.getenv("ANTHROPIC_API_KEY"), http_client=llm_transport.async_http_client()
+                )
+            elif provider == "google":
+                # google.generativeai exposes generate_content_async on the same module
+                return self._client_for(provider)
+        except Exception as e:
+            logger.warning(f"Async {provider} client unavailable, using threadpool: {e}")
+        return None
+    
+    def _gemini_model(self):
+        """GenerativeModel handle for the Gemini model, built once and shared (sync and async calls)"""
+        model = self.models["google"]
+        return _shared_client(
+            ("gemini-model", model) + self._client_keys["google"],
+            lambda: self._client_for("google").GenerativeModel(model)
+        )
+    
+    @staticmethod
+    def _max_in_flight(provider: str) -> int:
+        return int(os.getenv(
+            f"CHATBOT_MAX_IN_FLIGHT_{provider.upper()}",
+            os.getenv("CHATBOT_MAX_IN_FLIGHT", "64"),
+        ))
+    
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Per-provider limit on concurrent in-flight requests"""
+        sem = self._in_flight.get(provider)
+        if sem is None:
+            sem = self._in_flight[provider] = asyncio.Semaphore(self._max_in_flight(provider))
+        return sem
+    
     def chat(self, user_id: str, message: str) -> Dict[str, Any]:
         """
         Process a chat message and return a response
@@ -183,245 +372,398 @@ Be friendly, professional, and sales-focused. Always try to get users to the int
         Returns:
             Dict containing the response and metadata
         """
+        reply, coalesced = self.turns.run(user_id, message, lambda: self._chat_turn(user_id, message))
+        return dict(reply, coalesced=True) if coalesced else reply
+    
+    def _chat_turn(self, user_id: str, message: str) -> Dict[str, Any]:
         try:
-            # Get or create chat history for this user
-            if user_id not in self.chat_history:
-                self.chat_history[user_id] = []
-            
-            # Add user message to history
-            self.chat_history[user_id].append({
-                "role": "user",
-                "content": message,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Generate response
+            history, hit = self._cache_lookup(user_id, message)
+            self._record_user_turn(user_id, message)
+            if hit is not None:
+                return self._record_assistant_turn(user_id, hit.response, hit)
             response = self._generate_response(user_id, message)
-            
-            # Add assistant response to history
-            self.chat_history[user_id].append({
-                "role": "assistant",
-                "content": response,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Keep only last 20 messages to prevent context overflow
-            if len(self.chat_history[user_id]) > 20:
-                self.chat_history[user_id] = self.chat_history[user_id][-20:]
-            
-            return {
-                "response": response,
-                "user_id": user_id,
-                "timestamp": datetime.now().isoformat(),
-                "provider": self.provider,
-                "model": self.model
-            }
-            
+            self._cache_store(history, message, response)
+            return self._record_assistant_turn(user_id, response)
         except Exception as e:
-            logger.error(f"Error in chat: {e}")
-            return {
-                "response": "I'm sorry, I'm having trouble processing your request right now. Please try again later or contact our support team.",
-                "user_id": user_id,
-                "timestamp": datetime.now().isoformat(),
-                "error": str(e),
-                "provider": self.provider
-            }
+            return self._error_reply(user_id, e)
     
-    def _generate_response(self, user_id: str, message: str) -> str:
-        """Generate response using the configured LLM provider"""
-        
-        if self.provider == "openai":
-            return self._generate_openai_response(user_id, message)
-        elif self.provider == "azure":
-            return self._generate_azure_openai_response(user_id, message)
-        elif self.provider == "anthropic":
-            return self._generate_anthropic_response(user_id, message)
-        elif self.provider == "google":
-            return self._generate_google_response(user_id, message)
-        else:
-            return self._generate_mock_response(user_id, message)
+    async def achat(self, user_id: str, message: str) -> Dict[str, Any]:
+        """
+        Async variant of chat(): awaits a native async LLM client so no worker
+        thread is held for the provider round trip. Turns for one user run in
+        order; a duplicate of an in-flight message shares its reply.
+        """
+        try:
+            reply, coalesced = await self.turns.arun(user_id, message, lambda: self._achat_turn(user_id, message))
+        except TurnAbandoned as e:
+            return self._error_reply(user_id, e)
+        return dict(reply, coalesced=True) if coalesced else reply
     
-    def _generate_openai_response(self, user_id: str, message: str) -> str:
-        """Generate response using OpenAI"""
+    async def _achat_turn(self, user_id: str, message: str) -> Dict[str, Any]:
+        # History, cache and shared-store calls may block on SQLite/Redis: keep them off the event loop
         try:
-            # Prepare messages for OpenAI
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add recent chat history
-            recent_history = self.chat_history[user_id][-10:]  # Last 10 messages
-            for msg in recent_history:
-                if msg["role"] in ["user", "assistant"]:
-                    messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-            
-            # Add current message
-            messages.append({"role": "user", "content": message})
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
-            
-            return response.choices[0].message.content.strip()
-            
+            history, hit = await asyncio.to_thread(self._cache_lookup, user_id, message)
+            await asyncio.to_thread(self._record_user_turn, user_id, message)
+            if hit is not None:
+                return await asyncio.to_thread(self._record_assistant_turn, user_id, hit.response, hit)
+            response = await self._agenerate_response(user_id, message)
+            await asyncio.to_thread(self._cache_store, history, message, response)
+            return await asyncio.to_thread(self._record_assistant_turn, user_id, response)
         except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return self._get_fallback_response(message)
+            return self._error_reply(user_id, e)
     
-    def _generate_azure_openai_response(self, user_id: str, message: str) -> str:
-        """Generate response using Azure OpenAI"""
+    async def astream_chat(self, user_id: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of achat(). Yields {"delta": text} events as tokens arrive,
+        then one {"done": True, ...} event carrying the chat() metadata. History is
+        written once, after the stream finishes. A cache hit, or a duplicate of a
+        message already in flight for the user, is sent as a single delta.
+        """
+        shared, leader = self.turns.begin(user_id, message)
+        if not leader:
+            try:
+                reply = dict(await asyncio.shield(shared), coalesced=True)
+            except TurnAbandoned as e:
+                reply = self._error_reply(user_id, e)
+            yield {"delta": reply["response"]}
+            yield {"done": True, **reply}
+            return
+        
+        reply = None
         try:
-            # Prepare messages for Azure OpenAI
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add recent chat history
-            recent_history = self.chat_history[user_id][-10:]  # Last 10 messages
-            for msg in recent_history:
-                if msg["role"] in ["user", "assistant"]:
-                    messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-            
-            # Add current message
-            messages.append({"role": "user", "content": message})
-            
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,  # Use deployment name for Azure
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            logger.error(f"Azure OpenAI API error: {e}")
-            return self._get_fallback_response(message)
+            async with self.turns.user_turn(user_id):
+                async for event in self._astream_turn(user_id, message):
+                    if event.get("done"):
+                        reply = {k: v for k, v in event.items() if k != "done"}
+                    yield event
+        finally:
+            self.turns.finish(user_id, message, shared, reply)
     
-    def _generate_anthropic_response(self, user_id: str, message: str) -> str:
-        """Generate response using Anthropic Claude"""
+    async def _astream_turn(self, user_id: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+        parts: List[str] = []
         try:
-            # Prepare messages for Claude
-            messages = []
-            
-            # Add recent chat history
-            recent_history = self.chat_history[user_id][-10:]  # Last 10 messages
-            for msg in recent_history:
-                if msg["role"] in ["user", "assistant"]:
-                    messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-            
-            # Add current message
-            messages.append({"role": "user", "content": message})
-            
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                system=self.system_prompt,
-                messages=messages
-            )
-            
-            return response.content[0].text.strip()
-            
+            history, hit = await asyncio.to_thread(self._cache_lookup, user_id, message)
+            await asyncio.to_thread(self._record_user_turn, user_id, message)
+            if hit is not None:
+                parts.append(hit.response)
+                yield {"delta": hit.response}
+                reply = await asyncio.to_thread(self._record_assistant_turn, user_id, hit.response, hit)
+            else:
+                fallback, answered_by = False, None
+                async for delta in self._astream_response(user_id, message):
+                    fallback = fallback or isinstance(delta, _FallbackReply)
+                    answered_by = delta if isinstance(delta, _ProviderReply) else answered_by
+                    if delta:
+                        parts.append(str(delta))
+                        yield {"delta": str(delta)}
+                response = "".join(parts).strip()
+                if not fallback:
+                    await asyncio.to_thread(self._cache_store, history, message, response)
+                if answered_by is not None:
+                    response = _ProviderReply(response, answered_by.provider, answered_by.model)
+                reply = await asyncio.to_thread(self._record_assistant_turn, user_id, response)
         except Exception as e:
-            logger.error(f"Anthropic API error: {e}")
-            return self._get_fallback_response(message)
+            reply = self._error_reply(user_id, e)
+            if not parts:
+                yield {"delta": reply["response"]}
+        yield {"done": True, **reply}
     
-    def _generate_google_response(self, user_id: str, message: str) -> str:
-        """Generate response using Google Gemini"""
+    def _record_user_turn(self, user_id: str, message: str) -> None:
+        # Add user message to history
+        with metrics.stage("history_write"):
+            self.history_store.append(user_id, "user", message)
+    
+    def _record_assistant_turn(self, user_id: str, response: str, hit: Optional[CachedResponse] = None) -> Dict[str, Any]:
+        # Add assistant response to history (the store keeps only the last N messages)
+        with metrics.stage("history_write"):
+            self.history_store.append(user_id, "assistant", str(response))
+        if isinstance(response, _ProviderReply):
+            metrics.record_tokens(response.provider, "completion", count_tokens(str(response)))
+        
+        reply = {
+            "response": str(response),
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat(),
+            "provider": getattr(response, "provider", self.provider),
+            "model": getattr(response, "model", self.model),
+            "cached": hit is not None
+        }
+        if hit is not None:
+            reply["cache_tier"] = hit.tier
+            reply["cache_similarity"] = hit.similarity
+        return reply
+    
+    def _cache_lookup(self, user_id: str, message: str):
+        """
+        (history window, cached reply or None). Must run before the user turn is
+        recorded so the window holds only the earlier conversation.
+        """
+        if self.response_cache is None or not self._configured_providers():
+            return None, None
+        with metrics.stage("history"):
+            history = self.history_store.recent(user_id, self.response_cache.history_window)
+        with metrics.stage("cache_lookup"):
+            return history, self.response_cache.lookup(self.provider, self._cache_scope, message, history)
+    
+    def _cache_store(self, history, message: str, response: str) -> None:
+        """Cache a provider reply; fallback replies and empty answers are skipped"""
+        if history is None or not response or isinstance(response, _FallbackReply):
+            return
+        self.response_cache.store(self.provider, self._cache_scope, message, history, response)
+    
+    def _error_reply(self, user_id: str, e: Exception) -> Dict[str, Any]:
+        logger.error(f"Error in chat: {e}")
+        return {
+            "response": "I'm sorry, I'm having trouble processing your request right now. Please try again later or contact our support team.",
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat(),
+            "error": str(e),
+            "provider": self.provider
+        }
+    
+    def _generate_response(self, user_id: str, message: str) -> str:
+        """Generate response via the provider router (failover across CHATBOT_FALLBACK_PROVIDERS)"""
+        providers = self._configured_providers()
+        if not providers:
+            return self._generate_mock_response(user_id, message)
         try:
-            model = self.client.GenerativeModel(self.model)
-            
-            # Prepare context with system prompt and recent history
-            context = f"{self.system_prompt}\n\n"
-            
-            # Add recent chat history
-            recent_history = self.chat_history[user_id][-10:]  # Last 10 messages
-            for msg in recent_history:
-                if msg["role"] == "user":
-                    context += f"User: {msg['content']}\n"
-                elif msg["role"] == "assistant":
-                    context += f"Assistant: {msg['content']}\n"
-            
-            # Add current message
-            context += f"User: {message}\nAssistant:"
-            
-            response = model.generate_content(
-                context,
-                generation_config={
-                    "temperature": self.temperature,
-                    "max_output_tokens": self.max_tokens,
-                }
-            )
-            
-            return response.text.strip()
-            
-        except Exception as e:
-            logger.error(f"Google API error: {e}")
+            with metrics.stage("provider"):
+                provider, text = self.router.call(lambda p: self._request(p, user_id, message), providers)
+        except NoProviderAvailable as e:
+            logger.error(f"LLM request failed: {e}")
             return self._get_fallback_response(message)
+        return _ProviderReply(text, provider, self.models[provider])
+    
+    def _request(self, provider: str, user_id: str, message: str) -> str:
+        """
+        One sync call to `provider`; raises on failure so the router can fail
+        over. The SDK request carries the router's timeout_seconds, since a
+        blocking call cannot be cancelled from outside.
+        """
+        if isinstance(self._client_for(provider), MockLLMClient):
+            raise RuntimeError(f"{provider} client is not configured")
+        if provider in ("openai", "azure"):
+            return self._generate_openai_response(provider, user_id, message)
+        elif provider == "anthropic":
+            return self._generate_anthropic_response(provider, user_id, message)
+        elif provider == "google":
+            return self._generate_google_response(provider, user_id, message)
+        raise ValueError(f"Unknown provider: {provider}")
+    
+    def _history_records(self, user_id: str) -> List[Dict[str, Any]]:
+        # One extra record: the current turn, already recorded, is removed by the context builder
+        with metrics.stage("history"):
+            return self.history_store.recent(user_id, self.context_builder.max_messages + 1)
+    
+    def _chat_messages(self, provider: str, user_id: str, message: str) -> List[Dict[str, str]]:
+        """Trimmed history plus the current message in Anthropic message format (system sent separately)"""
+        records = self._history_records(user_id)
+        with metrics.stage("context"):
+            messages = self.context_builder.chat_messages(records, message)
+        metrics.record_tokens(provider, "prompt", self.context_builder.prompt_tokens(messages, system=True))
+        return messages
+    
+    def _openai_messages(self, provider: str, user_id: str, message: str) -> List[Dict[str, str]]:
+        """Messages for OpenAI / Azure OpenAI, led by the system prompt"""
+        records = self._history_records(user_id)
+        with metrics.stage("context"):
+            messages = self.context_builder.openai_messages(records, message)
+        metrics.record_tokens(provider, "prompt", self.context_builder.prompt_tokens(messages))
+        return messages
+    
+    def _google_prompt(self, provider: str, user_id: str, message: str) -> str:
+        """Single-string context for Gemini: system prompt, trimmed history, current message"""
+        records = self._history_records(user_id)
+        with metrics.stage("context"):
+            prompt = self.context_builder.google_prompt(records, message)
+        metrics.record_tokens(provider, "prompt", count_tokens(prompt))
+        return prompt
+    
+    def _generate_openai_response(self, provider: str, user_id: str, message: str) -> str:
+        """Generate response using OpenAI / Azure OpenAI (Azure addresses the deployment name)"""
+        response = self._client_for(provider).chat.completions.create(
+            model=self.deployment_name if provider == "azure" else self.models[provider],
+            messages=self._openai_messages(provider, user_id, message),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            timeout=self.router.timeout_seconds,
+            **self.context_builder.openai_extra(provider)
+        )
+        return response.choices[0].message.content.strip()
+    
+    def _generate_anthropic_response(self, provider: str, user_id: str, message: str) -> str:
+        """Generate response using Anthropic Claude"""
+        response = self._client_for(provider).messages.create(
+            model=self.models[provider],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            system=self.context_builder.anthropic_system(),
+            messages=self._chat_messages(provider, user_id, message),
+            timeout=self.router.timeout_seconds
+        )
+        return response.content[0].text.strip()
+    
+    def _generate_google_response(self, provider: str, user_id: str, message: str) -> str:
+        """Generate response using Google Gemini"""
+        response = self._gemini_model().generate_content(
+            self._google_prompt(provider, user_id, message),
+            generation_config={
+                "temperature": self.temperature,
+                "max_output_tokens": self.max_tokens,
+            },
+            request_options={"timeout": self.router.timeout_seconds}
+        )
+        return response.text.strip()
     
     def _generate_mock_response(self, user_id: str, message: str) -> str:
         """Generate mock response for testing"""
         return self._get_fallback_response(message)
     
+    async def _agenerate_response(self, user_id: str, message: str) -> str:
+        """Async counterpart of _generate_response: failover and optional hedging via the router"""
+        providers = self._configured_providers()
+        if not providers:
+            return self._generate_mock_response(user_id, message)
+        try:
+            with metrics.stage("provider"):
+                provider, text = await self.router.acall(lambda p: self._arequest(p, user_id, message), providers)
+        except NoProviderAvailable as e:
+            logger.error(f"LLM request failed: {e}")
+            return self._get_fallback_response(message)
+        return _ProviderReply(text, provider, self.models[provider])
+    
+    async def _arequest(self, provider: str, user_id: str, message: str) -> str:
+        """One async call to `provider`, bounded by its in-flight limit; raises on failure"""
+        async with self._semaphore(provider):
+            if self._async_client_for(provider) is None:
+                # No native async client: keep the event loop free via the threadpool
+                return await asyncio.to_thread(self._request, provider, user_id, message)
+            if provider in ("openai", "azure"):
+                return await self._agenerate_openai_response(provider, user_id, message)
+            elif provider == "anthropic":
+                return await self._agenerate_anthropic_response(provider, user_id, message)
+            elif provider == "google":
+                return await self._agenerate_google_response(provider, user_id, message)
+            raise ValueError(f"Unknown provider: {provider}")
+    
+    async def _astream_response(self, user_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Yield response text chunks from the provider's streaming API. A provider
+        that fails before its first chunk is replaced by the next one; the first
+        chunk of each answer is a _ProviderReply naming the provider.
+        """
+        providers = self._configured_providers()
+        if not providers:
+            yield self._generate_mock_response(user_id, message)
+            return
+        
+        with metrics.stage("provider"):
+            for provider in self.router.available(providers):
+                if not self.router.admit(provider):
+                    continue
+                start = time.monotonic()
+                streamed = False
+                try:
+                    async for text in self._astream_provider(provider, user_id, message):
+                        yield text if streamed else _ProviderReply(text, provider, self.models[provider])
+                        streamed = True
+                    self.router.record(provider, time.monotonic() - start)
+                    return
+                except Exception as e:
+                    self.router.record(provider, None, e)
+                    logger.error(f"{provider} streaming API error: {e}")
+                    if streamed:
+                        # An empty marker flags a truncated answer so it is not cached
+                        yield _FallbackReply("")
+                        return
+        yield self._get_fallback_response(message)
+    
+    async def _astream_provider(self, provider: str, user_id: str, message: str) -> AsyncIterator[str]:
+        """Raw text chunks from one provider's streaming API; raises on failure"""
+        async with self._semaphore(provider):
+            client = self._async_client_for(provider)
+            if client is None:
+                yield await asyncio.to_thread(self._request, provider, user_id, message)
+            elif provider in ("openai", "azure"):
+                stream = await client.chat.completions.create(
+                    model=self.deployment_name if provider == "azure" else self.models[provider],
+                    messages=await asyncio.to_thread(self._openai_messages, provider, user_id, message),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    **self.context_builder.openai_extra(provider)
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            elif provider == "anthropic":
+                async with client.messages.stream(
+                    model=self.models[provider],
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    system=self.context_builder.anthropic_system(),
+                    messages=await asyncio.to_thread(self._chat_messages, provider, user_id, message)
+                ) as stream:
+                    async for text in stream.text_stream:
+                        yield text
+            elif provider == "google":
+                response = await self._gemini_model().generate_content_async(
+                    await asyncio.to_thread(self._google_prompt, provider, user_id, message),
+                    generation_config={
+                        "temperature": self.temperature,
+                        "max_output_tokens": self.max_tokens,
+                    },
+                    stream=True
+                )
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+    
+    async def _agenerate_openai_response(self, provider: str, user_id: str, message: str) -> str:
+        """Generate response using AsyncOpenAI / AsyncAzureOpenAI"""
+        response = await self._async_client_for(provider).chat.completions.create(
+            model=self.deployment_name if provider == "azure" else self.models[provider],
+            messages=await asyncio.to_thread(self._openai_messages, provider, user_id, message),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **self.context_builder.openai_extra(provider)
+        )
+        return response.choices[0].message.content.strip()
+    
+    async def _agenerate_anthropic_response(self, provider: str, user_id: str, message: str) -> str:
+        """Generate response using AsyncAnthropic"""
+        response = await self._async_client_for(provider).messages.create(
+            model=self.models[provider],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            system=self.context_builder.anthropic_system(),
+            messages=await asyncio.to_thread(self._chat_messages, provider, user_id, message)
+        )
+        return response.content[0].text.strip()
+    
+    async def _agenerate_google_response(self, provider: str, user_id: str, message: str) -> str:
+        """Generate response using Gemini's generate_content_async"""
+        response = await self._gemini_model().generate_content_async(
+            await asyncio.to_thread(self._google_prompt, provider, user_id, message),
+            generation_config={
+                "temperature": self.temperature,
+                "max_output_tokens": self.max_tokens,
+            }
+        )
+        return response.text.strip()
+    
     def _get_fallback_response(self, message: str) -> str:
         """Provide fallback responses when LLM is unavailable"""
-        message_lower = message.lower()
-        
-        # Greeting responses
-        if any(word in message_lower for word in ["hi", "hello", "hey", "good morning", "good afternoon", "good evening"]):
-            return "Hello! I'm your Toyota Finance Assistant. I can help you explore vehicles, compare financing options, and answer questions about loans and leases. What would you like to know about Toyota vehicles or financing?"
-        
-        # Identity questions
-        elif any(word in message_lower for word in ["who are you", "what are you", "introduce yourself"]):
-            return "I'm your Toyota Finance Assistant! I'm here to help you with everything related to Toyota vehicles and financing. I can assist with vehicle recommendations, loan options, lease comparisons, and answer questions about Toyota's lineup. How can I help you today?"
-        
-        # Vehicle recommendations
-        elif any(word in message_lower for word in ["recommend", "suggest", "best", "good", "vehicle", "car", "toyota"]):
-            return "I'd be happy to recommend Toyota vehicles! We have excellent options for every need: the Camry for reliability, RAV4 for adventure, Prius for efficiency, and Tacoma for work. What type of vehicle are you looking for? (sedan, SUV, truck, hybrid, etc.)"
-        
-        # Financing questions
-        elif any(word in message_lower for word in ["loan", "financing", "finance", "payment", "monthly"]):
-            return "Toyota offers competitive financing options! We have special rates, flexible terms, and programs for various credit situations. You can use our loan calculator to estimate payments, or I can help you understand the difference between loans and leases. What's your budget range?"
-        
-        # Lease questions
-        elif any(word in message_lower for word in ["lease", "leasing", "rent"]):
-            return "Toyota leasing is a great option! You get lower monthly payments, the latest technology, and flexible terms. Our lease programs often include maintenance and warranty coverage. Would you like to compare lease vs loan options for your situation?"
-        
-        # Hybrid/Electric questions
-        elif any(word in message_lower for word in ["hybrid", "electric", "ev", "prius", "fuel", "efficient", "mpg"]):
-            return "Toyota leads in hybrid technology! We offer the Prius, Camry Hybrid, RAV4 Hybrid, and more. These vehicles provide excellent fuel efficiency and environmental benefits. The Prius gets up to 58 MPG combined! Would you like information about specific hybrid models?"
-        
-        # Pricing questions
-        elif any(word in message_lower for word in ["price", "cost", "expensive", "cheap", "affordable", "budget"]):
-            return "Toyota offers vehicles at various price points! The Corolla starts around $22,000, Camry around $26,000, and RAV4 around $28,000. We also have special offers and incentives. What's your budget range? I can recommend the best options for you."
-        
-        # Warranty/Service questions
-        elif any(word in message_lower for word in ["warranty", "maintenance", "service", "repair", "reliable"]):
-            return "Toyota vehicles come with comprehensive warranties! We offer 3-year/36,000-mile basic warranty, 5-year/60,000-mile powertrain warranty, and ToyotaCare maintenance plans. Toyota is known for reliability and low maintenance costs. Would you like specific warranty details?"
-        
-        # Default response
-        else:
-            return "I'm here to help with Toyota vehicles and financing! I can assist with vehicle recommendations, loan options, lease comparisons, pricing information, and more. What specific information would you like about Toyota vehicles or financing options?"
+        with metrics.stage("fallback"):
+            return _FallbackReply(fallback_responder.respond(message))
     
     def get_chat_history(self, user_id: str) -> List[Dict[str, Any]]:
         """Get chat history for a user"""
-        return self.chat_history.get(user_id, [])
+        return self.history_store.history(user_id)
     
     def clear_chat_history(self, user_id: str) -> bool:
         """Clear chat history for a user"""
-        if user_id in self.chat_history:
-            del self.chat_history[user_id]
-            return True
-        return False
+        return self.history_store.clear(user_id)
 
 
 class MockLLMClient:
@@ -467,10 +809,7 @@ class MockLLMClient:
         
         # Use intelligent fallback response based on message content
         if user_message:
-            # Import the fallback response function
-            from chatbot import ToyotaFinanceChatbot
-            temp_bot = ToyotaFinanceChatbot()
-            response = temp_bot._get_fallback_response(user_message)
+            response = fallback_responder.respond(user_message)
         else:
             response = self.responses[self.response_index % len(self.responses)]
             self.response_index += 1
@@ -0,0 +1,91 @@
+from __future__ import annotations
+from decimal import Decimal
+from typing import Dict, Any, List
+
+from loan_calculator import _D, _q2, amortize, loan_terms
+from lease_calculator import _residual_rate_for_term, lease_figures, lease_payload
+
+
+def build_lease_loan_comparison(
+    *,
+    vehicle_amount: float | Decimal,
+    term_months: int,
+    apr_percent: float | Decimal,
+    down_payment_cash: float | Decimal = 0,
+    tax_rate: float | Decimal = 0.0825,
+    money_factor: float | Decimal = 0.00190,
+    acquisition_fee: float | Decimal = 695.00,
+) -> Dict[str, Any]:
+    """
+    Loan and lease breakdowns for the same vehicle and term, plus a comparison block.
+    Returns a CompareLeaseLoan-shaped payload: { loanCore, leaseCore, comparison }.
+
+    Loan net cost at month k = down payment + payments to date - equity, where
+    equity is the vehicle value (lease residual curve at k) minus the balance owed.
+    Break-even is the first month the loan's net cost drops to or below the
+    cumulative lease cost.
+
+    The inputs are normalized once: the loan terms and lease figures (Decimal)
+    feed both the loanCore/leaseCore payloads, which match /loan/calcular and
+    /lease/calcular, and the comparison, which never re-reads their floats.
+    """
+    # ---------- Normalize inputs once, shared by both calculators ----------
+    vehicle = _D(vehicle_amount)
+    terms = loan_terms(vehicle, down_payment_cash, term_months, apr_percent, tax_rate)
+    figures = lease_figures(vehicle, terms.n, money_factor, acquisition_fee)
+    loan = amortize(terms)
+    lease = lease_payload(figures)
+
+    # ---------- Month-by-month comparison ----------
+    lease_payment = figures["payment_total"]
+    loan_paid = terms.dp
+    labels: List[str] = []
+    loan_outlay: List[float] = []
+    loan_net: List[float] = []
+    lease_cost: List[float] = []
+    diff_outlay: List[float] = []
+    diff_net: List[float] = []
+    break_even_month = None
+
+    for k, row in enumerate(loan["schedule"], start=1):
+        loan_paid += row["payment_total"]
+        equity = _q2(vehicle * _residual_rate_for_term(k)) - row["balance_end"]
+        net = loan_paid - equity
+        leased = lease_payment * k
+        if break_even_month is None and net <= leased:
+            break_even_month = k
+
+        labels.append(str(k))
+        loan_outlay.append(float(loan_paid))
+        loan_net.append(float(net))
+        lease_cost.append(float(leased))
+        diff_outlay.append(float(loan_paid - leased))
+        diff_net.append(float(net - leased))
+
+    comparison = {
+        "labels": labels,
+        "break_even_month": break_even_month,
+        "timeseries": {
+            "loan_cumulative_outlay": loan_outlay,
+            "loan_net_cost": loan_net,
+            "lease_cumulative_cost": lease_cost,
+            "difference_cumulative_outlay": diff_outlay,
+            "difference_net_cost": diff_net,
+        },
+        "totals": {
+            "monthly_payment_difference": float(_q2(terms.payment_base + terms.monthly_tax) - lease_payment),
+            "loan_net_cost": loan_net[-1],
+            "lease_total_cost": lease_cost[-1],
+            "net_cost_difference": diff_net[-1],
+        },
+        "notes": [
+            "Differences are loan minus lease; negative values favour the loan.",
+            "Vehicle value for loan equity follows the lease residual curve.",
+        ],
+    }
+
+    return {
+        "loanCore": {"data": loan},
+        "leaseCore": {"data": lease},
+        "comparison": comparison,
+    }
@@ -0,0 +1,136 @@
+"""
+Builds the per-turn LLM context shared by every provider path in chatbot.py.
+
+- The current message is sent once: chat() records the user turn before the
+  provider call, so it is dropped from the tail of the history window.
+- History is trimmed, newest first, to a token budget counted with a local
+  tokenizer (tiktoken when available, otherwise a ~4 chars/token estimate).
+- The system prompt stays a byte-identical prefix so provider prompt caching
+  applies: Anthropic gets an explicit cache_control breakpoint, OpenAI a
+  stable prompt_cache_key for its automatic prefix cache.
+"""
+
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _load_encoding():
+    """tiktoken's cl100k_base encoding, or None (not installed / encoding file unavailable)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(os.getenv("CHATBOT_TOKENIZER_ENCODING", "cl100k_base"))
+        except ImportError:
+            pass  # tiktoken not installed, use the length estimate
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        _encoding_loaded = True
+    return _encoding
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Token count for `text`; history messages repeat every turn, so results are memoized"""
+    encoding = _load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class ContextBuilder:
+    """Turns stored history plus the current message into provider request context"""
+
+    # Per-message framing overhead (role markers) in chat formats
+    MESSAGE_OVERHEAD_TOKENS = 4
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_messages: int = 10,
+        history_token_budget: int = 2000,
+        prompt_cache: bool = True,
+    ):
+        self.system_prompt = system_prompt
+        self.max_messages = max_messages
+        self.history_token_budget = history_token_budget
+        self.prompt_cache = prompt_cache
+        self.prompt_cache_key = "toyota-finance-" + hashlib.blake2b(
+            system_prompt.encode("utf-8"), digest_size=8
+        ).hexdigest()
+
+    def history(self, records: List[Dict[str, Any]], message: str) -> List[Dict[str, str]]:
+        """
+        Earlier user/assistant turns to send with `message`: the current turn
+        removed, at most max_messages, newest kept first within the token budget.
+        """
+        turns = [r for r in records if r["role"] in ("user", "assistant")]
+        if turns and turns[-1]["role"] == "user" and turns[-1]["content"] == message:
+            turns.pop()
+
+        kept: List[Dict[str, str]] = []
+        budget = self.history_token_budget
+        for turn in reversed(turns[-self.max_messages:] if self.max_messages > 0 else []):
+            cost = count_tokens(turn["content"]) + self.MESSAGE_OVERHEAD_TOKENS
+            if cost > budget:
+                break
+            budget -= cost
+            kept.append({"role": turn["role"], "content": turn["content"]})
+        kept.reverse()
+
+        # Chat APIs expect the conversation to open with a user turn
+        while kept and kept[0]["role"] != "user":
+            kept.pop(0)
+        return kept
+
+    def chat_messages(self, records: List[Dict[str, Any]], message: str) -> List[Dict[str, str]]:
+        """History plus the current message in OpenAI/Anthropic message format"""
+        return self.history(records, message) + [{"role": "user", "content": message}]
+
+    def openai_messages(self, records: List[Dict[str, Any]], message: str) -> List[Dict[str, str]]:
+        """Messages for OpenAI / Azure OpenAI, led by the system prompt"""
+        return [{"role": "system", "content": self.system_prompt}] + self.chat_messages(records, message)
+
+    def prompt_tokens(self, messages: List[Dict[str, str]], system: bool = False) -> int:
+        """Local token count of a message list, plus the system prompt when it is sent separately"""
+        tokens = sum(count_tokens(m["content"]) + self.MESSAGE_OVERHEAD_TOKENS for m in messages)
+        return tokens + (count_tokens(self.system_prompt) if system else 0)
+
+    def openai_extra(self, provider: str) -> Dict[str, Any]:
+        """Extra request fields: a prompt_cache_key routing turns to the same prefix cache (OpenAI only)"""
+        if self.prompt_cache and provider == "openai":
+            return {"extra_body": {"prompt_cache_key": self.prompt_cache_key}}
+        return {}
+
+    def anthropic_system(self) -> Any:
+        """System prompt for the Messages API, marked as a cache breakpoint when enabled"""
+        if not self.prompt_cache:
+            return self.system_prompt
+        return [{"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}]
+
+    def google_prompt(self, records: List[Dict[str, Any]], message: str) -> str:
+        """Single-string context for Gemini: system prompt, trimmed history, current message"""
+        context = f"{self.system_prompt}\n\n"
+        for turn in self.history(records, message):
+            speaker = "User" if turn["role"] == "user" else "Assistant"
+            context += f"{speaker}: {turn['content']}\n"
+        context += f"User: {message}\nAssistant:"
+        return context
+
+
+def create_context_builder(system_prompt: str) -> ContextBuilder:
+    """ContextBuilder configured from the environment"""
+    return ContextBuilder(
+        system_prompt,
+        max_messages=int(os.getenv("CHATBOT_CONTEXT_MAX_MESSAGES", "10")),
+        history_token_budget=int(os.getenv("CHATBOT_CONTEXT_TOKEN_BUDGET", "2000")),
+        prompt_cache=os.getenv("CHATBOT_PROMPT_CACHE", "true").lower() in ("1", "true", "yes", "on"),
+    )
@@ -1,27 +1,31 @@
-def apr_percent_from_credit_score(score: int) -> float:
+from datetime import date
+from typing import Optional
+
+from rate_card import get_rate_cards
+
+
+def apr_percent_from_credit_score(
+    score: int,
+    term_months: Optional[int] = None,
+    condition: str = "new",
+    on: Optional[date] = None,
+) -> float:
     """
     Map a U.S. FICO credit score (300–850) to an estimated auto-loan APR percent.
     Returns a PERCENT (e.g., 7.9 for 7.9%). Demo heuristic, not a quote.
 
     Args:
         score: FICO score (300–850). Values are clamped to this range.
+        term_months: loan term, for cards that vary by term (None: base rate).
+        condition: "new" or "used" vehicle.
+        on: date for promotional cards (default today).
 
-    Buckets (illustrative):
+    Rates come from the rate cards (rate_card.py, rate_cards.json). The
+    default card for new vehicles (illustrative):
       781–850: ~5.9%
       661–780: ~7.9%
       601–660: ~11.5%
       501–600: ~16.9%
       300–500: ~22.9%
     """
-    s = max(300, min(850, int(score)))
-    tiers = [
-        (781, 850, 5.9),
-        (661, 780, 7.9),
-        (601, 660, 11.5),
-        (501, 600, 16.9),
-        (300, 500, 22.9),
-    ]
-    for lo, hi, apr in tiers:
-        if lo <= s <= hi:
-            return apr
-    return 9.9  # fallback (shouldn't hit due to clamping)
+    return get_rate_cards().lookup(score, term_months, condition, on)
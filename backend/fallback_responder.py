@@ -0,0 +1,124 @@
+"""
+Canned Toyota Finance replies used when no LLM is available (mock provider,
+provider errors). Stateless and built once at import, so it is safe to share
+across chatbot instances, threads and the MockLLMClient.
+
+All intent keywords are compiled into one trie-shaped regex with word
+boundaries, run over the lowercased message: one scan per message, and "hi"
+no longer matches inside "this" or "vehicle".
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+# (intent, keywords, reply), checked in order; the first matching intent wins.
+# Keywords match whole words (plus an automatic plural "s"), so derived forms
+# such as "recommendation" or "leased" are listed explicitly.
+INTENTS: Tuple[Tuple[str, Tuple[str, ...], str], ...] = (
+    (
+        "greeting",
+        ("hi", "hello", "hey", "good morning", "good afternoon", "good evening"),
+        "Hello! I'm your Toyota Finance Assistant. I can help you explore vehicles, compare financing options, and answer questions about loans and leases. What would you like to know about Toyota vehicles or financing?",
+    ),
+    (
+        "identity",
+        ("who are you", "what are you", "introduce yourself"),
+        "I'm your Toyota Finance Assistant! I'm here to help you with everything related to Toyota vehicles and financing. I can assist with vehicle recommendations, loan options, lease comparisons, and answer questions about Toyota's lineup. How can I help you today?",
+    ),
+    (
+        "vehicle_recommendation",
+        ("recommend", "recommended", "recommending", "recommendation", "suggest", "suggested", "suggesting",
+         "suggestion", "best", "good", "vehicle", "car", "toyota"),
+        "I'd be happy to recommend Toyota vehicles! We have excellent options for every need: the Camry for reliability, RAV4 for adventure, Prius for efficiency, and Tacoma for work. What type of vehicle are you looking for? (sedan, SUV, truck, hybrid, etc.)",
+    ),
+    (
+        "financing",
+        ("loan", "financing", "finance", "financed", "payment", "prepayment", "monthly"),
+        "Toyota offers competitive financing options! We have special rates, flexible terms, and programs for various credit situations. You can use our loan calculator to estimate payments, or I can help you understand the difference between loans and leases. What's your budget range?",
+    ),
+    (
+        "lease",
+        ("lease", "leased", "leasing", "rent", "rental", "rented", "renting"),
+        "Toyota leasing is a great option! You get lower monthly payments, the latest technology, and flexible terms. Our lease programs often include maintenance and warranty coverage. Would you like to compare lease vs loan options for your situation?",
+    ),
+    (
+        "hybrid_electric",
+        ("hybrid", "electric", "electricity", "ev", "evs", "prius", "fuel", "efficient", "efficiency", "mpg"),
+        "Toyota leads in hybrid technology! We offer the Prius, Camry Hybrid, RAV4 Hybrid, and more. These vehicles provide excellent fuel efficiency and environmental benefits. The Prius gets up to 58 MPG combined! Would you like information about specific hybrid models?",
+    ),
+    (
+        "pricing",
+        ("price", "priced", "pricing", "cost", "costly", "expensive", "cheap", "cheaper", "cheapest", "affordable",
+         "budget", "budgeting"),
+        "Toyota offers vehicles at various price points! The Corolla starts around $22,000, Camry around $26,000, and RAV4 around $28,000. We also have special offers and incentives. What's your budget range? I can recommend the best options for you.",
+    ),
+    (
+        "warranty_service",
+        ("warranty", "warranties", "toyotacare", "maintenance", "service", "serviced", "servicing", "repair",
+         "repaired", "repairing", "reliable", "reliability"),
+        "Toyota vehicles come with comprehensive warranties! We offer 3-year/36,000-mile basic warranty, 5-year/60,000-mile powertrain warranty, and ToyotaCare maintenance plans. Toyota is known for reliability and low maintenance costs. Would you like specific warranty details?",
+    ),
+)
+
+DEFAULT_RESPONSE = "I'm here to help with Toyota vehicles and financing! I can assist with vehicle recommendations, loan options, lease comparisons, pricing information, and more. What specific information would you like about Toyota vehicles or financing options?"
+
+
+def _trie_pattern(words) -> str:
+    """Regex alternation over `words` factored into a prefix trie (one branch per first letter)"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        # A word ending here makes the longer continuations optional (greedy, so longest wins)
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class FallbackResponder:
+    """Keyword-based responder over INTENTS, backed by one compiled regex"""
+
+    def __init__(self, intents=INTENTS, default: str = DEFAULT_RESPONSE):
+        self._priority: Dict[str, int] = {}
+        self._replies: Dict[str, str] = {}
+        self._intent_of: Dict[str, str] = {}
+        for rank, (name, keywords, reply) in enumerate(intents):
+            self._priority[name] = rank
+            self._replies[name] = reply
+            for keyword in keywords:
+                self._intent_of.setdefault(keyword, name)
+                # 3+ letter keywords also match their plural ("loans", "cars")
+                if len(keyword) >= 3:
+                    self._intent_of.setdefault(keyword + "s", name)
+        self._pattern = re.compile(r"\b(?:" + _trie_pattern(self._intent_of) + r")\b")
+        self._default = default
+
+    def classify(self, message: str) -> List[Tuple[str, int]]:
+        """
+        Matched intents with their keyword hit counts, ranked by intent priority
+        (the order of INTENTS). Empty when nothing matches.
+        """
+        hits: Dict[str, int] = {}
+        for keyword in self._pattern.findall(message.lower()):
+            intent = self._intent_of[keyword]
+            hits[intent] = hits.get(intent, 0) + 1
+        return sorted(hits.items(), key=lambda item: self._priority[item[0]])
+
+    def respond(self, message: str) -> str:
+        """Reply for the highest-ranked intent, or the default reply"""
+        matched = {self._intent_of[keyword] for keyword in self._pattern.findall(message.lower())}
+        if not matched:
+            return self._default
+        return self._replies[min(matched, key=self._priority.__getitem__)]
+
+
+# Shared, stateless instance
+fallback_responder = FallbackResponder()
@@ -0,0 +1,69 @@
+"""
+Gunicorn config for running the API on several worker processes.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+One uvicorn worker per core by default (WEB_CONCURRENCY overrides). The app
+is imported once in the master (preload_app) and forked, so workers start
+fast and share the imported modules' memory. Everything that must be
+per-process (LLM clients and HTTP pools, SQLite connections, the chatbot)
+is created lazily, after the fork.
+
+Settings are read in this order, first match wins: the process environment
+(shell, or the service's Environment/EnvironmentFile), then backend/.env
+(loaded here, before anything below reads a variable), then the defaults in
+this file. The config is evaluated in the master before the app is
+preloaded, so everything the app reads at import time is already settled;
+hooks such as on_starting run after the preload and must not set app
+settings. State the workers must agree on defaults to shared backends:
+- chat history in SQLite, each completed turn committed before replying
+- rate-limit counters and the second-level quote/response cache tiers in
+  the shared state store (SHARED_STATE_BACKEND=sqlite, or redis)
+- Prometheus metrics aggregated across workers (PROMETHEUS_MULTIPROC_DIR)
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+try:
+    from dotenv import load_dotenv
+    # Never overrides variables already set in the environment
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+except ImportError:
+    pass  # dotenv not available, use system env vars
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Chat turns wait on the LLM; keep workers alive through slow completions and streams
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot build up (jitter avoids restarting all at once)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "20000"))
+max_requests_jitter = max_requests // 10
+
+# Defaults only: the environment and .env were applied above
+os.environ.setdefault("CHATBOT_HISTORY_BACKEND", "sqlite")
+os.environ.setdefault("CHATBOT_HISTORY_FLUSH_PER_TURN", "true")
+os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "toyota-backend-metrics"))
+
+
+def on_starting(server):
+    # Metric files from a previous run would be summed into this one
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,280 @@
+"""
+Chat history storage for ToyotaFinanceChatbot.
+
+InMemoryHistoryStore keeps a bounded LRU of users with idle-session expiry.
+SQLiteHistoryStore persists history next to finance_inputs.db (WAL mode,
+batched writes) so it survives restarts and is shared by worker processes
+(set CHATBOT_HISTORY_FLUSH_PER_TURN so a turn is visible to all of them
+as soon as it completes).
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "chat_history.db"
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStore(ABC):
+    """Per-user chat history: append-only turns, trimmed to the last `max_messages`."""
+
+    def __init__(self, max_messages: int = 20):
+        self.max_messages = max_messages
+
+    @abstractmethod
+    def append(self, user_id: str, role: str, content: str) -> None:
+        """Append one message (role is "user" or "assistant")"""
+
+    @abstractmethod
+    def history(self, user_id: str) -> List[Dict[str, Any]]:
+        """All retained messages for a user, oldest first"""
+
+    @abstractmethod
+    def clear(self, user_id: str) -> bool:
+        """Drop a user's history; True if there was any"""
+
+    @abstractmethod
+    def active_users(self) -> int:
+        """Number of users with retained history"""
+
+    def recent(self, user_id: str, limit: int) -> List[Dict[str, Any]]:
+        """The last `limit` messages for a user"""
+        return self.history(user_id)[-limit:]
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _entry(role: str, content: str) -> Dict[str, Any]:
+        return {"role": role, "content": content, "timestamp": datetime.now().isoformat()}
+
+
+class InMemoryHistoryStore(HistoryStore):
+    """Process-local store capped at `max_users`; sessions idle past `idle_ttl_seconds` expire."""
+
+    def __init__(self, max_messages: int = 20, max_users: int = 10000, idle_ttl_seconds: float = 86400.0):
+        super().__init__(max_messages)
+        self.max_users = max_users
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._users: "OrderedDict[str, Tuple[float, Deque[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        # Users are kept in last-seen order, so expired sessions sit at the front
+        cutoff = now - self.idle_ttl_seconds
+        while self._users:
+            user_id, (last_seen, _) = next(iter(self._users.items()))
+            if last_seen > cutoff:
+                break
+            self._users.popitem(last=False)
+
+    def append(self, user_id: str, role: str, content: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            _, messages = self._users.pop(user_id, (now, None))
+            if messages is None:
+                messages = deque(maxlen=self.max_messages)
+            messages.append(self._entry(role, content))
+            self._users[user_id] = (now, messages)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def history(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._expire(time.monotonic())
+            item = self._users.get(user_id)
+            return list(item[1]) if item else []
+
+    def clear(self, user_id: str) -> bool:
+        with self._lock:
+            return self._users.pop(user_id, None) is not None
+
+    def active_users(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._users)
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """
+    SQLite-backed store. Appends are buffered and written in one transaction
+    per batch (when `batch_size` messages are pending or every
+    `flush_interval` seconds); reads merge the pending buffer, so a worker
+    always sees its own writes. With `flush_per_turn`, an assistant message
+    flushes immediately, so each completed turn is committed (user message
+    and reply in one transaction) before the response is returned and the
+    user's next request can land on any worker.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_DB_PATH,
+        max_messages: int = 20,
+        idle_ttl_seconds: float = 86400.0,
+        batch_size: int = 32,
+        flush_interval: float = 1.0,
+        flush_per_turn: bool = False,
+    ):
+        super().__init__(max_messages)
+        self.path = str(path)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_per_turn = flush_per_turn
+        self._pending: List[Tuple[str, str, str, str]] = []
+        self._lock = threading.RLock()
+        self._last_purge = 0.0
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chat_messages (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 user_id TEXT NOT NULL,
+                 role TEXT NOT NULL,
+                 content TEXT NOT NULL,
+                 timestamp TEXT NOT NULL
+               )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_messages_user_ts ON chat_messages (user_id, timestamp)"
+        )
+
+        self._stop = threading.Event()
+        if flush_interval > 0:
+            threading.Thread(target=self._flush_loop, name="history-flush", daemon=True).start()
+        atexit.register(self.close)
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            # A failed flush (SQLITE_BUSY past busy_timeout, disk full, ...) keeps
+            # its rows pending; the next tick retries
+            self._try_flush()
+
+    def _try_flush(self) -> bool:
+        try:
+            self.flush()
+            return True
+        except Exception as e:
+            logger.warning(f"chat history flush failed, {len(self._pending)} messages kept pending: {e}")
+            return False
+
+    def flush(self) -> None:
+        """Write pending messages, trim touched users to max_messages, purge idle sessions"""
+        with self._lock:
+            if self._pending:
+                batch, self._pending = self._pending, []
+                users = {row[0] for row in batch}
+                try:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    self._conn.executemany(
+                        "INSERT INTO chat_messages (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                        batch,
+                    )
+                    self._conn.executemany(
+                        """DELETE FROM chat_messages WHERE user_id = ? AND id NOT IN (
+                             SELECT id FROM chat_messages WHERE user_id = ?
+                             ORDER BY timestamp DESC, id DESC LIMIT ?)""",
+                        [(u, u, self.max_messages) for u in users],
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    self._pending[:0] = batch
+                    raise
+
+            now = time.monotonic()
+            if now - self._last_purge >= min(self.idle_ttl_seconds, 300):
+                self._last_purge = now
+                cutoff = (datetime.now() - timedelta(seconds=self.idle_ttl_seconds)).isoformat()
+                self._conn.execute(
+                    """DELETE FROM chat_messages WHERE user_id IN (
+                         SELECT user_id FROM chat_messages GROUP BY user_id HAVING MAX(timestamp) < ?)""",
+                    (cutoff,),
+                )
+
+    def append(self, user_id: str, role: str, content: str) -> None:
+        entry = self._entry(role, content)
+        with self._lock:
+            self._pending.append((user_id, role, content, entry["timestamp"]))
+            if (len(self._pending) >= self.batch_size or self.flush_interval <= 0
+                    or (self.flush_per_turn and role == "assistant")):
+                # Never fail the chat on a write error: the rows stay pending
+                # for the background flusher (or the next append) to retry
+                self._try_flush()
+
+    def history(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT role, content, timestamp FROM (
+                     SELECT id, role, content, timestamp FROM chat_messages WHERE user_id = ?
+                     ORDER BY timestamp DESC, id DESC LIMIT ?)
+                   ORDER BY timestamp, id""",
+                (user_id, self.max_messages),
+            ).fetchall()
+            rows += [(r, c, ts) for u, r, c, ts in self._pending if u == user_id]
+        return [{"role": r, "content": c, "timestamp": ts} for r, c, ts in rows[-self.max_messages:]]
+
+    def clear(self, user_id: str) -> bool:
+        with self._lock:
+            had_pending = any(row[0] == user_id for row in self._pending)
+            self._pending = [row for row in self._pending if row[0] != user_id]
+            cur = self._conn.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
+            return had_pending or cur.rowcount > 0
+
+    def active_users(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(DISTINCT user_id) FROM chat_messages").fetchone()
+            pending = {row[0] for row in self._pending}
+            if pending:
+                placeholders = ",".join("?" * len(pending))
+                (stored,) = self._conn.execute(
+                    f"SELECT COUNT(DISTINCT user_id) FROM chat_messages WHERE user_id IN ({placeholders})",
+                    tuple(pending),
+                ).fetchone()
+                count += len(pending) - stored
+            return count
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        try:
+            self._try_flush()
+        finally:
+            self._conn.close()
+
+
+def create_history_store() -> HistoryStore:
+    """Build the store selected by CHATBOT_HISTORY_BACKEND (memory | sqlite)"""
+    backend = os.getenv("CHATBOT_HISTORY_BACKEND", "memory").lower()
+    max_messages = int(os.getenv("CHATBOT_HISTORY_MAX_MESSAGES", "20"))
+    idle_ttl = float(os.getenv("CHATBOT_HISTORY_IDLE_TTL_SECONDS", "86400"))
+    if backend == "sqlite":
+        return SQLiteHistoryStore(
+            path=os.getenv("CHATBOT_HISTORY_DB", str(DEFAULT_DB_PATH)),
+            max_messages=max_messages,
+            idle_ttl_seconds=idle_ttl,
+            batch_size=int(os.getenv("CHATBOT_HISTORY_BATCH_SIZE", "32")),
+            flush_interval=float(os.getenv("CHATBOT_HISTORY_FLUSH_SECONDS", "1.0")),
+            flush_per_turn=os.getenv("CHATBOT_HISTORY_FLUSH_PER_TURN", "false").lower() in ("1", "true", "yes", "on"),
+        )
+    return InMemoryHistoryStore(
+        max_messages=max_messages,
+        max_users=int(os.getenv("CHATBOT_HISTORY_MAX_USERS", "10000")),
+        idle_ttl_seconds=idle_ttl,
+    )
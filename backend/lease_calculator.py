@@ -1,6 +1,6 @@
 from __future__ import annotations
 from decimal import Decimal, ROUND_HALF_UP, getcontext
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Sequence
 
 getcontext().prec = 28
 
@@ -10,12 +10,14 @@ def _D(x) -> Decimal:
 def _q2(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-def _residual_rate_for_term(term_months: int) -> Decimal:
-    t = int(term_months)
-    table = {24: Decimal("0.68"), 30: Decimal("0.64"), 36: Decimal("0.58"),
-             39: Decimal("0.56"), 42: Decimal("0.54"), 48: Decimal("0.50")}
-    if t in table:
-        return table[t]
+_RESIDUAL_ANCHORS = {24: Decimal("0.68"), 30: Decimal("0.64"), 36: Decimal("0.58"),
+                     39: Decimal("0.56"), 42: Decimal("0.54"), 48: Decimal("0.50")}
+
+MAX_BULK_QUOTES = 10_000
+
+def _compute_residual_rate(t: int) -> Decimal:
+    if t in _RESIDUAL_ANCHORS:
+        return _RESIDUAL_ANCHORS[t]
     if t < 24:
         return Decimal("0.70")
     if t > 60:
@@ -27,17 +29,21 @@ def _residual_rate_for_term(term_months: int) -> Decimal:
     drop = (hi_r - lo_r) * Decimal((t - hi_t) / span)
     return (hi_r - drop).quantize(Decimal("0.0001"))
 
-def build_lease_chartjs_data_no_tax(
-    *,
+# Every term the UI and dealer tools can ask for, resolved once at import.
+_RESIDUAL_RATES: Dict[int, Decimal] = {t: _compute_residual_rate(t) for t in range(1, 121)}
+
+def _residual_rate_for_term(term_months: int) -> Decimal:
+    t = int(term_months)
+    rate = _RESIDUAL_RATES.get(t)
+    return rate if rate is not None else _compute_residual_rate(t)
+
+def lease_figures(
     vehicle_amount: float | Decimal,
     term_months: int,
-    money_factor: float | Decimal = 0.00190,  # ~4.56% APR
-    acquisition_fee: float | Decimal = 695.00,
+    money_factor: float | Decimal,
+    acquisition_fee: float | Decimal,
 ) -> Dict[str, Any]:
-    """
-    Lease breakdown WITHOUT applying sales tax anywhere.
-    Returns Chart.js-ready stacked bars (Depreciation + Finance) and cumulative totals.
-    """
+    """Closed-form lease figures (Decimal); every period of a no-tax lease is identical."""
     cap_cost = _q2(_D(vehicle_amount))
     mf = _D(money_factor)
     acq = _q2(_D(acquisition_fee))
@@ -51,67 +57,84 @@ def build_lease_chartjs_data_no_tax(
 
     depreciation = _q2((adj_cap_cost - residual_value) / Decimal(n))
     finance = _q2((adj_cap_cost + residual_value) * mf)
-    payment_total = _q2(depreciation + finance)
+    return {
+        "cap_cost": cap_cost,
+        "n": n,
+        "mf": mf,
+        "acq": acq,
+        "resid_rate": resid_rate,
+        "residual_value": residual_value,
+        "depreciation": depreciation,
+        "finance": finance,
+        "payment_total": _q2(depreciation + finance),
+    }
+
+def _lease_totals(f: Dict[str, Any]) -> Dict[str, Any]:
+    n = f["n"]
+    return {
+        "vehicle_amount": float(f["cap_cost"]),
+        "term_months": n,
+        "residual_rate": float(f["resid_rate"]),
+        "residual_value": float(f["residual_value"]),
+        "money_factor": float(f["mf"]),
+        "apr_percent_est": float(_q2(f["mf"] * Decimal(2400))),
+        "acquisition_fee_financed": float(f["acq"]),
+        "monthly_depreciation": float(f["depreciation"]),
+        "monthly_finance": float(f["finance"]),
+        "monthly_payment_total": float(f["payment_total"]),
+        "total_depreciation": float(f["depreciation"] * n),
+        "total_finance": float(f["finance"] * n),
+        "total_paid": float(f["payment_total"] * n),
+    }
+
+def build_lease_chartjs_data_no_tax(
+    *,
+    vehicle_amount: float | Decimal,
+    term_months: int,
+    money_factor: float | Decimal = 0.00190,  # ~4.56% APR
+    acquisition_fee: float | Decimal = 695.00,
+) -> Dict[str, Any]:
+    """
+    Lease breakdown WITHOUT applying sales tax anywhere.
+    Returns Chart.js-ready stacked bars (Depreciation + Finance) and cumulative totals.
+    """
+    return lease_payload(lease_figures(vehicle_amount, term_months, money_factor, acquisition_fee))
 
-    labels: List[str] = [str(i) for i in range(1, n + 1)]
-    dep_series = [depreciation] * n
-    fin_series = [finance] * n
-    pay_series = [payment_total] * n
 
-    cumulative_finance, cumulative_total = [], []
-    cum_f = cum_t = Decimal("0.00")
-    for i in range(n):
-        cum_f += fin_series[i]
-        cum_t += pay_series[i]
-        cumulative_finance.append(_q2(cum_f))
-        cumulative_total.append(_q2(cum_t))
+def lease_payload(f: Dict[str, Any]) -> Dict[str, Any]:
+    """build_lease_chartjs_data_no_tax payload for lease_figures()"""
+    totals = _lease_totals(f)
+    n = f["n"]
 
-    total_depreciation = _q2(depreciation * n)
-    total_finance = _q2(finance * n)
-    total_paid = _q2(payment_total * n)
+    # Per-period values are constant, so cumulative series are k * monthly (in cents).
+    dep_c = int(f["depreciation"] * 100)
+    fin_c = int(f["finance"] * 100)
+    pay_c = int(f["payment_total"] * 100)
+    periods = range(1, n + 1)
 
     chartjs = {
-        "labels": labels,
+        "labels": [str(k) for k in periods],
         "datasets": [
             {"label": "Depreciation", "type": "bar", "stack": "lease",
-             "data": [float(x) for x in dep_series]},
+             "data": [dep_c / 100] * n},
             {"label": "Finance (Rent)", "type": "bar", "stack": "lease",
-             "data": [float(x) for x in fin_series]},
+             "data": [fin_c / 100] * n},
         ]
     }
 
     timeseries = {
-        "cumulative_finance": [float(x) for x in cumulative_finance],
-        "cumulative_total_paid": [float(x) for x in cumulative_total],
-        "payment_total_per_month": [float(x) for x in pay_series],
+        "cumulative_finance": [fin_c * k / 100 for k in periods],
+        "cumulative_total_paid": [pay_c * k / 100 for k in periods],
+        "payment_total_per_month": [pay_c / 100] * n,
     }
 
-    totals = {
-        "vehicle_amount": float(cap_cost),
-        "term_months": n,
-        "residual_rate": float(resid_rate),
-        "residual_value": float(residual_value),
-        "money_factor": float(mf),
-        "apr_percent_est": float(_q2(mf * Decimal(2400))),
-        "acquisition_fee_financed": float(acq),
-        "monthly_depreciation": float(depreciation),
-        "monthly_finance": float(finance),
-        "monthly_payment_total": float(payment_total),
-        "total_depreciation": float(total_depreciation),
-        "total_finance": float(total_finance),
-        "total_paid": float(total_paid),
+    row = {
+        "depreciation": totals["monthly_depreciation"],
+        "finance": totals["monthly_finance"],
+        "payment_total": totals["monthly_payment_total"],
+        "residual_value_end": totals["residual_value"],
     }
-
-    schedule = [
-        {
-            "period": i + 1,
-            "depreciation": float(depreciation),
-            "finance": float(finance),
-            "payment_total": float(payment_total),
-            "residual_value_end": float(residual_value),
-        }
-        for i in range(n)
-    ]
+    schedule = [{"period": k, **row} for k in periods]
 
     return {
         "meta": {"notes": ["Tax intentionally excluded for parity with a tax-free loan setup."]},
@@ -120,3 +143,23 @@ def build_lease_chartjs_data_no_tax(
         "totals": totals,
         "schedule": schedule,
     }
+
+
+def build_lease_quotes_bulk(quotes: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Price many (vehicle_amount, term_months, money_factor, acquisition_fee) tuples.
+    Returns the `totals` block of build_lease_chartjs_data_no_tax for each, in order.
+    """
+    if not quotes:
+        raise ValueError("at least one quote is required")
+    if len(quotes) > MAX_BULK_QUOTES:
+        raise ValueError(f"at most {MAX_BULK_QUOTES} quotes per request")
+    return [
+        _lease_totals(lease_figures(
+            q["vehicle_amount"],
+            q["term_months"],
+            q.get("money_factor", 0.00190),
+            q.get("acquisition_fee", 695.00),
+        ))
+        for q in quotes
+    ]
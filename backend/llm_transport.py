@@ -0,0 +1,87 @@
+"""
+Shared HTTP transport for the LLM provider SDKs (OpenAI, Azure OpenAI, Anthropic).
+
+One keep-alive connection pool per process (sync and async), handed to every
+SDK client via `http_client=`, so chat turns reuse warm TLS connections
+instead of each client opening its own. HTTP/2 is used when the `h2`
+package is installed. Pool size and timeouts come from LLM_HTTP_* env vars.
+"""
+
+import atexit
+import os
+import threading
+from typing import Optional
+
+import httpx
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 unless disabled with LLM_HTTP2=false or the h2 package is missing"""
+    if os.getenv("LLM_HTTP2", "true").lower() not in ("1", "true", "yes", "on"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def timeout() -> httpx.Timeout:
+    """Connect/read/write/pool timeouts; reads are long because completions can take a while"""
+    return httpx.Timeout(
+        float(os.getenv("LLM_HTTP_READ_TIMEOUT", "60")),
+        connect=float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5")),
+        write=float(os.getenv("LLM_HTTP_WRITE_TIMEOUT", "10")),
+        pool=float(os.getenv("LLM_HTTP_POOL_TIMEOUT", "10")),
+    )
+
+
+def limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "30")),
+    )
+
+
+def http_client() -> httpx.Client:
+    """Process-wide sync pool, created on first use"""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(http2=http2_enabled(), limits=limits(), timeout=timeout())
+    return _sync_client
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """Process-wide async pool, created on first use (used from the server's event loop)"""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = httpx.AsyncClient(http2=http2_enabled(), limits=limits(), timeout=timeout())
+    return _async_client
+
+
+async def aclose() -> None:
+    """Close both pools; call from the app's shutdown hook"""
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+    close()
+
+
+def close() -> None:
+    global _sync_client
+    client, _sync_client = _sync_client, None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close)
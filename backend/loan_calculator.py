@@ -1,6 +1,10 @@
 from __future__ import annotations
+import os
 from decimal import Decimal, ROUND_HALF_UP, getcontext
-from typing import Dict, Any, List
+from itertools import product
+from typing import Callable, Dict, Any, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
 
 # Money math setup
 getcontext().prec = 28
@@ -22,6 +26,11 @@ def _D(x) -> Decimal:
 def _q2(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
+# Amortization engine: "decimal" (reference) or "cents" (integer fast path, identical output)
+LOAN_ENGINES = ("decimal", "cents")
+LOAN_ENGINE = os.getenv("LOAN_ENGINE", "decimal").lower()
+
+
 def build_loan_chartjs_data(
     *,
     vehicle_amount: float | Decimal,            # <-- added parameter
@@ -29,6 +38,7 @@ def build_loan_chartjs_data(
     term_months: int,
     apr_percent: float | Decimal,
     tax_rate: float | Decimal = 0.0825,         # Dallas combined 8.25% as default
+    engine: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Compute a vehicle LOAN breakdown (monthly-tax visualization) and return a Chart.js-ready payload.
@@ -39,9 +49,39 @@ def build_loan_chartjs_data(
       - term_months: loan term in months
       - apr_percent: APR percentage (e.g., 4.5 for 4.5%)
       - tax_rate: monthly tax on each base payment (default 0.0825 for Dallas)
+      - engine: "decimal" or "cents" (defaults to LOAN_ENGINE); both return identical payloads
 
     Note: For visualization, sales tax is applied monthly to each payment per your spec.
     """
+    return amortize(loan_terms(vehicle_amount, down_payment_cash, term_months, apr_percent, tax_rate), engine)
+
+
+class LoanTerms(NamedTuple):
+    """Normalized loan inputs with the base payment and monthly tax (Decimal)"""
+    vehicle_amt: Decimal
+    dp: Decimal
+    n: int
+    apr: Decimal
+    tax: Decimal
+    financed: Decimal
+    i: Decimal              # monthly rate
+    payment_base: Decimal
+    monthly_tax: Decimal
+
+
+def amortize(terms: LoanTerms, engine: Optional[str] = None) -> Dict[str, Any]:
+    """
+    build_loan_chartjs_data payload for `terms`, amortized by `engine`
+    ("decimal" or "cents", default LOAN_ENGINE); schedule values are Decimal.
+    """
+    engine = (engine or LOAN_ENGINE).lower()
+    if engine not in LOAN_ENGINES:
+        raise ValueError(f"engine must be one of {LOAN_ENGINES}")
+    return _amortize_cents(terms) if engine == "cents" else _amortize_decimal(terms)
+
+
+def loan_terms(vehicle_amount, down_payment_cash, term_months, apr_percent, tax_rate) -> LoanTerms:
+    """Normalized inputs, base payment and monthly tax (Decimal), shared by both engines."""
     # ---------- Normalize inputs ----------
     vehicle_amt = _q2(_D(vehicle_amount))
     dp = _q2(_D(down_payment_cash))
@@ -66,6 +106,28 @@ def build_loan_chartjs_data(
 
     # Monthly tax applied to payment (per your requirement; demo visualization)
     monthly_tax = _q2(payment_base * tax)
+    return LoanTerms(vehicle_amt, dp, n, apr, tax, financed, i, payment_base, monthly_tax)
+
+
+def _loan_payload(chartjs, timeseries, totals, schedule) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "mode": "monthly_tax_visualization",
+            "notes": [
+                "Dallas default tax 8.25% applied to each monthly payment for visualization.",
+                "This is for demo/visualization; lenders/dealers may apply taxes differently."
+            ]
+        },
+        "chartjs": chartjs,
+        "timeseries": timeseries,
+        "totals": totals,
+        "schedule": schedule,
+    }
+
+
+def _amortize_decimal(terms: LoanTerms) -> Dict[str, Any]:
+    """The reference engine: Decimal amortization of loan_terms() (schedule values stay Decimal)."""
+    vehicle_amt, dp, n, apr, tax, financed, i, payment_base, monthly_tax = terms
     monthly_payment_total = _q2(payment_base + monthly_tax)
 
     # ---------- Amortization loop ----------
@@ -173,16 +235,346 @@ def build_loan_chartjs_data(
         "principal_repaid": float(financed),
     }
 
+    return _loan_payload(chartjs, timeseries, totals, schedule)
+
+
+# ---------- Integer-cents engine ----------
+#
+# Money is carried as int cents. The only inexact Decimal step in the loop is
+# interest = _q2(balance * i): Decimal first rounds the exact product to the
+# context precision (28 significant digits, ROUND_HALF_EVEN) and _q2 then
+# rounds half-up to cents. _product_cents replays both roundings on integers,
+# so every period matches the Decimal engine exactly.
+
+_PREC = getcontext().prec
+_POW10 = [10 ** k for k in range(2 * _PREC + 16)]
+_CENT = Decimal("0.01")
+
+
+def _product_cents(units: int, coef: int, exp: int) -> int:
+    """_q2(Decimal(units).scaleb(exp) * coef) for non-negative ints, in cents."""
+    p = units * coef
+    if p >= _POW10[_PREC]:
+        drop = len(str(p)) - _PREC
+        p, r = divmod(p, _POW10[drop])
+        half = _POW10[drop] >> 1
+        if r > half or (r == half and p & 1):
+            p += 1
+        exp += drop
+    if exp >= -2:
+        return p * _POW10[exp + 2]
+    scale = _POW10[-2 - exp]
+    q, r = divmod(p, scale)
+    return q + 1 if 2 * r >= scale else q
+
+
+def _amortize_cents(terms: LoanTerms) -> Dict[str, Any]:
+    vehicle_amt, dp, n, apr, tax, financed, i, payment_base, monthly_tax = terms
+    fin = _cents(financed)
+    pb = _cents(payment_base)
+    mt = _cents(monthly_tax)
+    if i > 0:
+        sign, digits, exponent = i.as_tuple()
+        coef, exp = int("".join(map(str, digits))), exponent - 2   # balance is in cents (10^-2)
+    else:
+        coef, exp = 0, 0
+
+    labels: List[str] = []
+    principal_series: List[float] = []
+    interest_series: List[float] = []
+    cumulative_interest_series: List[float] = []
+    cumulative_total_series: List[float] = []
+    payment_total_per_month: List[float] = []
+    schedule: List[Dict[str, Any]] = []
+
+    balance = fin
+    cum_interest = 0
+    cum_total_paid = 0
+    for k in range(1, n + 1):
+        interest = _product_cents(balance, coef, exp) if coef else 0
+        principal = pb - interest
+        # Guard final period rounding
+        if principal > balance:
+            principal = balance
+            payment_this_base = interest + principal
+            payment_dec = Decimal(payment_this_base) * _CENT
+        else:
+            payment_this_base = pb
+            payment_dec = payment_base
+        balance -= principal
+        payment_total = payment_this_base + mt
+
+        cum_interest += interest
+        cum_total_paid += payment_total
+        labels.append(str(k))
+        principal_series.append(principal / 100)
+        interest_series.append(interest / 100)
+        cumulative_interest_series.append(cum_interest / 100)
+        cumulative_total_series.append(cum_total_paid / 100)
+        payment_total_per_month.append(payment_total / 100)
+
+        schedule.append({
+            "period": k,
+            "payment_base": payment_dec,
+            "interest": Decimal(interest) * _CENT,
+            "principal": Decimal(principal) * _CENT,
+            "tax": monthly_tax,
+            "payment_total": Decimal(payment_total) * _CENT,
+            "balance_end": Decimal(balance) * _CENT
+        })
+
+    chartjs = {
+        "labels": labels,
+        "datasets": [
+            {"label": "Principal", "type": "bar", "stack": "payment", "data": principal_series},
+            {"label": "Interest", "type": "bar", "stack": "payment", "data": interest_series},
+            {"label": "Tax", "type": "bar", "stack": "payment", "data": [mt / 100] * n},
+        ]
+    }
+
+    timeseries = {
+        "cumulative_interest": cumulative_interest_series,
+        "cumulative_total_paid": cumulative_total_series,
+        "payment_total_per_month": payment_total_per_month,
+    }
+
+    totals = {
+        "vehicle_amount": float(vehicle_amt),
+        "down_payment_cash": float(dp),
+        "amount_financed": fin / 100,
+        "apr_percent": float(_q2(apr * 100)),
+        "term_months": n,
+        "tax_rate": float(_q2(tax)),
+        "monthly_payment_base": pb / 100,
+        "monthly_tax": mt / 100,
+        "monthly_payment_total": (pb + mt) / 100,
+        "total_interest": cum_interest / 100,
+        "total_tax_paid": mt * n / 100,
+        "total_paid_including_tax": cum_total_paid / 100,
+        "customer_due_at_signing": float(dp),
+        "principal_repaid": fin / 100,
+    }
+
+    return _loan_payload(chartjs, timeseries, totals, schedule)
+
+
+# ---------- Batch engine (NumPy) ----------
+#
+# Schedules are carried in integer cents and stepped one period at a time across
+# every scenario at once. Rounding is done in float64 and any value that lands
+# within _HALF_TOL cents of a .5 tie is recomputed with the Decimal formula used
+# by build_loan_chartjs_data, so the output matches it cent for cent.
+
+_HALF_TOL = 1e-3          # cents
+MAX_BATCH_SCENARIOS = 10_000
+
+
+def _cents(x: Decimal) -> int:
+    return int(x * 100)
+
+
+def _half_up_cents(x: np.ndarray, exact: Callable[[int], int]) -> np.ndarray:
+    """Round float cents half-up; entries too close to a tie are resolved by `exact(index)`."""
+    floor = np.floor(x)
+    out = (floor + (x - floor >= 0.5)).astype(np.int64)
+    for idx in np.flatnonzero(np.abs(x - floor - 0.5) < _HALF_TOL):
+        out[idx] = exact(int(idx))
+    return out
+
+
+def expand_loan_grid(
+    *,
+    vehicle_amounts: Sequence[float | Decimal],
+    down_payments: Sequence[float | Decimal] = (0,),
+    term_months: Sequence[int],
+    apr_percents: Sequence[float | Decimal],
+    tax_rate: float | Decimal = 0.0825,
+) -> List[Dict[str, Any]]:
+    """Cartesian product of the grid axes as a list of scenario dicts."""
+    size = len(vehicle_amounts) * len(down_payments) * len(term_months) * len(apr_percents)
+    if size > MAX_BATCH_SCENARIOS:
+        raise ValueError(f"grid expands to {size} scenarios; at most {MAX_BATCH_SCENARIOS} per batch")
+    return [
+        {
+            "vehicle_amount": v,
+            "down_payment_cash": dp,
+            "term_months": n,
+            "apr_percent": apr,
+            "tax_rate": tax_rate,
+        }
+        for v, dp, n, apr in product(vehicle_amounts, down_payments, term_months, apr_percents)
+    ]
+
+
+def price_loan_batch(
+    scenarios: Sequence[Mapping[str, Any]],
+    *,
+    include_schedule: bool = False,
+) -> Dict[str, Any]:
+    """
+    Price many loan scenarios in one pass and return the results as columns.
+
+    Money is in integer cents (int64 arrays with one entry per scenario):
+    financed, payment_base, monthly_tax, total_interest, total_paid; plus
+    terms, and the normalized Decimal inputs vehicle_amount, down_payment_cash,
+    rate (monthly) and tax_rate. With include_schedule, `schedule` maps
+    payment_base/interest/principal/balance_end to (max term, scenarios)
+    arrays; periods past a scenario's term are zero.
+    """
+    s = len(scenarios)
+    if s == 0:
+        raise ValueError("at least one scenario is required")
+    if s > MAX_BATCH_SCENARIOS:
+        raise ValueError(f"at most {MAX_BATCH_SCENARIOS} scenarios per batch")
+
+    # ---------- Normalize inputs (per scenario, Decimal) ----------
+    vehicle_amt: List[Decimal] = []
+    dp: List[Decimal] = []
+    rates: List[Decimal] = []
+    taxes: List[Decimal] = []
+    terms = np.empty(s, dtype=np.int64)
+    financed = np.empty(s, dtype=np.int64)
+    for k, sc in enumerate(scenarios):
+        v = _q2(_D(sc.get("vehicle_amount", 0)))
+        d = _q2(_D(sc.get("down_payment_cash", 0)))
+        n = int(sc["term_months"])
+        if n <= 0:
+            raise ValueError("term_months must be > 0")
+        vehicle_amt.append(v)
+        dp.append(d)
+        rates.append(_D(sc["apr_percent"]) / Decimal(100) / Decimal(12))
+        taxes.append(_D(sc.get("tax_rate", 0.0825)))
+        terms[k] = n
+        financed[k] = max(_cents(v - d), 0)
+
+    i = np.array([float(r) for r in rates])
+    tax = np.array([float(t) for t in taxes])
+    zero_rate = i == 0
+
+    # ---------- Base payment (no tax) ----------
+    def _exact_payment(k: int) -> int:
+        fin, r, n = Decimal(int(financed[k])) / 100, rates[k], int(terms[k])
+        if r == 0:
+            return _cents(_q2(fin / Decimal(n)))
+        return _cents(_q2(r * fin / (Decimal(1) - (Decimal(1) + r) ** (Decimal(-n)))))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = -np.expm1(-terms * np.log1p(i))
+        raw_payment = np.where(zero_rate, financed / terms, i * financed / annuity)
+    payment_base = _half_up_cents(raw_payment, _exact_payment)
+
+    monthly_tax = _half_up_cents(
+        payment_base * tax,
+        lambda k: _cents(_q2(Decimal(int(payment_base[k])) / 100 * taxes[k])),
+    )
+
+    # ---------- Amortization loop (vectorized across scenarios) ----------
+    max_n = int(terms.max())
+    balance = financed.copy()
+    total_interest = np.zeros(s, dtype=np.int64)
+    total_paid = np.zeros(s, dtype=np.int64)
+    if include_schedule:
+        sched = {key: np.zeros((max_n, s), dtype=np.int64)
+                 for key in ("payment_base", "interest", "principal", "balance_end")}
+
+    for k in range(1, max_n + 1):
+        active = terms >= k
+        interest = _half_up_cents(
+            balance * i,
+            lambda j: _cents(_q2(Decimal(int(balance[j])) / 100 * rates[j])),
+        )
+        interest[zero_rate] = 0
+        principal = payment_base - interest
+        over = principal > balance
+        principal = np.where(over, balance, principal)
+        payment_this_base = np.where(over, interest + principal, payment_base)
+
+        interest *= active
+        principal *= active
+        payment_this_base *= active
+        balance -= principal
+
+        total_interest += interest
+        total_paid += payment_this_base + monthly_tax * active
+        if include_schedule:
+            sched["payment_base"][k - 1] = payment_this_base
+            sched["interest"][k - 1] = interest
+            sched["principal"][k - 1] = principal
+            sched["balance_end"][k - 1] = balance
+
     return {
-        "meta": {
-            "mode": "monthly_tax_visualization",
-            "notes": [
-                "Dallas default tax 8.25% applied to each monthly payment for visualization.",
-                "This is for demo/visualization; lenders/dealers may apply taxes differently."
-            ]
-        },
-        "chartjs": chartjs,
-        "timeseries": timeseries,
-        "totals": totals,
-        "schedule": schedule,
+        "terms": terms,
+        "financed": financed,
+        "payment_base": payment_base,
+        "monthly_tax": monthly_tax,
+        "total_interest": total_interest,
+        "total_paid": total_paid,
+        "vehicle_amount": vehicle_amt,
+        "down_payment_cash": dp,
+        "rate": rates,
+        "tax_rate": taxes,
+        "schedule": sched if include_schedule else None,
     }
+
+
+def build_loan_batch(
+    scenarios: Sequence[Mapping[str, Any]],
+    *,
+    include_schedule: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Price many loan scenarios in one pass.
+
+    Each scenario takes the same keyword inputs as build_loan_chartjs_data.
+    Returns one row per scenario holding its `totals` (identical to the single
+    calculator) and, when include_schedule is set, its `schedule`.
+    """
+    batch = price_loan_batch(scenarios, include_schedule=include_schedule)
+    terms, vehicle_amt, dp = batch["terms"], batch["vehicle_amount"], batch["down_payment_cash"]
+    rates, taxes, sched = batch["rate"], batch["tax_rate"], batch["schedule"]
+    s = len(terms)
+
+    # ---------- Rows ----------
+    fin, pbs, mts = batch["financed"].tolist(), batch["payment_base"].tolist(), batch["monthly_tax"].tolist()
+    ti, tp = batch["total_interest"].tolist(), batch["total_paid"].tolist()
+    if include_schedule:
+        cols = {key: arr.T.tolist() for key, arr in sched.items()}
+
+    rows: List[Dict[str, Any]] = []
+    for k in range(s):
+        n, pb, mt = int(terms[k]), pbs[k], mts[k]
+        row: Dict[str, Any] = {
+            "totals": {
+                "vehicle_amount": float(vehicle_amt[k]),
+                "down_payment_cash": float(dp[k]),
+                "amount_financed": fin[k] / 100,
+                "apr_percent": float(_q2(rates[k] * Decimal(12) * 100)),
+                "term_months": n,
+                "tax_rate": float(_q2(taxes[k])),
+                "monthly_payment_base": pb / 100,
+                "monthly_tax": mt / 100,
+                "monthly_payment_total": (pb + mt) / 100,
+                "total_interest": ti[k] / 100,
+                "total_tax_paid": mt * n / 100,
+                "total_paid_including_tax": tp[k] / 100,
+                "customer_due_at_signing": float(dp[k]),
+                "principal_repaid": fin[k] / 100,
+            }
+        }
+        if include_schedule:
+            pay, intr, prin, bal = (cols[key][k] for key in
+                                    ("payment_base", "interest", "principal", "balance_end"))
+            row["schedule"] = [
+                {
+                    "period": p + 1,
+                    "payment_base": pay[p] / 100,
+                    "interest": intr[p] / 100,
+                    "principal": prin[p] / 100,
+                    "tax": mt / 100,
+                    "payment_total": (pay[p] + mt) / 100,
+                    "balance_end": bal[p] / 100,
+                }
+                for p in range(n)
+            ]
+        rows.append(row)
+    return rows
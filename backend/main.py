@@ -1,18 +1,38 @@
 # main.py
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from fastapi.middleware.cors import CORSMiddleware  # <-- add this import
 
 
-from fastapi import FastAPI, HTTPException
-from schemas import ChatRequest, Turn, LoanChartRequest, GetInterest, LeaseChartRequest
-from loan_calculator import build_loan_chartjs_data
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from schemas import ChatRequest, Turn, LoanChartRequest, GetInterest, GetInterestBatchRequest, LeaseChartRequest, LoanBatchRequest, LeaseBulkRequest, CompareRequest, RecommendationRequest, LoanAffordabilityRequest, LeaseAffordabilityRequest, ProfileRequest, ProfileBulkRequest
+from loan_calculator import build_loan_batch, expand_loan_grid
 from credit_score_calculator import apr_percent_from_credit_score
-from lease_calculator import build_lease_chartjs_data_no_tax
+from rate_card import get_rate_card_store, get_rate_cards
+from lease_calculator import build_lease_quotes_bulk
+from compare_calculator import build_lease_loan_comparison
+from affordability_calculator import lease_affordability, loan_affordability
+from recommender import profiles_from_records, recommend
+from profile_repository import get_profile_repository
+from quote_export import MEDIA_TYPES, iter_export, scenarios_from_profiles
+from quote_cache import cached_lease_quote, cached_loan_quote, dumps, parse_fields, quote_cache_stats
 from chatbot import get_chatbot
+import llm_transport
+import metrics
+import tracing
+from rate_limiter import RateLimiter, create_rate_limiter
+from shared_state import state_stats
 
 app = FastAPI(title="Toyota Hackathon Backend")
+app.router.route_class = tracing.TracedRoute  # sync handlers join the request's profile
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],          # allow all origins
@@ -21,13 +41,65 @@ app.add_middleware(
     allow_credentials=False,      # must be False when using "*" for origins
     # expose_headers can be set if you need browsers to read custom headers:
     # expose_headers=["Content-Disposition"]
+    expose_headers=["X-Trace-Id", "traceparent"],
 )
+# Trace ID, spans, slow-request log and the opt-in profiler (see tracing.py)
+app.add_middleware(tracing.TracingMiddleware)
+
+
+# Per-minute request limits; counters live in the shared state store so they hold across workers
+chat_limiter = create_rate_limiter("chat")
+calculator_limiter = create_rate_limiter("calculator")
+
+
+def _enforce_rate_limit(limiter: RateLimiter, key: str) -> None:
+    """429 with Retry-After once `key` is over the limiter's budget for the current minute"""
+    if not limiter.enabled:
+        return
+    decision = limiter.hit(key)
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {decision.limit} requests per minute",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+
+
+def calculator_rate_limit(request: Request) -> None:
+    """Route dependency: per-client-address limit for the calculator endpoints"""
+    _enforce_rate_limit(calculator_limiter, request.client.host if request.client else "unknown")
+
+
+def _chat_rate_limit(body: Dict[str, Any], request: Request) -> None:
+    _enforce_rate_limit(chat_limiter, str(body.get("user_id") or (request.client.host if request.client else "unknown")))
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency histogram; streaming responses are timed to their first byte"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - start)
+
+
+@app.on_event("shutdown")
+async def close_llm_transport() -> None:
+    """Close the shared LLM connection pools"""
+    await llm_transport.aclose()
 
 
 @app.post("/chat")
-def chat(request: Dict[str, Any]) -> Dict[str, Any]:
+async def chat(request: Dict[str, Any], http_request: Request) -> Dict[str, Any]:
     """
-    Toyota Finance Chatbot endpoint
+    Toyota Finance Chatbot endpoint (async: the LLM round trip does not hold a worker thread)
     
     Expected request format:
     {
@@ -44,6 +116,8 @@ def chat(request: Dict[str, Any]) -> Dict[str, Any]:
         "model": "string"
     }
     """
+    # The limiter's counters live in the shared store (SQLite/Redis): count off the event loop
+    await asyncio.to_thread(_chat_rate_limit, request, http_request)
     try:
         user_id = request.get("user_id", "anonymous")
         message = request.get("message", "")
@@ -59,7 +133,7 @@ def chat(request: Dict[str, Any]) -> Dict[str, Any]:
         
         # Get chatbot instance and process message
         chatbot = get_chatbot()
-        response = chatbot.chat(user_id, message)
+        response = await chatbot.achat(user_id, message)
         
         return response
         
@@ -73,23 +147,90 @@ def chat(request: Dict[str, Any]) -> Dict[str, Any]:
             "error": str(e)
         }
 
-@app.post("/lease/calculator")
-def lease_calcular(body: LeaseChartRequest) -> Dict[str, Any]:
+@app.post("/chat/stream")
+async def chat_stream(request: Dict[str, Any], http_request: Request) -> StreamingResponse:
+    """
+    Streaming Toyota Finance Chatbot endpoint (Server-Sent Events)
+
+    Same request body as /chat. Emits one `data: {"delta": "..."}` event per
+    chunk of generated text, then `event: done` whose data matches the /chat
+    response object.
+    """
+    await asyncio.to_thread(_chat_rate_limit, request, http_request)
+    user_id = request.get("user_id", "anonymous")
+    message = request.get("message", "")
+
+    async def events():
+        if not message.strip():
+            yield _sse({"delta": "Please provide a message to chat with me!"})
+            yield _sse({
+                "response": "Please provide a message to chat with me!",
+                "user_id": user_id,
+                "timestamp": datetime.now().isoformat(),
+                "provider": "error",
+                "model": "none"
+            }, event="done")
+            return
+
+        chatbot = get_chatbot()
+        async for item in chatbot.astream_chat(user_id, message):
+            if item.pop("done", False):
+                yield _sse(item, event="done")
+            else:
+                yield _sse(item)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(data: Dict[str, Any], event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/lease/calculator", dependencies=[Depends(calculator_rate_limit)])
+def lease_calcular(body: LeaseChartRequest, fields: Optional[str] = None, schedule_format: str = "rows") -> Response:
     """
     Build Chart.js-ready lease breakdown WITHOUT tax.
+    Served from the quote cache when the same inputs were priced recently.
+
+    Query params (same as /loan/Calculator):
+      - fields          comma-separated subset of meta,chartjs,timeseries,totals,schedule
+      - schedule_format "rows" (list of per-period objects, default) or "columns"
     """
     try:
-        return build_lease_chartjs_data_no_tax(
+        content = cached_lease_quote(
             vehicle_amount=body.vehicle_amount,
             term_months=body.term_months,
             money_factor=body.money_factor,
             acquisition_fee=body.acquisition_fee,
+            fields=parse_fields(fields),
+            schedule_format=schedule_format,
         )
+        return Response(content=content, media_type="application/json")
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@app.post("/lease/calculator/bulk", dependencies=[Depends(calculator_rate_limit)])
+def lease_calcular_bulk(body: LeaseBulkRequest) -> Dict[str, Any]:
+    """
+    Price many leases in one call (dealer inventory page).
+
+    Returns:
+      { count, results: [totals] } in request order; each entry matches the
+      `totals` block of /lease/calculator.
+    """
+    try:
+        with metrics.calculator("lease_bulk"):
+            results = build_lease_quotes_bulk([q.model_dump(exclude_none=True) for q in body.quotes])
+        return {"count": len(results), "results": results}
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-@app.post("/loan/Calculator")
-def loan_calcular(body: LoanChartRequest) -> Dict[str, Any]:
+@app.post("/loan/Calculator", dependencies=[Depends(calculator_rate_limit)])
+def loan_calcular(body: LoanChartRequest, fields: Optional[str] = None, schedule_format: str = "rows") -> Response:
     """
     Build Chart.js-ready loan breakdown data.
 
@@ -99,29 +240,238 @@ def loan_calcular(body: LoanChartRequest) -> Dict[str, Any]:
       - apr_percent      (float, required)
       - tax_rate         (float, default 0.0825 for Dallas)
 
+    Query params:
+      - fields          comma-separated subset of meta,chartjs,timeseries,totals,schedule
+                        (e.g. ?fields=totals for just the summary)
+      - schedule_format "rows" (list of per-period objects, default) or "columns"
+                        (one array per schedule field)
+
     Returns:
-      Dict[str, Any] matching build_loan_chartjs_data output:
+      JSON matching build_loan_chartjs_data output:
         { meta, chartjs, timeseries, totals, schedule }
+      Served from the quote cache when the same inputs were priced recently.
     """
     try:
-        return build_loan_chartjs_data(
+        content = cached_loan_quote(
             vehicle_amount = body.vehicle_amount,
             down_payment_cash=body.down_payment_cash,
             term_months=body.term_months,
             apr_percent=body.apr_percent,
             tax_rate=body.tax_rate,
+            fields=parse_fields(fields),
+            schedule_format=schedule_format,
         )
+        return Response(content=content, media_type="application/json")
     except Exception as exc:
         # Surface validation/logic errors as 400s for the client
         raise HTTPException(status_code=400, detail=str(exc))
 
 
+@app.post("/loan/Calculator/batch", dependencies=[Depends(calculator_rate_limit)])
+def loan_calcular_batch(body: LoanBatchRequest) -> Dict[str, Any]:
+    """
+    Price many loan scenarios in one request.
 
-@app.post("/getInterest")
-def getInterest(body: GetInterest):
-    return {
-        "score" : apr_percent_from_credit_score(body.credit_score)
-    }
+    Inputs (JSON body):
+      - scenarios        (list of /loan/Calculator bodies, optional)
+      - grid             (vehicle_amounts x down_payments x term_months x apr_percents, optional)
+      - include_schedule (bool, default false)
+
+    Returns:
+      { count, results: [{ totals, schedule? }] } in scenario order, grid scenarios last.
+    """
+    try:
+        scenarios = [s.model_dump() for s in body.scenarios]
+        if body.grid is not None:
+            scenarios += expand_loan_grid(**body.grid.model_dump())
+        with metrics.calculator("loan_batch"):
+            results = build_loan_batch(scenarios, include_schedule=body.include_schedule)
+        return {"count": len(results), "results": results}
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@app.post("/loan/affordability", dependencies=[Depends(calculator_rate_limit)])
+def loan_affordability_quote(body: LoanAffordabilityRequest) -> Dict[str, Any]:
+    """
+    Largest vehicle amount each monthly budget (tax included) buys, per term.
+
+    Returns:
+      { count, results: [{ monthly_budget, terms: [{ term_months, max_vehicle_amount,
+        amount_financed, monthly_payment_total }] }] } in budget order.
+      /loan/Calculator on max_vehicle_amount returns exactly monthly_payment_total.
+    """
+    try:
+        with metrics.calculator("loan_affordability"):
+            results = loan_affordability(**body.model_dump())
+        return {"count": len(results), "results": results}
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.post("/lease/affordability", dependencies=[Depends(calculator_rate_limit)])
+def lease_affordability_quote(body: LeaseAffordabilityRequest) -> Dict[str, Any]:
+    """
+    Largest vehicle amount each monthly budget leases, per term.
+
+    Returns:
+      { count, results: [{ monthly_budget, terms: [{ term_months, max_vehicle_amount,
+        residual_value, monthly_payment_total }] }] } in budget order;
+      max_vehicle_amount is null when the fees alone exceed the budget.
+    """
+    try:
+        with metrics.calculator("lease_affordability"):
+            results = lease_affordability(**body.model_dump())
+        return {"count": len(results), "results": results}
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@app.post("/compare", dependencies=[Depends(calculator_rate_limit)])
+def compare_lease_loan(body: CompareRequest) -> Dict[str, Any]:
+    """
+    Lease vs loan for the same vehicle and term in one round trip.
+
+    Returns:
+      CompareLeaseLoan-shaped payload:
+        { loanCore: {data: /loan/Calculator output},
+          leaseCore: {data: /lease/calculator output},
+          comparison: { break_even_month, timeseries, totals } }
+    """
+    try:
+        with metrics.calculator("compare"):
+            return build_lease_loan_comparison(**body.model_dump())
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.post("/getInterest", dependencies=[Depends(calculator_rate_limit)])
+def getInterest(body: GetInterest) -> Response:
+    return Response(
+        content=dumps({"score": apr_percent_from_credit_score(
+            body.credit_score, body.term_months, body.vehicle_condition, body.as_of
+        )}),
+        media_type="application/json",
+    )
+
+
+@app.post("/getInterest/batch", dependencies=[Depends(calculator_rate_limit)])
+def getInterest_batch(body: GetInterestBatchRequest) -> Response:
+    """
+    APR percent for many applicants in one lookup against one version of the
+    rate cards (a reload mid-request never mixes versions).
+
+    Returns: { count, version, scores: [apr_percent, ...] } in input order.
+    """
+    terms = body.term_months
+    if isinstance(terms, int):
+        terms = [terms] * len(body.credit_scores)
+    try:
+        with metrics.calculator("rate_card"):
+            cards = get_rate_cards()
+            scores = cards.lookup_many(body.credit_scores, terms, body.vehicle_condition, body.as_of).tolist()
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return Response(
+        content=dumps({"count": len(scores), "version": cards.version, "scores": scores}),
+        media_type="application/json",
+    )
+
+
+@app.get("/rate-cards")
+def rate_cards() -> Dict[str, Any]:
+    """The rate cards in use: file, version, load time and every card's tiers"""
+    return get_rate_card_store().stats()
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str) -> Dict[str, Any]:
+    """A stored customer finance profile (served from the profile cache when hot)"""
+    profile = get_profile_repository().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"profile {profile_id} not found")
+    return profile
+
+
+@app.post("/profiles")
+def save_profile(body: ProfileRequest) -> Dict[str, Any]:
+    """Create or update (when `id` is given) a customer finance profile; returns the stored row"""
+    try:
+        profile_id = get_profile_repository().upsert(body.model_dump())
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return get_profile_repository().get(profile_id)
+
+
+@app.post("/profiles/bulk")
+def import_profiles(body: ProfileBulkRequest) -> Dict[str, Any]:
+    """Upsert many profiles (imports); returns their ids in request order"""
+    try:
+        ids = get_profile_repository().upsert_many(p.model_dump() for p in body.profiles)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"count": len(ids), "ids": ids}
+
+
+@app.get("/recommendations/{profile_id}", dependencies=[Depends(calculator_rate_limit)])
+def profile_recommendations(profile_id: str, top_k: int = 3) -> Response:
+    """
+    Top-K loan and lease vehicles that fit a stored profile's monthly budget
+    (customer_finance_inputs row in finance_inputs.db).
+
+    Returns:
+      { profile_id, apr_percent, money_factor, loan_term_months, lease_term_months,
+        loans: [LoanRec], leases: [LeaseRec] }
+      Each entry also carries vehicleId, termMonths, bodyStyle and fuelType.
+    """
+    profile = get_profile_repository().get(profile_id)
+    if profile is None or not profile["consent"]:
+        raise HTTPException(status_code=404, detail=f"profile {profile_id} not found")
+    try:
+        with metrics.calculator("recommend"):
+            (result,) = recommend(profiles_from_records([profile]), top_k=top_k)
+        return Response(content=dumps(result), media_type="application/json")
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.post("/recommendations", dependencies=[Depends(calculator_rate_limit)])
+def recommendations(body: RecommendationRequest) -> Response:
+    """Same as GET /recommendations/{profile_id} for a profile sent in the body (not stored)"""
+    try:
+        with metrics.calculator("recommend"):
+            (result,) = recommend(
+                profiles_from_records([body.model_dump(exclude={"top_k"})]), top_k=body.top_k
+            )
+        result.pop("profile_id")
+        return Response(content=dumps(result), media_type="application/json")
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/export/quotes", dependencies=[Depends(calculator_rate_limit)])
+def export_quotes(format: str = "csv", level: str = "schedule") -> StreamingResponse:
+    """
+    Loan quotes for every consenting stored profile, priced on its top loan
+    recommendation, streamed as CSV or Parquet (see quote_export.py).
+
+    level=schedule: one row per profile and period
+      (scenario_id, period, payment_base, interest, principal, tax, payment_total, balance_end)
+    level=totals: one row per profile with the /loan/Calculator totals
+    scenario_id is the profile id. Input files are exported with the CLI.
+    """
+    try:
+        body = iter_export(
+            scenarios_from_profiles(),
+            fmt=format,
+            level=level,
+            workers=int(os.getenv("EXPORT_WORKERS", "1")),
+        )
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    filename = f"loan_quotes_{level}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @app.get("/chat/history/{user_id}")
 def get_chat_history(user_id: str) -> Dict[str, Any]:
@@ -161,7 +511,12 @@ def chat_status() -> Dict[str, Any]:
             "model": chatbot.model,
             "temperature": chatbot.temperature,
             "max_tokens": chatbot.max_tokens,
-            "active_users": len(chatbot.chat_history),
+            "active_users": chatbot.history_store.active_users(),
+            "router": chatbot.router.stats(),
+            "turns": chatbot.turns.stats(),
+            "quote_cache": quote_cache_stats(),
+            "response_cache": chatbot.response_cache.stats() if chatbot.response_cache else None,
+            "shared_state": state_stats(),
             "status": "active"
         }
     except Exception as e:
@@ -170,4 +525,17 @@ def chat_status() -> Dict[str, Any]:
             "model": "unknown", 
             "status": "error",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+@app.get("/metrics")
+def prometheus_metrics() -> Response:
+    """Prometheus scrape endpoint (see metrics.py for what is exported)"""
+    if not metrics.enabled():
+        raise HTTPException(status_code=503, detail="prometheus-client is not installed")
+    body, content_type = metrics.exposition()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/cache/stats")
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and occupancy for the loan and lease quote caches"""
+    return quote_cache_stats()
@@ -0,0 +1,180 @@
+"""
+Prometheus metrics for the API, exposed at GET /metrics.
+
+Recorded on the request path:
+- http_request_duration_seconds{method,route,status}: per route template
+- chat_stage_duration_seconds{stage}: where a chat turn spends its time:
+  history (reads), history_write, cache_lookup, context, provider (the
+  whole routed call incl. failover/hedging, or the stream), fallback
+- llm_request_duration_seconds{provider} / llm_requests_total{provider,outcome}:
+  each individual provider attempt as seen by the router
+- chat_tokens_total{provider,kind}: prompt/completion tokens, counted with
+  the local tokenizer (context_builder.count_tokens), not provider billing
+- calculator_compute_seconds{calculator}: builder time on quote-cache
+  misses and for the batch/bulk/compare endpoints
+
+stage() and calculator() also open tracing spans (chat.<stage>,
+calculator.<name>) so slow-request traces show the same breakdown.
+
+Read from the live objects at scrape time: active chat users, response and
+quote cache lookups, coalesced turns, hedges and circuit breaker state.
+
+prometheus-client is optional; without it recording is a no-op and
+/metrics answers 503.
+
+Under a multi-process server set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py
+does) before this module is imported: request-path metrics are then
+aggregated across workers, while scrape-time values come from whichever
+worker answers the scrape (shared-store backed ones are global anyway).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import tracing
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+    from prometheus_client.core import CollectorRegistry, CounterMetricFamily, GaugeMetricFamily
+except ImportError:  # optional: metrics are simply not collected
+    REGISTRY = None
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_COMPUTE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+def enabled() -> bool:
+    return REGISTRY is not None
+
+
+if enabled():
+    HTTP_REQUEST_SECONDS = Histogram(
+        "http_request_duration_seconds", "HTTP request latency by route template",
+        ["method", "route", "status"], buckets=_LATENCY_BUCKETS,
+    )
+    CHAT_STAGE_SECONDS = Histogram(
+        "chat_stage_duration_seconds", "Time spent in each stage of a chat turn",
+        ["stage"], buckets=_LATENCY_BUCKETS,
+    )
+    LLM_REQUEST_SECONDS = Histogram(
+        "llm_request_duration_seconds", "Successful LLM provider request latency",
+        ["provider"], buckets=_LATENCY_BUCKETS,
+    )
+    LLM_REQUESTS = Counter("llm_requests_total", "LLM provider requests by outcome", ["provider", "outcome"])
+    CHAT_TOKENS = Counter("chat_tokens_total", "Prompt and completion tokens (local count)", ["provider", "kind"])
+    CALCULATOR_SECONDS = Histogram(
+        "calculator_compute_seconds", "Loan/lease builder compute time",
+        ["calculator"], buckets=_COMPUTE_BUCKETS,
+    )
+else:
+    HTTP_REQUEST_SECONDS = CHAT_STAGE_SECONDS = LLM_REQUEST_SECONDS = _NoopMetric()
+    LLM_REQUESTS = CHAT_TOKENS = CALCULATOR_SECONDS = _NoopMetric()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a chat turn stage (exceptions included)"""
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"chat.{name}"):
+            yield
+    finally:
+        CHAT_STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def calculator(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"calculator.{name}"):
+            yield
+    finally:
+        CALCULATOR_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+def record_llm_request(provider: str, seconds: Optional[float], error: Optional[BaseException]) -> None:
+    if error is None:
+        LLM_REQUEST_SECONDS.labels(provider).observe(seconds)
+        LLM_REQUESTS.labels(provider, "success").inc()
+    else:
+        LLM_REQUESTS.labels(provider, "error").inc()
+
+
+def record_tokens(provider: str, kind: str, tokens: int) -> None:
+    CHAT_TOKENS.labels(provider, kind).inc(tokens)
+
+
+class _StatsCollector:
+    """Scrape-time view of the counters the chatbot and quote caches already keep"""
+
+    def describe(self):
+        return []  # keeps register() from collecting while those modules are still importing
+
+    def collect(self):
+        import chatbot as chatbot_module
+        from quote_cache import quote_cache_stats
+
+        lookups = CounterMetricFamily("quote_cache_lookups", "Quote cache lookups", labels=["cache", "result"])
+        entries = GaugeMetricFamily("quote_cache_entries", "Quote cache occupancy", labels=["cache"])
+        for cache, stats in quote_cache_stats().items():
+            lookups.add_metric([cache, "hit"], stats["hits"])
+            lookups.add_metric([cache, "miss"], stats["misses"])
+            entries.add_metric([cache], stats["entries"])
+        yield lookups
+        yield entries
+
+        bot = chatbot_module.chatbot
+        if bot is None:
+            return  # nothing has chatted yet
+        yield GaugeMetricFamily("chat_active_users", "Users with retained chat history",
+                                value=bot.history_store.active_users())
+        turns = bot.turns.stats()
+        yield GaugeMetricFamily("chat_turns_in_flight", "Distinct chat messages being answered",
+                                value=turns["in_flight_messages"])
+        yield CounterMetricFamily("chat_turns_coalesced", "Duplicate messages that shared an in-flight reply",
+                                  value=turns["coalesced"])
+        if bot.response_cache is not None:
+            stats = bot.response_cache.stats()
+            cache = CounterMetricFamily("chat_response_cache_lookups", "Response cache lookups", labels=["result"])
+            for result in ("exact", "similar"):
+                cache.add_metric([result], stats[f"{result}_hits"])
+            cache.add_metric(["miss"], stats["misses"])
+            yield cache
+            yield GaugeMetricFamily("chat_response_cache_entries", "Response cache occupancy", value=stats["entries"])
+
+        router = bot.router.stats()
+        yield CounterMetricFamily("llm_hedges", "Hedged (second) provider requests", value=router["hedges"])
+        circuit = GaugeMetricFamily("llm_circuit_open", "1 while a provider's circuit breaker is open",
+                                    labels=["provider"])
+        for provider, stats in router["providers"].items():
+            circuit.add_metric([provider], 1.0 if stats["circuit"] == "open" else 0.0)
+        yield circuit
+
+
+if enabled():
+    REGISTRY.register(_StatsCollector())
+
+
+def exposition() -> Tuple[bytes, str]:
+    """(body, content type) for GET /metrics"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_StatsCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
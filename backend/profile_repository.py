@@ -0,0 +1,413 @@
+"""
+Data access for customer finance profiles (the customer_finance_inputs
+table of finance_inputs.db).
+
+ProfileRepository is the one place that talks to that table:
+- connections: one per thread (reopened after a fork), and the same SQL
+  text for every call so sqlite3's per-connection statement cache keeps
+  them prepared
+- schema: opening only creates the table when it is missing; the `migrate`
+  command switches the file to WAL mode (readers never wait on an import)
+  and adds secondary indexes on credit_score, monthly_budget_usd, zipcode
+  and created_at
+- get()/get_many(): read-through LRU/TTL cache of hot profiles; writes made
+  through the repository invalidate it (other workers see them after the TTL)
+- upsert_many(): bulk import in one transaction per batch
+
+Migrate a database once per deployment, and import a CSV or JSON Lines
+file of profiles, with:
+
+    python profile_repository.py migrate
+    python profile_repository.py import profiles.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "finance_inputs.db"
+
+PROFILE_FIELDS = (
+    "id", "created_at", "income_annual_usd", "credit_score", "down_payment_usd", "monthly_budget_usd",
+    "lease_term_months", "loan_term_months", "zipcode", "employment_status",
+    "preferred_body_style", "preferred_fuel_type", "consent",
+)
+_WRITABLE = PROFILE_FIELDS[2:]
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS customer_finance_inputs (
+  id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(16)))),
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  income_annual_usd REAL NOT NULL CHECK (income_annual_usd >= 0),
+  credit_score INTEGER NOT NULL CHECK (credit_score BETWEEN 300 AND 850),
+  down_payment_usd REAL NOT NULL DEFAULT 0 CHECK (down_payment_usd >= 0),
+  monthly_budget_usd REAL NOT NULL CHECK (monthly_budget_usd >= 250),
+  lease_term_months INTEGER NULL CHECK (lease_term_months IN (24,36,48,60)),
+  loan_term_months INTEGER NULL CHECK (loan_term_months IN (36,48,60,72,84)),
+  zipcode TEXT,
+  employment_status TEXT CHECK (employment_status IN ('student','employed','self_employed','unemployed','retired','other')),
+  preferred_body_style TEXT CHECK (preferred_body_style IN ('sedan','suv','truck','minivan','hatchback','coupe','other')),
+  preferred_fuel_type TEXT CHECK (preferred_fuel_type IN ('gas','hybrid','electric','diesel','other')),
+  consent INTEGER NOT NULL DEFAULT 1
+)"""
+
+INDEXES = {
+    "idx_customer_finance_inputs_credit_score": "credit_score",
+    "idx_customer_finance_inputs_monthly_budget": "monthly_budget_usd",
+    "idx_customer_finance_inputs_zipcode": "zipcode",
+    "idx_customer_finance_inputs_created_at": "created_at",
+}
+
+_SELECT = f"SELECT {', '.join(PROFILE_FIELDS)} FROM customer_finance_inputs"
+_GET = _SELECT + " WHERE id = ?"
+# One statement for any number of ids (the list is bound as a JSON array)
+_GET_MANY = _SELECT + " WHERE id IN (SELECT value FROM json_each(?))"
+_UPSERT = (
+    f"INSERT INTO customer_finance_inputs (id, created_at, {', '.join(_WRITABLE)}) "
+    f"VALUES (:id, COALESCE(:created_at, datetime('now')), {', '.join(':' + f for f in _WRITABLE)}) "
+    f"ON CONFLICT (id) DO UPDATE SET {', '.join(f'{f} = excluded.{f}' for f in _WRITABLE)}"
+)
+_DEFAULTS = {"down_payment_usd": 0, "consent": 1}
+_GENERATION_SLOTS = 4096
+
+
+def _profile(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    # Plain tuples zipped with the column names: several times cheaper than sqlite3.Row -> dict
+    return dict(zip(PROFILE_FIELDS, row))
+
+
+class ProfileRepository:
+    """Profiles in SQLite with a process-local read-through cache"""
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_DB_PATH,
+        cache_size: int = 4096,
+        cache_ttl_seconds: float = 60.0,
+        batch_size: int = 5000,
+    ):
+        self.path = str(path)
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Write generations, one slot per hash(id) bucket: _forget bumps them so a
+        # read that raced a write does not cache the row it read before the write
+        self._generations = [0] * _GENERATION_SLOTS
+        self._hits = 0
+        self._misses = 0
+        self.ensure_schema()
+
+    # ---------- Connections ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        # Per-connection settings only: opening never changes the file (see migrate)
+        conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (connections must not cross processes)
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn = self._connect()
+            self._local.pid = pid
+        return self._local.conn
+
+    def ensure_schema(self) -> None:
+        """Create the table in a new database; an existing file is left as it is"""
+        self._conn.execute(_SCHEMA)
+
+    def migrate(self) -> List[str]:
+        """
+        Switch the file to WAL mode, add the secondary INDEXES and refresh the
+        planner statistics. Run once per deployment (`python
+        profile_repository.py migrate`), not on every open. Returns the
+        indexes it created.
+        """
+        conn = self._conn
+        conn.execute("PRAGMA journal_mode=WAL")
+        existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        created = [name for name in INDEXES if name not in existing]
+        for name in created:
+            conn.execute(f"CREATE INDEX {name} ON customer_finance_inputs ({INDEXES[name]})")
+        conn.execute("PRAGMA optimize")
+        return created
+
+    # ---------- Cache ----------
+
+    def _cached(self, profile_id: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(profile_id)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._cache[profile_id]
+            return None
+        self._cache.move_to_end(profile_id)
+        return entry[1]
+
+    def _remember(self, rows: Iterable[Dict[str, Any]], now: float) -> None:
+        if self.cache_size <= 0:
+            return
+        expires = now + self.cache_ttl_seconds
+        for row in rows:
+            self._cache[row["id"]] = (expires, row)
+            self._cache.move_to_end(row["id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _forget(self, ids: Iterable[str]) -> None:
+        with self._cache_lock:
+            for profile_id in ids:
+                self._cache.pop(profile_id, None)
+                self._generations[hash(profile_id) % _GENERATION_SLOTS] += 1
+
+    def _generation(self, profile_id: str) -> int:
+        return self._generations[hash(profile_id) % _GENERATION_SLOTS]
+
+    # ---------- Reads ----------
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """One profile as a dict, or None"""
+        now = time.monotonic()
+        with self._cache_lock:
+            row = self._cached(profile_id, now)
+            if row is not None:
+                self._hits += 1
+                return dict(row)
+            self._misses += 1
+            generation = self._generation(profile_id)
+        found = self._conn.execute(_GET, (profile_id,)).fetchone()
+        if found is None:
+            return None
+        row = _profile(found)
+        with self._cache_lock:
+            if self._generation(profile_id) == generation:
+                self._remember([row], now)
+        return dict(row)
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Profiles by id (missing ids are left out), one query for all cache misses"""
+        now = time.monotonic()
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._cache_lock:
+            for profile_id in ids:
+                row = self._cached(profile_id, now)
+                if row is not None:
+                    found[profile_id] = dict(row)
+            self._hits += len(found)
+            self._misses += len(ids) - len(found)
+            generations = {i: self._generation(i) for i in ids if i not in found}
+        if generations:
+            rows = [_profile(r) for r in self._conn.execute(_GET_MANY, (json.dumps(list(generations)),))]
+            with self._cache_lock:
+                self._remember((row for row in rows if self._generation(row["id"]) == generations[row["id"]]), now)
+            found.update((row["id"], dict(row)) for row in rows)
+        return found
+
+    def find(
+        self,
+        *,
+        min_credit_score: Optional[int] = None,
+        max_credit_score: Optional[int] = None,
+        min_monthly_budget: Optional[float] = None,
+        max_monthly_budget: Optional[float] = None,
+        zipcode: Optional[str] = None,
+        created_after: Optional[str] = None,
+        consent_only: bool = True,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Newest profiles matching every given filter (each filter column is indexed once migrated)"""
+        clauses, params = ["consent = 1"] if consent_only else [], []
+        for clause, value in (
+            ("credit_score >= ?", min_credit_score),
+            ("credit_score <= ?", max_credit_score),
+            ("monthly_budget_usd >= ?", min_monthly_budget),
+            ("monthly_budget_usd <= ?", max_monthly_budget),
+            ("zipcode = ?", zipcode),
+            ("created_at > ?", created_after),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"{_SELECT}{where} ORDER BY created_at DESC, id LIMIT ?"
+        return [_profile(r) for r in self._conn.execute(sql, (*params, limit))]
+
+    def rows(self, columns: Sequence[str], consent_only: bool = True,
+             ids: Optional[Sequence[str]] = None) -> List[Tuple[Any, ...]]:
+        """Bulk read of `columns` as tuples, oldest first (bypasses the cache)"""
+        unknown = [c for c in columns if c not in PROFILE_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown profile columns {unknown}")
+        clauses, params = ["consent = 1"] if consent_only else [], []
+        if ids is not None:
+            clauses.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(ids)))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(columns)} FROM customer_finance_inputs{where} ORDER BY created_at, id"
+        return self._conn.execute(sql, params).fetchall()
+
+    def iter_rows(self, columns: Sequence[str], consent_only: bool = True,
+                  batch_size: int = 5000) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        rows() for the whole table, `batch_size` rows at a time so memory stays flat.
+
+        Each batch is its own keyset query on rowid, run on the calling
+        thread's connection, so the generator can be resumed from any thread
+        (StreamingResponse does). Rows added while iterating may be included.
+        """
+        unknown = [c for c in columns if c not in PROFILE_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown profile columns {unknown}")
+        consent = " AND consent = 1" if consent_only else ""
+        sql = (f"SELECT rowid, {', '.join(columns)} FROM customer_finance_inputs"
+               f" WHERE rowid > ?{consent} ORDER BY rowid LIMIT ?")
+        last = 0
+        while True:
+            batch = self._conn.execute(sql, (last, batch_size)).fetchall()
+            if not batch:
+                return
+            last = batch[-1][0]
+            yield [row[1:] for row in batch]
+
+    def count(self, consent_only: bool = False) -> int:
+        if consent_only:
+            return self._conn.execute("SELECT COUNT(*) FROM customer_finance_inputs WHERE consent = 1").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM customer_finance_inputs").fetchone()[0]
+
+    # ---------- Writes ----------
+
+    def upsert_many(self, profiles: Iterable[Mapping[str, Any]]) -> List[str]:
+        """
+        Insert or update profiles keyed on `id` (generated when missing), one
+        transaction per `batch_size` rows. A row failing the table's CHECK
+        constraints raises sqlite3.IntegrityError and rolls back its batch.
+        Returns the ids in input order.
+        """
+        ids: List[str] = []
+        batch: List[Dict[str, Any]] = []
+        for profile in profiles:
+            row = {f: profile.get(f, _DEFAULTS.get(f)) for f in PROFILE_FIELDS}
+            row["id"] = str(row["id"] or secrets.token_hex(16))
+            ids.append(row["id"])
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+        return ids
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(_UPSERT, batch)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._forget(row["id"] for row in batch)
+
+    def upsert(self, profile: Mapping[str, Any]) -> str:
+        return self.upsert_many([profile])[0]
+
+    def delete(self, profile_id: str) -> bool:
+        try:
+            cur = self._conn.execute("DELETE FROM customer_finance_inputs WHERE id = ?", (profile_id,))
+        finally:
+            self._forget([profile_id])
+        return cur.rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "entries": len(self._cache),
+                "max_entries": self.cache_size,
+                "ttl_seconds": self.cache_ttl_seconds,
+            }
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+            self._local.conn = None
+            self._local.pid = None
+
+
+def create_profile_repository() -> ProfileRepository:
+    """Repository on FINANCE_INPUTS_DB with the PROFILE_CACHE_* settings"""
+    return ProfileRepository(
+        path=os.getenv("FINANCE_INPUTS_DB", str(DEFAULT_DB_PATH)),
+        cache_size=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "4096")),
+        cache_ttl_seconds=float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60")),
+    )
+
+
+_repository: Optional[ProfileRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_profile_repository() -> ProfileRepository:
+    """The process-wide repository, created on first use"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = create_profile_repository()
+    return _repository
+
+
+def _read_profiles(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {k: (v if v != "" else None) for k, v in row.items()}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Customer finance profile store")
+    parser.add_argument("--db", default=os.getenv("FINANCE_INPUTS_DB", str(DEFAULT_DB_PATH)))
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="upsert profiles from a .csv or .jsonl file")
+    importer.add_argument("file")
+    commands.add_parser("count", help="number of stored profiles")
+    commands.add_parser("migrate", help="switch to WAL mode and add the secondary indexes")
+    args = parser.parse_args(argv)
+
+    repo = ProfileRepository(args.db, cache_size=0)
+    if args.command == "import":
+        start = time.perf_counter()
+        ids = repo.upsert_many(_read_profiles(args.file))
+        print(f"upserted {len(ids)} profiles in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    elif args.command == "migrate":
+        created = repo.migrate()
+        print(f"created indexes: {', '.join(created)}" if created else "already migrated", file=sys.stderr)
+    else:
+        print(repo.count())
+    repo.close()
+
+
+if __name__ == "__main__":
+    main()
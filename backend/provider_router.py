@@ -0,0 +1,267 @@
+"""
+Routes chatbot LLM requests across the configured providers.
+
+- Latency: a rolling window of successful request durations per provider.
+- Circuit breakers: a provider that fails `failure_threshold` times in a row
+  is skipped for `reset_seconds`, then gets a single half-open probe.
+- Failover: a failed or timed-out request moves on to the next provider.
+- Hedging (optional, async only): when the first provider has not answered
+  by its p95 latency, the next provider is fired too and whichever answers
+  first wins; the other request is cancelled.
+
+Each attempt is capped at `timeout_seconds`, so a slow provider costs at
+most that long before failover instead of the full SDK timeout. The async
+path cancels the attempt; the sync path cannot interrupt a blocking call,
+so its `request` must pass `timeout_seconds` to the SDK itself (chatbot.py
+does).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+import tracing
+
+
+class NoProviderAvailable(RuntimeError):
+    """Every provider failed or has an open circuit breaker"""
+
+    def __init__(self, errors: Sequence[Tuple[str, BaseException]] = ()):
+        self.errors = list(errors)
+        detail = "; ".join(f"{provider}: {error!r}" for provider, error in self.errors)
+        super().__init__(f"No LLM provider available{': ' + detail if detail else ''}")
+
+
+class LatencyTracker:
+    """Rolling window of request durations (seconds)"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe after a cooldown"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def peek(self) -> bool:
+        """Whether allow() would let a request through; never changes state"""
+        return self.state == self.CLOSED or time.monotonic() - self.opened_at >= self.reset_seconds
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_seconds:
+            # One probe per cooldown; re-armed if the last probe was never reported
+            self.state = self.HALF_OPEN
+            self.opened_at = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class ProviderRouter:
+    """Failover, circuit breaking and optional hedging over an ordered list of providers"""
+
+    def __init__(
+        self,
+        providers: Sequence[str],
+        *,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_delay_seconds: float = 2.0,
+        min_samples: int = 20,
+        timeout_seconds: float = 30.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        window: int = 200,
+    ):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.min_samples = min_samples
+        self.timeout_seconds = timeout_seconds
+        self._latency = {p: LatencyTracker(window) for p in self.providers}
+        self._breakers = {p: CircuitBreaker(failure_threshold, reset_seconds) for p in self.providers}
+        self._counts = {p: {"requests": 0, "failures": 0, "wins": 0} for p in self.providers}
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def available(self, providers: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Providers whose breaker would let a request through, in priority order
+        (limited to `providers` when given). Read-only: a cooled-down breaker
+        only moves to half-open when admit() dispatches its probe.
+        """
+        with self._lock:
+            return [p for p in self.providers
+                    if (providers is None or p in providers) and self._breakers[p].peek()]
+
+    def admit(self, provider: str) -> bool:
+        """Claim a request to `provider` from its breaker (the half-open probe included)"""
+        with self._lock:
+            return self._breakers[provider].allow()
+
+    def hedge_delay(self, provider: str) -> float:
+        """How long to wait on `provider` before hedging: its latency quantile once warmed up"""
+        with self._lock:
+            tracker = self._latency[provider]
+            if len(tracker) < self.min_samples:
+                return self.hedge_delay_seconds
+            return tracker.percentile(self.hedge_quantile)
+
+    def record(self, provider: str, seconds: Optional[float], error: Optional[BaseException] = None) -> None:
+        """Outcome of one request: latency on success, or the error"""
+        metrics.record_llm_request(provider, seconds, error)
+        with self._lock:
+            counts = self._counts[provider]
+            counts["requests"] += 1
+            if error is None:
+                counts["wins"] += 1
+                self._latency[provider].record(seconds)
+                self._breakers[provider].record_success()
+            else:
+                counts["failures"] += 1
+                self._breakers[provider].record_failure()
+
+    async def _attempt(self, provider: str, request: Callable[[str], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        with tracing.span("llm.request", provider=provider):
+            try:
+                result = await asyncio.wait_for(request(provider), self.timeout_seconds)
+            except asyncio.CancelledError:
+                raise  # lost a hedge race: neither a failure nor a latency sample
+            except Exception as e:
+                self.record(provider, None, e)
+                raise
+        self.record(provider, time.monotonic() - start)
+        return result
+
+    async def acall(self, request: Callable[[str], Awaitable[Any]],
+                    providers: Optional[Sequence[str]] = None) -> Tuple[str, Any]:
+        """
+        Run `request(provider)` with failover (and hedging) over the available
+        providers (only `providers` when given); returns (provider, result)
+        """
+        candidates = self.available(providers)
+        pending: Dict[asyncio.Future, str] = {}
+        errors: List[Tuple[str, BaseException]] = []
+        next_index = 0
+
+        def launch() -> bool:
+            # The next candidate whose breaker still admits a request
+            nonlocal next_index
+            while next_index < len(candidates):
+                provider = candidates[next_index]
+                next_index += 1
+                if self.admit(provider):
+                    pending[asyncio.ensure_future(self._attempt(provider, request))] = provider
+                    return True
+            return False
+
+        if not launch():
+            raise NoProviderAvailable()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch():
+                        with self._lock:
+                            self.hedges += 1
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        return provider, task.result()
+                    errors.append((provider, task.exception()))
+                if not pending and next_index < len(candidates):
+                    launch()
+            raise NoProviderAvailable(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def call(self, request: Callable[[str], Any], providers: Optional[Sequence[str]] = None) -> Tuple[str, Any]:
+        """
+        Sync `request(provider)` with failover (no hedging) over the available
+        providers (only `providers` when given); returns (provider, result).
+        `request` enforces the per-attempt cap by passing timeout_seconds to its SDK call.
+        """
+        errors: List[Tuple[str, BaseException]] = []
+        for provider in self.available(providers):
+            if not self.admit(provider):
+                continue
+            start = time.monotonic()
+            try:
+                with tracing.span("llm.request", provider=provider):
+                    result = request(provider)
+            except Exception as e:
+                self.record(provider, None, e)
+                errors.append((provider, e))
+                continue
+            self.record(provider, time.monotonic() - start)
+            return provider, result
+        raise NoProviderAvailable(errors)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = {}
+            for p in self.providers:
+                tracker = self._latency[p]
+                providers[p] = {
+                    **self._counts[p],
+                    "circuit": self._breakers[p].state,
+                    "p50_seconds": tracker.percentile(0.5),
+                    "p95_seconds": tracker.percentile(0.95),
+                }
+            return {"order": list(self.providers), "hedging": self.hedge, "hedges": self.hedges, "providers": providers}
+
+
+def create_provider_router(providers: Sequence[str]) -> ProviderRouter:
+    """ProviderRouter over `providers` (priority order) configured from the environment"""
+    return ProviderRouter(
+        providers,
+        hedge=os.getenv("CHATBOT_HEDGE", "false").lower() in ("1", "true", "yes", "on"),
+        hedge_quantile=float(os.getenv("CHATBOT_HEDGE_QUANTILE", "0.95")),
+        hedge_delay_seconds=float(os.getenv("CHATBOT_HEDGE_DELAY_SECONDS", "2.0")),
+        timeout_seconds=float(os.getenv("CHATBOT_PROVIDER_TIMEOUT_SECONDS", "30")),
+        failure_threshold=int(os.getenv("CHATBOT_BREAKER_FAILURES", "5")),
+        reset_seconds=float(os.getenv("CHATBOT_BREAKER_RESET_SECONDS", "30")),
+    )
@@ -0,0 +1,278 @@
+"""
+Bounded LRU/TTL cache in front of the loan and lease calculators.
+Entries are stored as pre-serialized JSON bytes keyed on normalized inputs
+plus the requested response shape (`fields` projection, schedule format).
+Serialization uses orjson when it is installed.
+
+When SHARED_STATE_BACKEND is sqlite or redis, a miss in the process-local
+LRU also checks the shared store before computing, so a quote priced by
+one worker is reused by the others.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json produces the same document, just slower
+    orjson = None
+
+import metrics
+from shared_state import StateStore, shared_store
+from loan_calculator import _D, _q2, build_loan_chartjs_data
+from lease_calculator import build_lease_chartjs_data_no_tax
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(obj: Any) -> Any:
+    # pydantic's JSON mode (used by FastAPI for Dict[str, Any] returns) renders Decimal as str
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize a calculator payload the way FastAPI's JSONResponse would."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(
+        payload, default=_json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+# ---------- Response shaping ----------
+
+PAYLOAD_FIELDS = ("meta", "chartjs", "timeseries", "totals", "schedule")
+SCHEDULE_FORMATS = ("rows", "columns")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """`fields=totals,schedule` query value -> validated key tuple (None = everything)."""
+    if not fields:
+        return None
+    keys = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [k for k in keys if k not in PAYLOAD_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields {unknown}; choose from {list(PAYLOAD_FIELDS)}")
+    return keys or None
+
+
+def schedule_columns(schedule: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """List of per-period dicts -> one list per column (same keys and values, no repeated names)."""
+    if not schedule:
+        return {}
+    return {key: [row[key] for row in schedule] for key in schedule[0]}
+
+
+def shape_payload(
+    payload: Dict[str, Any],
+    fields: Optional[Tuple[str, ...]] = None,
+    schedule_format: str = "rows",
+) -> Dict[str, Any]:
+    """Apply the `fields` projection (keeping payload order) and the schedule format."""
+    if schedule_format not in SCHEDULE_FORMATS:
+        raise ValueError(f"schedule_format must be one of {list(SCHEDULE_FORMATS)}")
+    if fields is not None:
+        payload = {k: v for k, v in payload.items() if k in fields}
+    if schedule_format == "columns" and "schedule" in payload:
+        payload = {**payload, "schedule": schedule_columns(payload["schedule"])}
+    return payload
+
+
+class QuoteCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters, optionally backed by a shared store."""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0, namespace: str = "quote",
+                 shared: Optional[StateStore] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self._shared = shared  # resolved on first use when None, i.e. after a preforking server forks
+        self._shared_resolved = shared is not None
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def shared(self) -> Optional[StateStore]:
+        if not self._shared_resolved:
+            self._shared = shared_store()
+            self._shared_resolved = True
+        return self._shared
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:" + hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> bytes:
+        """Return cached bytes for `key` (local, then shared), computing and serializing on a miss."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        shared = self.shared if self.max_entries > 0 else None
+        if shared is not None:
+            try:
+                value = shared.get(self._shared_key(key))
+            except Exception as e:  # the shared tier is an optimization; never fail a quote over it
+                logger.warning(f"shared quote cache unavailable: {e}")
+                shared = None
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self.put(key, value)
+                return value
+        value = dumps(compute())
+        self.put(key, value)
+        if shared is not None:
+            try:
+                shared.set(self._shared_key(key), value, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"shared quote cache unavailable: {e}")
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,  # local misses answered by the shared store
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _from_env(namespace: str) -> QuoteCache:
+    return QuoteCache(
+        max_entries=int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "2048")),
+        ttl_seconds=float(os.getenv("QUOTE_CACHE_TTL_SECONDS", "3600")),
+        namespace=namespace,
+    )
+
+
+loan_quotes = _from_env("loan")
+lease_quotes = _from_env("lease")
+
+
+def _norm(x: Any) -> str:
+    return str(_D(x).normalize())
+
+
+def cached_loan_quote(
+    *,
+    vehicle_amount: float | Decimal,
+    down_payment_cash: float | Decimal = 0,
+    term_months: int,
+    apr_percent: float | Decimal,
+    tax_rate: float | Decimal = 0.0825,
+    fields: Optional[Tuple[str, ...]] = None,
+    schedule_format: str = "rows",
+) -> bytes:
+    """build_loan_chartjs_data as JSON bytes, served from cache when possible."""
+    key = (
+        _norm(_q2(_D(vehicle_amount))),
+        _norm(_q2(_D(down_payment_cash))),
+        int(term_months),
+        _norm(apr_percent),
+        _norm(tax_rate),
+        fields,
+        schedule_format,
+    )
+
+    def compute() -> Dict[str, Any]:
+        with metrics.calculator("loan"):
+            payload = build_loan_chartjs_data(
+                vehicle_amount=vehicle_amount,
+                down_payment_cash=down_payment_cash,
+                term_months=term_months,
+                apr_percent=apr_percent,
+                tax_rate=tax_rate,
+            )
+        return shape_payload(payload, fields, schedule_format)
+
+    return loan_quotes.get_or_compute(key, compute)
+
+
+def cached_lease_quote(
+    *,
+    vehicle_amount: float | Decimal,
+    term_months: int,
+    money_factor: float | Decimal = 0.00190,
+    acquisition_fee: float | Decimal = 695.00,
+    fields: Optional[Tuple[str, ...]] = None,
+    schedule_format: str = "rows",
+) -> bytes:
+    """build_lease_chartjs_data_no_tax as JSON bytes, served from cache when possible."""
+    # residual value is taken from the unrounded price, so the key keeps it unrounded
+    key = (
+        _norm(vehicle_amount),
+        int(term_months),
+        _norm(money_factor),
+        _norm(_q2(_D(acquisition_fee))),
+        fields,
+        schedule_format,
+    )
+
+    def compute() -> Dict[str, Any]:
+        with metrics.calculator("lease"):
+            payload = build_lease_chartjs_data_no_tax(
+                vehicle_amount=vehicle_amount,
+                term_months=term_months,
+                money_factor=money_factor,
+                acquisition_fee=acquisition_fee,
+            )
+        return shape_payload(payload, fields, schedule_format)
+
+    return lease_quotes.get_or_compute(key, compute)
+
+
+def quote_cache_stats() -> Dict[str, Any]:
+    return {"loan": loan_quotes.stats(), "lease": lease_quotes.stats()}
@@ -0,0 +1,364 @@
+"""
+Bulk loan quote export for portfolio analysis.
+
+Scenarios stream through a generator pipeline: read (an input file, or the
+stored customer profiles) -> chunk -> price each chunk with the batch loan
+engine (in a process pool when workers > 1) -> write. Output is CSV or
+Parquet (pyarrow, one row group per chunk), built from the engine's columns
+without per-period dicts; only `workers * 2` chunks are in flight, so memory
+stays flat however many scenarios there are.
+
+Levels:
+- schedule: one row per scenario and period (the /loan/Calculator schedule)
+- totals:   one row per scenario (the /loan/Calculator totals)
+
+Input files are CSV or JSON Lines with the /loan/Calculator fields
+(vehicle_amount, down_payment_cash, term_months, apr_percent, tax_rate) and
+an optional scenario_id; a row with credit_score and no apr_percent is
+priced at its rate-card APR for the term. Stored profiles are priced on
+their top loan recommendation (recommender.py); profiles that cannot
+afford any vehicle are skipped.
+
+    python quote_export.py --input scenarios.csv --output schedules.parquet --workers 4
+    python quote_export.py --profiles --output schedules.csv --level totals
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from credit_score_calculator import apr_percent_from_credit_score
+from loan_calculator import MAX_BATCH_SCENARIOS, _q2, price_loan_batch
+
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_LEVELS = ("schedule", "totals")
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+SCHEDULE_COLUMNS = ("scenario_id", "period", "payment_base", "interest", "principal", "tax",
+                    "payment_total", "balance_end")
+TOTALS_COLUMNS = ("scenario_id", "vehicle_amount", "down_payment_cash", "amount_financed", "apr_percent",
+                  "term_months", "tax_rate", "monthly_payment_base", "monthly_tax", "monthly_payment_total",
+                  "total_interest", "total_tax_paid", "total_paid_including_tax")
+
+_SCENARIO_FIELDS = ("vehicle_amount", "down_payment_cash", "term_months", "apr_percent", "tax_rate")
+
+
+# ---------- Sources ----------
+
+def _scenario(row: Dict[str, Any], index: int) -> Dict[str, Any]:
+    if row.get("apr_percent") in (None, "") and row.get("credit_score") not in (None, ""):
+        term = int(row["term_months"]) if row.get("term_months") not in (None, "") else None
+        row["apr_percent"] = apr_percent_from_credit_score(float(row["credit_score"]), term)
+    scenario = {f: row[f] for f in _SCENARIO_FIELDS if row.get(f) not in (None, "")}
+    scenario["scenario_id"] = str(row.get("scenario_id") or index)
+    return scenario
+
+
+def scenarios_from_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Loan scenarios from a .csv or .jsonl file, one at a time"""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f) if path.endswith(".csv") else (json.loads(line) for line in f if line.strip())
+        for k, row in enumerate(rows, start=1):
+            yield _scenario(row, k)
+
+
+def scenarios_from_profiles(repository=None, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+    """Each consenting stored profile priced on its top loan recommendation"""
+    from profile_repository import get_profile_repository
+    from recommender import PROFILE_COLUMNS, iter_recommendations, profiles_from_rows
+
+    repository = repository or get_profile_repository()
+    for rows in repository.iter_rows(PROFILE_COLUMNS, batch_size=batch_size):
+        profiles = profiles_from_rows(rows)
+        downs = profiles.down_payment_cents.tolist()
+        for down, rec in zip(downs, iter_recommendations(profiles, top_k=1, chunk_size=batch_size)):
+            if not rec["loans"]:
+                continue
+            loan = rec["loans"][0]
+            yield {
+                "scenario_id": rec["profile_id"],
+                "vehicle_amount": loan["carValue"],
+                "down_payment_cash": down / 100,
+                "term_months": loan["termMonths"],
+                "apr_percent": loan["interestRate"],
+            }
+
+
+# ---------- Pricing ----------
+
+def price_chunk(scenarios: List[Dict[str, Any]], level: str) -> Dict[str, np.ndarray]:
+    """One chunk of scenarios -> output columns (money in dollars)"""
+    batch = price_loan_batch(scenarios, include_schedule=level == "schedule")
+    ids = np.array([sc["scenario_id"] for sc in scenarios], dtype=object)
+    terms = batch["terms"]
+    monthly_tax = batch["monthly_tax"]
+    if level == "schedule":
+        sched = batch["schedule"]
+        # (max term, scenarios) -> scenario-major rows, dropping periods past each term
+        active = (np.arange(1, len(sched["interest"]) + 1)[:, None] <= terms).T
+        column = {key: arr.T[active] for key, arr in sched.items()}
+        tax = np.repeat(monthly_tax, terms)
+        return {
+            "scenario_id": np.repeat(ids, terms),
+            "period": np.nonzero(active)[1] + 1,
+            "payment_base": column["payment_base"] / 100,
+            "interest": column["interest"] / 100,
+            "principal": column["principal"] / 100,
+            "tax": tax / 100,
+            "payment_total": (column["payment_base"] + tax) / 100,
+            "balance_end": column["balance_end"] / 100,
+        }
+    return {
+        "scenario_id": ids,
+        "vehicle_amount": np.array([float(v) for v in batch["vehicle_amount"]]),
+        "down_payment_cash": np.array([float(d) for d in batch["down_payment_cash"]]),
+        "amount_financed": batch["financed"] / 100,
+        "apr_percent": np.array([float(_q2(r * Decimal(12) * 100)) for r in batch["rate"]]),
+        "term_months": terms,
+        "tax_rate": np.array([float(_q2(t)) for t in batch["tax_rate"]]),
+        "monthly_payment_base": batch["payment_base"] / 100,
+        "monthly_tax": monthly_tax / 100,
+        "monthly_payment_total": (batch["payment_base"] + monthly_tax) / 100,
+        "total_interest": batch["total_interest"] / 100,
+        "total_tax_paid": monthly_tax * terms / 100,
+        "total_paid_including_tax": batch["total_paid"] / 100,
+    }
+
+
+def _chunks(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def priced_chunks(
+    scenarios: Iterable[Dict[str, Any]],
+    level: str = "schedule",
+    chunk_size: int = 2000,
+    workers: int = 1,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Columns per chunk, in input order; with workers > 1 chunks are priced in a process pool"""
+    if level not in EXPORT_LEVELS:
+        raise ValueError(f"level must be one of {EXPORT_LEVELS}")
+    if not 1 <= chunk_size <= MAX_BATCH_SCENARIOS:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_BATCH_SCENARIOS}")
+    chunks = _chunks(scenarios, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield price_chunk(chunk, level)
+        return
+    # Bounded submission (Executor.map would drain the whole input up front)
+    pool: Executor = ProcessPoolExecutor(max_workers=workers)
+    pending: Deque = deque()
+    try:
+        for chunk in chunks:
+            pending.append(pool.submit(price_chunk, chunk, level))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ---------- Writers ----------
+
+class _Sink(io.RawIOBase):
+    """Write-only stream that hands back what was written since the last drain()"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+class _CsvEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+        self._header = True
+
+    def encode(self, chunk: Dict[str, np.ndarray]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if self._header:
+            writer.writerow(self.columns)
+            self._header = False
+        writer.writerows(zip(*(chunk[c].tolist() for c in self.columns)))
+        return buffer.getvalue().encode("utf-8")
+
+    def close(self) -> bytes:
+        return b",".join(c.encode() for c in self.columns) + b"\n" if self._header else b""
+
+
+class _ParquetEncoder:
+    def __init__(self, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow package not installed. Run: pip install pyarrow")
+        self._pa, self._pq = pa, pq
+        self.columns = columns
+        self._schema = pa.schema([
+            (c, pa.string() if c == "scenario_id" else pa.int64() if c in ("period", "term_months") else pa.float64())
+            for c in columns
+        ])
+        self._sink = _Sink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def encode(self, chunk: Dict[str, np.ndarray]) -> bytes:
+        pa = self._pa
+        table = pa.table({c: pa.array(chunk[c].tolist() if c == "scenario_id" else chunk[c], type=field.type)
+                          for c, field in zip(self.columns, self._schema)})
+        self._writer.write_table(table)  # one row group per chunk
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+class ExportProgress:
+    """Running totals of an export, passed to the progress callback after every chunk"""
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.scenarios = 0
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.finished = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        rate = self.scenarios / self.elapsed if self.elapsed > 0 else 0.0
+        done = f"{self.scenarios}/{self.total} ({self.scenarios / self.total:.0%})" if self.total else str(self.scenarios)
+        state = "exported" if self.finished else "exporting"
+        return (f"{state} {done} scenarios, {self.rows} rows, {self.bytes / 1e6:.1f} MB "
+                f"in {self.elapsed:.1f}s ({rate:,.0f} scenarios/s)")
+
+
+def iter_export(
+    scenarios: Iterable[Dict[str, Any]],
+    *,
+    fmt: str = "csv",
+    level: str = "schedule",
+    chunk_size: int = 2000,
+    workers: int = 1,
+    progress: Optional[Callable[[ExportProgress], None]] = None,
+    total: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    The encoded export, one piece per chunk (suitable for a streaming response).
+    Arguments are checked here, before anything is priced or sent.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {EXPORT_FORMATS}")
+    if level not in EXPORT_LEVELS:
+        raise ValueError(f"level must be one of {EXPORT_LEVELS}")
+    if not 1 <= chunk_size <= MAX_BATCH_SCENARIOS:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_BATCH_SCENARIOS}")
+    columns = SCHEDULE_COLUMNS if level == "schedule" else TOTALS_COLUMNS
+    encoder = _CsvEncoder(columns) if fmt == "csv" else _ParquetEncoder(columns)
+    chunks = priced_chunks(scenarios, level, chunk_size, workers)
+    return _encode(chunks, encoder, level, ExportProgress(total), progress)
+
+
+def _encode(chunks, encoder, level: str, state: ExportProgress,
+            progress: Optional[Callable[[ExportProgress], None]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        data = encoder.encode(chunk)
+        state.rows += len(chunk["scenario_id"])
+        state.scenarios += len(chunk["scenario_id"]) if level == "totals" else int((chunk["period"] == 1).sum())
+        state.bytes += len(data)
+        if progress is not None:
+            progress(state)
+        yield data
+    data = encoder.close()
+    state.bytes += len(data)
+    state.finished = True
+    if progress is not None:
+        progress(state)
+    yield data
+
+
+def _throttled(report: Callable[[str], None], every: float = 1.0) -> Callable[[ExportProgress], None]:
+    last = [0.0]
+
+    def on_progress(state: ExportProgress) -> None:
+        if state.finished or state.elapsed - last[0] >= every:
+            last[0] = state.elapsed
+            report(state.report())
+
+    return on_progress
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export loan quotes as CSV or Parquet")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="scenarios file (.csv or .jsonl)")
+    source.add_argument("--profiles", action="store_true", help="price every stored customer profile")
+    parser.add_argument("--output", required=True, help="output file (.csv or .parquet), - for stdout")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="default: from the output extension")
+    parser.add_argument("--level", choices=EXPORT_LEVELS, default="schedule")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    if args.profiles:
+        from profile_repository import get_profile_repository
+
+        scenarios, total = scenarios_from_profiles(), get_profile_repository().count(consent_only=True)
+    else:
+        scenarios, total = scenarios_from_file(args.input), None
+
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for data in iter_export(scenarios, fmt=fmt, level=args.level, chunk_size=args.chunk_size,
+                                workers=args.workers, total=total,
+                                progress=_throttled(lambda line: print(line, file=sys.stderr))):
+            out.write(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Credit-tier rate cards: the APR offered for a credit score, loan term,
+vehicle condition and date.
+
+A card file (RATE_CARDS, default rate_cards.json) holds an ordered list of
+cards. Each card has score tiers and optionally narrows where it applies:
+
+    {"name": "spring-promo", "condition": "new", "min_term": 36, "max_term": 60,
+     "starts": "2026-03-01", "ends": "2026-05-31",
+     "tiers": [{"min_score": 720, "apr_percent": 1.9}, {"min_score": 660, "apr_percent": 3.9}]}
+
+condition is "new", "used" or omitted (both); min_term/max_term and
+starts/ends (inclusive ISO dates) are optional. A tier covers scores from
+its min_score up to the next tier. Where cards overlap, the later card wins
+for the scores its tiers cover, so a file lists base cards first, then term
+surcharges, then promotions. Lookups without a term only see cards that
+have no term range. The same cards can be kept as a CSV table, one row per
+tier: card, condition, min_term, max_term, starts, ends, min_score,
+apr_percent.
+
+Loading compiles every card into per-(date window, condition, term) arrays
+indexed by score - 300, so a lookup is one array index and a batch is one
+fancy-index over all applicants; single lookups use the same tables as
+Python tuples, which are cheaper than NumPy for one item. The file is
+re-checked every RATE_CARDS_RELOAD_SECONDS (default 5; 0 disables) and a
+changed file is compiled and swapped in atomically; a file that fails to
+compile is logged and the previous cards stay in use.
+
+    python rate_card.py rate_cards.json     # validate a card file before deploying it
+"""
+
+from __future__ import annotations
+
+import bisect
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_CARDS_PATH = Path(__file__).resolve().parent / "rate_cards.json"
+
+MIN_SCORE, MAX_SCORE = 300, 850
+MAX_TERM = 120   # months; row 0 of a term table is "no term given"
+CONDITIONS = ("new", "used")
+_CONDITION_INDEX = {c: k for k, c in enumerate(CONDITIONS)}
+
+
+class RateCard(NamedTuple):
+    name: str
+    conditions: Tuple[str, ...]
+    min_term: Optional[int]
+    max_term: Optional[int]
+    starts: Optional[int]   # date ordinals, inclusive
+    ends: Optional[int]
+    min_scores: Tuple[int, ...]   # ascending
+    aprs: Tuple[float, ...]
+
+    def active_on(self, day: int) -> bool:
+        return (self.starts is None or self.starts <= day) and (self.ends is None or day <= self.ends)
+
+
+def _ordinal(value: Any) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    return date.fromisoformat(str(value)).toordinal()
+
+
+def _term(value: Any) -> Optional[int]:
+    return None if value in (None, "") else int(value)
+
+
+def parse_card(spec: Dict[str, Any]) -> RateCard:
+    name = str(spec.get("name") or "unnamed")
+    condition = spec.get("condition") or None
+    if condition is not None and condition not in CONDITIONS:
+        raise ValueError(f"card {name}: condition must be one of {CONDITIONS}")
+    min_term, max_term = _term(spec.get("min_term")), _term(spec.get("max_term"))
+    if min_term is not None or max_term is not None:
+        min_term, max_term = min_term or 1, max_term or MAX_TERM
+        if not 1 <= min_term <= max_term <= MAX_TERM:
+            raise ValueError(f"card {name}: terms must satisfy 1 <= min_term <= max_term <= {MAX_TERM}")
+    starts, ends = _ordinal(spec.get("starts")), _ordinal(spec.get("ends"))
+    if starts is not None and ends is not None and ends < starts:
+        raise ValueError(f"card {name}: ends before it starts")
+    tiers = sorted((int(t["min_score"]), float(t["apr_percent"])) for t in spec.get("tiers") or [])
+    if not tiers:
+        raise ValueError(f"card {name}: no tiers")
+    if len({s for s, _ in tiers}) != len(tiers):
+        raise ValueError(f"card {name}: duplicate min_score")
+    if not all(MIN_SCORE <= s <= MAX_SCORE for s, _ in tiers):
+        raise ValueError(f"card {name}: min_score must be between {MIN_SCORE} and {MAX_SCORE}")
+    if not all(0 <= apr < 100 for _, apr in tiers):
+        raise ValueError(f"card {name}: apr_percent must be between 0 and 100")
+    return RateCard(
+        name=name,
+        conditions=(condition,) if condition else CONDITIONS,
+        min_term=min_term,
+        max_term=max_term,
+        starts=starts,
+        ends=ends,
+        min_scores=tuple(s for s, _ in tiers),
+        aprs=tuple(apr for _, apr in tiers),
+    )
+
+
+class RateCards:
+    """A compiled, immutable set of rate cards"""
+
+    def __init__(self, cards: Sequence[RateCard], version: str = ""):
+        if not cards:
+            raise ValueError("no rate cards")
+        self.cards = list(cards)
+        self.version = version
+        # Date windows: every start and the day after every end opens a new one
+        bounds = {c.starts for c in cards if c.starts is not None}
+        bounds |= {c.ends + 1 for c in cards if c.ends is not None}
+        self._bounds = sorted(bounds)
+
+        aprs = sorted({apr for c in cards for apr in c.aprs})
+        # Codes index self._aprs; 0 is "no card covers this"
+        self._aprs = np.array([np.nan] + aprs)
+        code = {apr: k for k, apr in enumerate(aprs, start=1)}
+        scores = np.arange(MIN_SCORE, MAX_SCORE + 1)
+        self._codes = np.zeros((len(self._bounds) + 1, len(CONDITIONS), MAX_TERM + 1, len(scores)), dtype=np.uint16)
+
+        for w in range(len(self._bounds) + 1):
+            day = self._bounds[w - 1] if w else (self._bounds[0] - 1 if self._bounds else 0)
+            for card in cards:
+                if not card.active_on(day):
+                    continue
+                tier = np.searchsorted(card.min_scores, scores, side="right") - 1
+                row = np.where(tier >= 0, np.array([code[a] for a in card.aprs])[tier], 0).astype(np.uint16)
+                terms = slice(0, None) if card.min_term is None else slice(card.min_term, card.max_term + 1)
+                for condition in card.conditions:
+                    block = self._codes[w, CONDITIONS.index(condition), terms]
+                    np.copyto(block, row, where=row > 0)
+
+        gaps = np.argwhere(self._codes == 0)
+        if len(gaps):
+            w, cond, term, score = gaps[0]
+            window = f" from {date.fromordinal(self._bounds[w - 1])}" if w else ""
+            raise ValueError(
+                f"no rate card covers score {score + MIN_SCORE} for {CONDITIONS[cond]} vehicles"
+                f"{f' at {term} months' if term else ''}{window}"
+            )
+        # The scalar path: per (window, condition), a dict from term (None for
+        # no term) to a tuple of APR floats by score - 300; plain tuple indexing
+        # beats NumPy for one item
+        apr_list = self._aprs.tolist()
+        self._rows = [
+            [
+                dict(zip([None, *range(1, MAX_TERM + 1)],
+                         (tuple(apr_list[c] for c in row) for row in self._codes[w, cond].tolist())))
+                for cond in range(len(CONDITIONS))
+            ]
+            for w in range(len(self._bounds) + 1)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    @property
+    def windows(self) -> int:
+        """Number of date windows (promotions starting or ending split the calendar)"""
+        return len(self._bounds) + 1
+
+    def _window(self, on: Optional[date]) -> int:
+        if not self._bounds:   # no promotions: skip the date entirely
+            return 0
+        return bisect.bisect_right(self._bounds, (on or date.today()).toordinal())
+
+    def table(self, condition: str = "new", on: Optional[date] = None) -> np.ndarray:
+        """APR percent as a (term, score - 300) array; row 0 is for lookups without a term"""
+        if condition not in CONDITIONS:
+            raise ValueError(f"condition must be one of {CONDITIONS}")
+        return self._aprs[self._codes[self._window(on), _CONDITION_INDEX[condition]]]
+
+    def lookup(self, score: float, term_months: Optional[int] = None, condition: str = "new",
+               on: Optional[date] = None) -> float:
+        """APR percent for one applicant; scores are clamped to 300–850"""
+        cond = _CONDITION_INDEX.get(condition)
+        if cond is None:
+            raise ValueError(f"condition must be one of {CONDITIONS}")
+        rows = self._rows[self._window(on) if self._bounds else 0][cond]
+        row = rows.get(term_months)
+        if row is None:   # not None or an int term: coerce, or reject out-of-range terms
+            term = int(term_months)
+            if not 1 <= term <= MAX_TERM:
+                raise ValueError(f"term_months must be between 1 and {MAX_TERM}")
+            row = rows[term]
+        score = int(score)
+        return row[0 if score < MIN_SCORE else -1 if score > MAX_SCORE else score - MIN_SCORE]
+
+    def lookup_many(
+        self,
+        scores: Sequence[float] | np.ndarray,
+        term_months: Optional[Sequence[int] | np.ndarray] = None,
+        condition: str = "new",
+        on: Optional[date] = None,
+    ) -> np.ndarray:
+        """APR percent per applicant (term_months None, or one term per score)"""
+        if condition not in CONDITIONS:
+            raise ValueError(f"condition must be one of {CONDITIONS}")
+        index = np.clip(np.trunc(np.asarray(scores, dtype=np.float64)), MIN_SCORE, MAX_SCORE).astype(np.int64) - MIN_SCORE
+        if term_months is None:
+            terms = 0
+        else:
+            terms = np.asarray(term_months, dtype=np.int64)
+            if terms.shape != index.shape:
+                raise ValueError("term_months must have one entry per score")
+            if ((terms < 1) | (terms > MAX_TERM)).any():
+                raise ValueError(f"term_months must be between 1 and {MAX_TERM}")
+        codes = self._codes[self._window(on), _CONDITION_INDEX[condition]]
+        return self._aprs[codes[terms, index]]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "cards": [
+                {
+                    "name": c.name,
+                    "conditions": list(c.conditions),
+                    "min_term": c.min_term,
+                    "max_term": c.max_term,
+                    "starts": date.fromordinal(c.starts).isoformat() if c.starts is not None else None,
+                    "ends": date.fromordinal(c.ends).isoformat() if c.ends is not None else None,
+                    "tiers": [{"min_score": s, "apr_percent": a} for s, a in zip(c.min_scores, c.aprs)],
+                }
+                for c in self.cards
+            ],
+        }
+
+
+def _cards_from_csv(text: str) -> List[Dict[str, Any]]:
+    specs: Dict[str, Dict[str, Any]] = {}
+    for row in csv.DictReader(text.splitlines()):
+        name = row["card"]
+        spec = specs.setdefault(name, {**{k: row.get(k) for k in
+                                          ("condition", "min_term", "max_term", "starts", "ends")},
+                                       "name": name, "tiers": []})
+        spec["tiers"].append({"min_score": row["min_score"], "apr_percent": row["apr_percent"]})
+    return list(specs.values())
+
+
+def load_rate_cards(path: str | Path = DEFAULT_RATE_CARDS_PATH) -> RateCards:
+    """Compile a .json or .csv card file; raises ValueError if it is invalid"""
+    raw = Path(path).read_bytes()
+    version = hashlib.sha1(raw).hexdigest()[:12]
+    if str(path).endswith(".csv"):
+        specs = _cards_from_csv(raw.decode("utf-8"))
+    else:
+        doc = json.loads(raw)
+        specs = doc["cards"]
+        version = str(doc.get("version") or version)
+    return RateCards([parse_card(spec) for spec in specs], version)
+
+
+class RateCardStore:
+    """The current RateCards for a file, recompiled when the file changes"""
+
+    def __init__(self, path: str | Path, reload_seconds: float = 5.0):
+        self.path = Path(path)
+        self.reload_seconds = reload_seconds
+        self._stamp = self._file_stamp()
+        self._cards = load_rate_cards(self.path)
+        self.loaded_at = time.time()
+        self._next_check = time.monotonic() + reload_seconds if reload_seconds > 0 else float("inf")
+        self._lock = threading.Lock()
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def current(self) -> RateCards:
+        # Hot path: one clock read and compare (_next_check is inf when reloading is off)
+        if time.monotonic() < self._next_check:
+            return self._cards
+        # One thread re-checks; the rest keep serving the cards they have
+        if self._lock.acquire(blocking=False):
+            try:
+                self._next_check = time.monotonic() + self.reload_seconds
+                self.reload()
+            finally:
+                self._lock.release()
+        return self._cards
+
+    def reload(self, force: bool = False) -> bool:
+        """Swap in the file's cards if it changed; False if unchanged or invalid"""
+        try:
+            stamp = self._file_stamp()
+            if stamp == self._stamp and not force:
+                return False
+            self._stamp = stamp   # a broken file is reported once, not on every check
+            cards = load_rate_cards(self.path)
+        except Exception as e:
+            logger.warning(f"rate cards {self.path} not reloaded, keeping version {self._cards.version}: {e}")
+            return False
+        self._cards, self.loaded_at = cards, time.time()
+        logger.info(f"rate cards {self.path} reloaded: version {cards.version}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "loaded_at": self.loaded_at, **self.current().info()}
+
+
+def create_rate_card_store() -> RateCardStore:
+    return RateCardStore(
+        os.getenv("RATE_CARDS", str(DEFAULT_RATE_CARDS_PATH)),
+        reload_seconds=float(os.getenv("RATE_CARDS_RELOAD_SECONDS", "5")),
+    )
+
+
+_store: Optional[RateCardStore] = None
+_store_lock = threading.Lock()
+
+
+def get_rate_card_store() -> RateCardStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_rate_card_store()
+    return _store
+
+
+def get_rate_cards() -> RateCards:
+    """The current rate cards (RATE_CARDS), reloaded when the file changes"""
+    return (_store or get_rate_card_store()).current()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = list(sys.argv[1:] if argv is None else argv)
+    path = args[0] if args else os.getenv("RATE_CARDS", str(DEFAULT_RATE_CARDS_PATH))
+    try:
+        cards = load_rate_cards(path)
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"{path}: invalid rate cards: {e}")
+    print(f"{path}: version {cards.version}, {len(cards)} cards, {cards.windows} date window(s)")
+    for card in cards.info()["cards"]:
+        terms = f"{card['min_term']}-{card['max_term']} months" if card["min_term"] else "any term"
+        dates = f", {card['starts'] or '...'} to {card['ends'] or '...'}" if card["starts"] or card["ends"] else ""
+        print(f"  {card['name']}: {'/'.join(card['conditions'])}, {terms}{dates}, {len(card['tiers'])} tiers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Fixed-window request rate limits with counters in the shared state store,
+so a limit holds across every worker process rather than per worker.
+
+Limits are requests per minute per client: RATE_LIMIT_CHAT_PER_MINUTE keys
+on the chat user_id, RATE_LIMIT_CALCULATOR_PER_MINUTE on the client address.
+0 (the default) disables a limit.
+"""
+
+import logging
+import math
+import os
+import time
+from typing import NamedTuple, Optional
+
+from shared_state import StateStore, get_state_store
+
+logger = logging.getLogger(__name__)
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # seconds until the window resets
+
+
+class RateLimiter:
+    """`limit` requests per `window_seconds` per key; fails open if the store is unavailable"""
+
+    def __init__(self, name: str, limit: int, window_seconds: float = 60.0, store: Optional[StateStore] = None):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._store = store
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    def hit(self, key: str) -> RateDecision:
+        now = time.time()
+        window = int(now // self.window_seconds)
+        retry_after = max(1, math.ceil((window + 1) * self.window_seconds - now))
+        store = self._store or get_state_store()
+        try:
+            count = store.incr(f"rl:{self.name}:{window}:{key}", self.window_seconds)
+        except Exception as e:
+            logger.error(f"rate limiter {self.name}: {e}")
+            return RateDecision(True, self.limit, self.limit, retry_after)
+        return RateDecision(count <= self.limit, self.limit, max(0, self.limit - count), retry_after)
+
+
+def create_rate_limiter(name: str) -> RateLimiter:
+    """RateLimiter for `name` ("chat" or "calculator") configured from RATE_LIMIT_<NAME>_PER_MINUTE"""
+    return RateLimiter(name, int(os.getenv(f"RATE_LIMIT_{name.upper()}_PER_MINUTE", "0")))
@@ -0,0 +1,325 @@
+"""
+Vehicle recommendations for customer finance profiles.
+
+For each profile (a stored `customer_finance_inputs` row, read through
+profile_repository, or an ad-hoc profile from POST /recommendations) every vehicle in the catalog
+(vehicle_catalog.json) is priced as a loan and as a lease:
+
+- APR from the new-vehicle rate cards (rate_card.py) for the credit score
+  and loan term; the lease money factor is APR / 2400, rounded to 5 places
+- loan: profile down payment and loan term, Dallas tax on each payment,
+  exactly as /loan/Calculator prices it
+- lease: profile lease term, default acquisition fee, no tax, exactly as
+  /lease/calculator prices it
+
+Vehicles whose monthly payment fits `monthly_budget_usd` are ranked by how
+many of the preferred body style / fuel type they match, then by payment
+(the most car the budget allows), and the top K of each are returned.
+
+Profiles are priced as a batch: every profile x vehicle payment of a chunk
+is computed at once with NumPy in integer cents (ties near half a cent are
+settled with the Decimal formulas), so re-ranking every stored profile
+takes seconds. Run nightly with:
+
+    python recommender.py --out recommendations.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from lease_calculator import _residual_rate_for_term
+from loan_calculator import _D, _cents, _half_up_cents, _q2
+from profile_repository import ProfileRepository, get_profile_repository
+from rate_card import get_rate_cards
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent / "vehicle_catalog.json"
+
+DEFAULT_LOAN_TERM = 60    # profiles without a preferred loan term
+DEFAULT_LEASE_TERM = 36   # profiles without a preferred lease term
+DEFAULT_TAX_RATE = Decimal("0.0825")
+DEFAULT_ACQUISITION_FEE = Decimal("695.00")
+MAX_TOP_K = 20
+
+_MIN_SCORE, _MAX_SCORE = 300, 850
+_MF_PLACES = Decimal("0.00001")
+_PAYMENT_BITS = 40  # ranking key: preference matches above the payment in cents
+
+
+# ---------- Inputs ----------
+
+class Catalog:
+    """Vehicles to recommend, with their price and categories as arrays"""
+
+    def __init__(self, vehicles: Sequence[Mapping[str, Any]]):
+        if not vehicles:
+            raise ValueError("vehicle catalog is empty")
+        self.vehicles = [dict(v) for v in vehicles]
+        prices = [_q2(_D(v["msrp"])) for v in self.vehicles]
+        if any(p <= 0 for p in prices):
+            raise ValueError("every catalog vehicle needs a positive msrp")
+        self.price_cents = np.array([_cents(p) for p in prices], dtype=np.int64)
+        self.body_style = np.array([v.get("body_style") or "" for v in self.vehicles])
+        self.fuel_type = np.array([v.get("fuel_type") or "" for v in self.vehicles])
+        # Fields every recommendation of a vehicle shares, in the UI's LoanRec/LeaseRec naming
+        self._base = [
+            {
+                "vehicleId": v["id"],
+                "vehicleName": v["name"],
+                "imageUrl": v.get("image_url"),
+                "carValue": float(p),
+                "bodyStyle": v.get("body_style"),
+                "fuelType": v.get("fuel_type"),
+            }
+            for v, p in zip(self.vehicles, prices)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.vehicles)
+
+
+def load_catalog(path: str | Path = DEFAULT_CATALOG_PATH) -> Catalog:
+    with open(path, encoding="utf-8") as f:
+        return Catalog(json.load(f))
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """The catalog at VEHICLE_CATALOG (default vehicle_catalog.json), loaded on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_catalog(os.getenv("VEHICLE_CATALOG", str(DEFAULT_CATALOG_PATH)))
+    return _catalog
+
+
+class Profiles(NamedTuple):
+    """Finance profiles as columns (one entry per profile)"""
+    ids: List[str]
+    credit_score: np.ndarray        # int
+    down_payment_cents: np.ndarray  # int64
+    budget_cents: np.ndarray        # int64
+    loan_term: np.ndarray           # int
+    lease_term: np.ndarray          # int
+    body_style: np.ndarray          # str, "" = no preference
+    fuel_type: np.ndarray           # str, "" = no preference
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def chunk(self, start: int, stop: int) -> "Profiles":
+        return Profiles(self.ids[start:stop], *(col[start:stop] for col in self[1:]))
+
+
+PROFILE_COLUMNS = (
+    "id", "credit_score", "down_payment_usd", "monthly_budget_usd",
+    "loan_term_months", "lease_term_months", "preferred_body_style", "preferred_fuel_type",
+)
+
+
+def _money_cents(values: Iterable[Any]) -> np.ndarray:
+    """Dollar amounts -> cents rounded half-up like _q2 (ties settled in Decimal)"""
+    amounts = np.array([v or 0 for v in values], dtype=np.float64)
+    return _half_up_cents(amounts * 100, lambda k: _cents(_q2(_D(float(amounts[k])))))
+
+
+def profiles_from_rows(rows: Sequence[Sequence[Any]]) -> Profiles:
+    """Rows of PROFILE_COLUMNS values (NULL terms fall back to the defaults)"""
+    if not rows:
+        ints = (np.empty(0, dtype=np.int64) for _ in range(5))
+        return Profiles([], *ints, np.empty(0, dtype=str), np.empty(0, dtype=str))
+    ids, score, down, budget, loan_term, lease_term, body, fuel = zip(*rows)
+    return Profiles(
+        ids=[str(i) for i in ids],
+        credit_score=np.clip(np.array(score, dtype=np.float64), _MIN_SCORE, _MAX_SCORE).astype(np.int64),
+        down_payment_cents=_money_cents(down),
+        budget_cents=_money_cents(budget),
+        loan_term=np.array([t or DEFAULT_LOAN_TERM for t in loan_term], dtype=np.int64),
+        lease_term=np.array([t or DEFAULT_LEASE_TERM for t in lease_term], dtype=np.int64),
+        body_style=np.array([b or "" for b in body]),
+        fuel_type=np.array([f or "" for f in fuel]),
+    )
+
+
+def profiles_from_records(records: Sequence[Mapping[str, Any]]) -> Profiles:
+    """Profiles from dicts keyed like the customer_finance_inputs columns"""
+    return profiles_from_rows([
+        (r.get("id") or f"profile-{k}", *(r.get(c) for c in PROFILE_COLUMNS[1:]))
+        for k, r in enumerate(records)
+    ])
+
+
+def load_profiles(repository: Optional[ProfileRepository] = None, ids: Optional[Sequence[str]] = None) -> Profiles:
+    """Consenting stored profiles (profile_repository), all or just `ids`"""
+    repository = repository or get_profile_repository()
+    return profiles_from_rows(repository.rows(PROFILE_COLUMNS, ids=ids))
+
+
+# ---------- Pricing (vectorized across profiles x vehicles) ----------
+
+def _round_div(num: np.ndarray, den: int | np.ndarray) -> np.ndarray:
+    """Half-up integer division for non-negative numerators"""
+    return (2 * num + den) // (2 * den)
+
+
+def _loan_payments(p: Profiles, c: Catalog, apr: np.ndarray, tax_rate: Decimal) -> np.ndarray:
+    """monthly_payment_total (cents) of /loan/Calculator for every profile x vehicle"""
+    vehicles = len(c)
+    rates = {a: _D(a) / Decimal(100) / Decimal(12) for a in np.unique(apr).tolist()}
+    rate = [rates[a] for a in apr.tolist()]
+    i = np.array([float(r) for r in rate])[:, None]
+    terms = p.loan_term[:, None]
+    financed = np.maximum(c.price_cents[None, :] - p.down_payment_cents[:, None], 0)
+
+    def _exact_payment(j: int) -> int:
+        k, fin, n = j // vehicles, Decimal(int(financed.flat[j])) / 100, int(p.loan_term[j // vehicles])
+        r = rate[k]
+        if r == 0:
+            return _cents(_q2(fin / Decimal(n)))
+        return _cents(_q2(r * fin / (Decimal(1) - (Decimal(1) + r) ** (Decimal(-n)))))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = -np.expm1(-terms * np.log1p(i))
+        raw_payment = np.where(i == 0, financed / terms, i * financed / annuity)
+    payment_base = _half_up_cents(raw_payment.ravel(), _exact_payment)
+    monthly_tax = _half_up_cents(
+        payment_base * float(tax_rate),
+        lambda j: _cents(_q2(Decimal(int(payment_base[j])) / 100 * tax_rate)),
+    )
+    return (payment_base + monthly_tax).reshape(len(p), vehicles)
+
+
+def _lease_payments(p: Profiles, c: Catalog, money_factor: List[Decimal], acquisition_fee: Decimal) -> np.ndarray:
+    """monthly_payment_total (cents) of /lease/calculator for every profile x vehicle; exact in integers"""
+    price = c.price_cents[None, :]
+    adj_cap = price + _cents(_q2(acquisition_fee))
+    # Residual rates have at most 4 decimal places, money factors 5
+    resid_units = np.array([int(_residual_rate_for_term(t) * 10_000) for t in p.lease_term.tolist()])[:, None]
+    mf_units = np.array([int(mf * 100_000) for mf in money_factor])[:, None]
+    residual = _round_div(price * resid_units, 10_000)
+    depreciation = _round_div(adj_cap - residual, p.lease_term[:, None])
+    finance = _round_div((adj_cap + residual) * mf_units, 100_000)
+    return depreciation + finance
+
+
+def _top_k(payment: np.ndarray, budget: np.ndarray, matches: np.ndarray, top_k: int) -> np.ndarray:
+    """Column indices of the best `top_k` affordable vehicles per row, -1 where fewer fit"""
+    key = np.where(payment <= budget[:, None], (matches << _PAYMENT_BITS) + payment, -1)
+    order = np.argsort(-key, axis=1, kind="stable")[:, :top_k]
+    return np.where(np.take_along_axis(key, order, axis=1) >= 0, order, -1)
+
+
+def money_factor_for_apr(apr_percent: float) -> Decimal:
+    return (_D(apr_percent) / Decimal(2400)).quantize(_MF_PLACES, rounding=ROUND_HALF_UP)
+
+
+def _recommend_chunk(p: Profiles, c: Catalog, top_k: int, tax_rate: Decimal,
+                     acquisition_fee: Decimal) -> List[Dict[str, Any]]:
+    apr = get_rate_cards().lookup_many(p.credit_score, p.loan_term)
+    factors = {a: money_factor_for_apr(a) for a in np.unique(apr).tolist()}
+    money_factor = [factors[a] for a in apr.tolist()]
+
+    matches = ((p.body_style[:, None] == c.body_style[None, :]) & (p.body_style[:, None] != "")).astype(np.int64)
+    matches += (p.fuel_type[:, None] == c.fuel_type[None, :]) & (p.fuel_type[:, None] != "")
+
+    loan_payment = _loan_payments(p, c, apr, tax_rate)
+    lease_payment = _lease_payments(p, c, money_factor, acquisition_fee)
+    loans = _top_k(loan_payment, p.budget_cents, matches, top_k)
+    leases = _top_k(lease_payment, p.budget_cents, matches, top_k)
+
+    # ---------- Rows ----------
+    base = c._base
+    apr_l, loan_terms, lease_terms = apr.tolist(), p.loan_term.tolist(), p.lease_term.tolist()
+    loans_l, leases_l = loans.tolist(), leases.tolist()
+    loan_pay = np.take_along_axis(loan_payment, np.maximum(loans, 0), axis=1).tolist()
+    lease_pay = np.take_along_axis(lease_payment, np.maximum(leases, 0), axis=1).tolist()
+    results: List[Dict[str, Any]] = []
+    for k, profile_id in enumerate(p.ids):
+        results.append({
+            "profile_id": profile_id,
+            "apr_percent": apr_l[k],
+            "money_factor": float(money_factor[k]),
+            "loan_term_months": loan_terms[k],
+            "lease_term_months": lease_terms[k],
+            "loans": [
+                {**base[v], "interestRate": apr_l[k], "monthlyEmi": pay / 100, "termMonths": loan_terms[k]}
+                for v, pay in zip(loans_l[k], loan_pay[k]) if v >= 0
+            ],
+            "leases": [
+                {**base[v], "monthlyRent": pay / 100, "termMonths": lease_terms[k]}
+                for v, pay in zip(leases_l[k], lease_pay[k]) if v >= 0
+            ],
+        })
+    return results
+
+
+def iter_recommendations(
+    profiles: Profiles,
+    catalog: Optional[Catalog] = None,
+    *,
+    top_k: int = 3,
+    tax_rate: float | Decimal = DEFAULT_TAX_RATE,
+    acquisition_fee: float | Decimal = DEFAULT_ACQUISITION_FEE,
+    chunk_size: int = 50_000,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Recommendations per profile, in profile order:
+      { profile_id, apr_percent, money_factor, loan_term_months, lease_term_months,
+        loans: [LoanRec + vehicleId, termMonths, ...], leases: [LeaseRec + ...] }
+    Profiles are priced `chunk_size` at a time to bound memory.
+    """
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+    catalog = catalog or get_catalog()
+    tax, acq = _D(tax_rate), _D(acquisition_fee)
+    for start in range(0, len(profiles), chunk_size):
+        yield from _recommend_chunk(profiles.chunk(start, start + chunk_size), catalog, top_k, tax, acq)
+
+
+def recommend(profiles: Profiles, catalog: Optional[Catalog] = None, **kwargs: Any) -> List[Dict[str, Any]]:
+    return list(iter_recommendations(profiles, catalog, **kwargs))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from quote_cache import dumps
+
+    parser = argparse.ArgumentParser(description="Re-rank vehicle recommendations for every stored profile")
+    parser.add_argument("--db", help="finance_inputs.db path (default FINANCE_INPUTS_DB or the repo copy)")
+    parser.add_argument("--catalog", default=os.getenv("VEHICLE_CATALOG", str(DEFAULT_CATALOG_PATH)))
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--out", help="JSON Lines output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    profiles = load_profiles(ProfileRepository(args.db, cache_size=0) if args.db else None)
+    loaded = time.perf_counter()
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for row in iter_recommendations(profiles, load_catalog(args.catalog),
+                                        top_k=args.top_k, chunk_size=args.chunk_size):
+            out.write(dumps(row) + b"\n")
+    finally:
+        if args.out:
+            out.close()
+    done = time.perf_counter()
+    print(f"ranked {len(profiles)} profiles: load {loaded - start:.2f}s, rank+write {done - loaded:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Opt-in cache of chatbot replies so repeated questions skip the LLM round trip.
+
+Entries are keyed on the provider, a caller-supplied scope (model, prompt,
+sampling settings), a digest of the recent history window and the
+normalized message. Two lookup tiers:
+
+- exact: same normalized message ("What's the APR?" == "whats the apr")
+- similar (opt-in, CHATBOT_RESPONSE_CACHE_SIMILAR): MinHash signatures over
+  character trigrams, bucketed with LSH bands; a candidate is used when its
+  estimated Jaccard similarity reaches the threshold (at least 0.97).
+  Candidates must also carry exactly the same guard tokens, in the same
+  order: numbers and number words, vehicle models and products, credit
+  quality, more/less and negations. So "$30,000 over 60 months" never
+  reuses the reply for "$35,000 over 48", "bad credit" never answers "good
+  credit" and "loan better than a lease" never answers "lease better than
+  a loan".
+
+TTL is per provider; eviction is LRU over both tiers.
+
+With a shared state store (SHARED_STATE_BACKEND=sqlite|redis) exact entries
+are also written there, so every worker process can answer a question any
+of them has cached; the similarity index stays per process.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from shared_state import StateStore, shared_store
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3})")
+_MERSENNE_PRIME = (1 << 61) - 1
+MIN_SIMILARITY_THRESHOLD = 0.97
+
+# Words that change the answer however similar the rest of the question is.
+# A near-duplicate hit needs the same sequence of these (and of numbers).
+_NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven",
+    "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen",
+    "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety", "hundred",
+    "thousand", "million", "k", "half", "quarter", "single", "couple", "dozen", "twice", "double",
+    "triple", "first", "second", "third", "once",
+}
+_ENTITY_WORDS = {
+    # models and powertrains
+    "camry", "corolla", "prius", "rav", "tacoma", "highlander", "grand", "tundra", "sienna", "sequoia",
+    "runner", "bz", "gr", "supra", "crown", "venza", "avalon", "mirai", "land", "cruiser", "yaris",
+    "chr", "cross", "hybrid", "electric", "ev", "gas", "plugin", "phev", "prime", "diesel",
+    "sedan", "suv", "truck", "minivan", "hatchback", "coupe", "lexus", "honda", "ford",
+    # products and deal terms
+    "loan", "loans", "lease", "leases", "leasing", "finance", "financing", "cash", "buy", "buying",
+    "refinance", "refinancing", "new", "used", "certified", "cpo", "trade", "apr", "rate", "residual",
+    "down", "balloon", "insurance", "tax",
+}
+_POLARITY_WORDS = {
+    # credit quality
+    "bad", "poor", "fair", "good", "great", "excellent", "perfect", "thin", "limited", "damaged",
+    "bankruptcy", "repossession",
+    # more / less
+    "more", "less", "most", "least", "lot", "lots", "little", "few", "fewer", "many", "much",
+    "higher", "lower", "high", "low", "cheaper", "cheapest", "expensive", "longer", "shorter", "long",
+    "short", "bigger", "smaller", "big", "small", "better", "worse", "best", "worst", "over", "under",
+    "above", "below", "before", "after", "early", "late",
+    # negation
+    "no", "not", "never", "none", "nor", "without", "dont", "doesnt", "didnt", "cant", "cannot",
+    "wont", "isnt", "arent", "wasnt", "shouldnt", "wouldnt", "couldnt", "havent", "hasnt",
+}
+_GUARD_WORDS = frozenset(_NUMBER_WORDS | _ENTITY_WORDS | _POLARITY_WORDS)
+
+
+def normalize_message(message: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Lowercased word/number tokens joined by single spaces, plus the guard
+    tokens (numbers and _GUARD_WORDS) in order of appearance
+    """
+    text = _THOUSANDS.sub("", message.lower().replace("'", "").replace("’", ""))
+    tokens = _TOKEN.findall(text)
+    return " ".join(tokens), tuple(t for t in tokens if t[0].isdigit() or t in _GUARD_WORDS)
+
+
+def history_digest(history: List[Dict[str, Any]]) -> str:
+    """Stable digest of the (role, content) pairs in a history window"""
+    pairs = [(m["role"], m["content"]) for m in history]
+    return hashlib.blake2b(json.dumps(pairs, ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CachedResponse(NamedTuple):
+    response: str
+    tier: str  # "exact" or "similar"
+    similarity: float
+
+
+class _Entry:
+    __slots__ = ("expires_at", "response", "signature", "band_keys")
+
+    def __init__(self, expires_at: float, response: str, signature: Optional[np.ndarray], band_keys: Tuple[Hashable, ...]):
+        self.expires_at = expires_at
+        self.response = response
+        self.signature = signature
+        self.band_keys = band_keys
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of chat replies with per-provider TTL and a MinHash similarity tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        provider_ttl: Optional[Dict[str, float]] = None,
+        history_window: int = 10,
+        similar: bool = False,
+        similarity_threshold: float = MIN_SIMILARITY_THRESHOLD,
+        num_perm: int = 64,
+        bands: int = 16,
+        shared: Optional[StateStore] = None,
+    ):
+        if similar and not MIN_SIMILARITY_THRESHOLD <= similarity_threshold <= 1:
+            raise ValueError(f"similarity_threshold must be between {MIN_SIMILARITY_THRESHOLD} and 1")
+        if similar and num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.provider_ttl = {k.lower(): v for k, v in (provider_ttl or {}).items()}
+        self.history_window = history_window
+        self.similar = similar
+        self.similarity_threshold = similarity_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shared = shared
+        # Universal hash family h(x) = (a*x + b) mod p over 32-bit shingle hashes
+        rng = np.random.RandomState(0x70707A)
+        self._a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._buckets: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.shared_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return self.similar and self.num_perm > 0
+
+    def ttl_for(self, provider: str) -> float:
+        return self.provider_ttl.get(provider.lower(), self.ttl_seconds)
+
+    def _signature(self, text: str) -> np.ndarray:
+        padded = f" {text} "
+        shingles = {padded[i:i + 3] for i in range(len(padded) - 2)} or {padded}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    def _band_keys(self, context: Hashable, signature: np.ndarray) -> Tuple[Hashable, ...]:
+        rows = self.num_perm // self.bands
+        return tuple((context, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands))
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        for band_key in entry.band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def lookup(self, provider: str, scope: Hashable, message: str, history: List[Dict[str, Any]]) -> Optional[CachedResponse]:
+        """Cached reply for `message` after `history`, or None on a miss"""
+        text, guard = normalize_message(message)
+        context = (provider, scope, history_digest(history))
+        key = context + (text,)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    return CachedResponse(entry.response, "exact", 1.0)
+                self._drop(key)
+                self.expirations += 1
+
+        if self.shared is not None:
+            response = self._shared_get(key)
+            if response is not None:
+                self._insert(provider, key, context + (guard,), text, response)
+                with self._lock:
+                    self.exact_hits += 1
+                    self.shared_hits += 1
+                return CachedResponse(response, "exact", 1.0)
+
+        if not self.similarity_enabled:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        signature = self._signature(text)
+        band_keys = self._band_keys(context + (guard,), signature)
+        with self._lock:
+            candidates: Set[Hashable] = set()
+            for band_key in band_keys:
+                candidates.update(self._buckets.get(band_key, ()))
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                entry = self._entries[candidate]
+                if entry.expires_at <= now:
+                    self._drop(candidate)
+                    self.expirations += 1
+                    continue
+                score = float(np.count_nonzero(entry.signature == signature)) / self.num_perm
+                if score > best_score:
+                    best_key, best_score = candidate, score
+            if best_key is None or best_score < self.similarity_threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.similar_hits += 1
+            return CachedResponse(self._entries[best_key].response, "similar", round(best_score, 4))
+
+    def store(self, provider: str, scope: Hashable, message: str, history: List[Dict[str, Any]], response: str) -> None:
+        """Cache `response` for `message` after `history` (history as passed to lookup)"""
+        if self.max_entries <= 0:
+            return
+        text, guard = normalize_message(message)
+        context = (provider, scope, history_digest(history))
+        key = context + (text,)
+        self._insert(provider, key, context + (guard,), text, response)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(key), response.encode("utf-8"), self.ttl_for(provider))
+            except Exception as e:
+                logger.warning(f"shared response cache unavailable: {e}")
+
+    @staticmethod
+    def _shared_key(key: Tuple) -> str:
+        return "chat:" + hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _shared_get(self, key: Tuple) -> Optional[str]:
+        try:
+            value = self.shared.get(self._shared_key(key))
+        except Exception as e:  # the shared tier is an optimization; fall back to a local miss
+            logger.warning(f"shared response cache unavailable: {e}")
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    def _insert(self, provider: str, key: Tuple, band_context: Tuple, text: str, response: str) -> None:
+        signature, band_keys = None, ()
+        if self.similarity_enabled:
+            signature = self._signature(text)
+            band_keys = self._band_keys(band_context, signature)
+        entry = _Entry(time.monotonic() + self.ttl_for(provider), response, signature, band_keys)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "provider_ttl_seconds": dict(self.provider_ttl),
+                "similarity_threshold": self.similarity_threshold if self.similarity_enabled else None,
+                "exact_hits": self.exact_hits,
+                "shared_hits": self.shared_hits,  # exact hits answered by the shared store
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """
+    ResponseCache configured from the environment, or None unless
+    CHATBOT_RESPONSE_CACHE is enabled. Per-provider TTLs come from
+    CHATBOT_RESPONSE_CACHE_TTL_SECONDS_<PROVIDER> (e.g. ..._AZURE=600).
+    The similarity tier is off unless CHATBOT_RESPONSE_CACHE_SIMILAR is set.
+    """
+    if os.getenv("CHATBOT_RESPONSE_CACHE", "false").lower() not in ("1", "true", "yes", "on"):
+        return None
+    ttl_prefix = "CHATBOT_RESPONSE_CACHE_TTL_SECONDS_"
+    return ResponseCache(
+        max_entries=int(os.getenv("CHATBOT_RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+        ttl_seconds=float(os.getenv("CHATBOT_RESPONSE_CACHE_TTL_SECONDS", "3600")),
+        provider_ttl={k[len(ttl_prefix):]: float(v) for k, v in os.environ.items() if k.startswith(ttl_prefix)},
+        history_window=int(os.getenv("CHATBOT_RESPONSE_CACHE_HISTORY_WINDOW", "10")),
+        similar=os.getenv("CHATBOT_RESPONSE_CACHE_SIMILAR", "false").lower() in ("1", "true", "yes", "on"),
+        similarity_threshold=float(os.getenv("CHATBOT_RESPONSE_CACHE_SIMILARITY", str(MIN_SIMILARITY_THRESHOLD))),
+        shared=shared_store(),
+    )
@@ -1,7 +1,8 @@
 # api/schemas.py
 from __future__ import annotations
 
-from typing import Any, Dict, List, Literal, Optional, Union
+from datetime import date
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel, Field, RootModel, model_validator
 
 
@@ -30,6 +31,8 @@ class LeaseCore(BaseModel):
 class CompareLeaseLoan(BaseModel):
     loanCore: LoanCore
     leaseCore: LeaseCore
+    # break-even month and loan-minus-lease series from /compare
+    comparison: Optional[Dict[str, Any]] = None
 
 
 # --- Core Turn ---------------------------------------------------------------
@@ -87,8 +90,45 @@ class LoanChartRequest(BaseModel):
     apr_percent: float = Field(..., ge=0, description="APR percentage, e.g., 4.5 for 4.5% APR")
     tax_rate: float = Field(0.0825, ge=0, description="Default Dallas combined tax 8.25% (applied monthly for demo)")
 
+class LoanGrid(BaseModel):
+    """Scenario grid for /loan/Calculator/batch; every combination of the axes is priced."""
+    # Same bounds per item as LoanChartRequest
+    vehicle_amounts: List[Annotated[float, Field(ge=0)]] = Field(..., min_length=1, description="Vehicle prices to price")
+    down_payments: List[Annotated[float, Field(ge=0)]] = Field([0], min_length=1, description="Cash down payments")
+    term_months: List[Annotated[int, Field(gt=0)]] = Field(..., min_length=1, description="Loan terms in months")
+    apr_percents: List[Annotated[float, Field(ge=0)]] = Field(..., min_length=1, description="APR percentages")
+    tax_rate: float = Field(0.0825, ge=0, description="Tax rate applied to every scenario")
+
+
+class LoanBatchRequest(BaseModel):
+    """Request body for /loan/Calculator/batch: explicit scenarios, a grid, or both."""
+    scenarios: List[LoanChartRequest] = Field(default_factory=list, description="Explicit loan scenarios")
+    grid: Optional[LoanGrid] = Field(None, description="Optional grid expanded into scenarios")
+    include_schedule: bool = Field(False, description="Return the full schedule per scenario, not just totals")
+
+    @model_validator(mode="after")
+    def _require_scenarios(self) -> "LoanBatchRequest":
+        if not self.scenarios and self.grid is None:
+            raise ValueError("provide `scenarios` and/or `grid`")
+        return self
+
+
+VehicleCondition = Literal["new", "used"]
+
+
 class GetInterest(BaseModel):
     credit_score : float
+    term_months: Optional[int] = Field(None, ge=1, le=120, description="Loan term, for term-specific rate cards")
+    vehicle_condition: VehicleCondition = Field("new", description="new or used vehicle")
+    as_of: Optional[date] = Field(None, description="Date for promotional rate cards (default today)")
+
+
+class GetInterestBatchRequest(BaseModel):
+    """Request body for /getInterest/batch: many applicants against the same rate cards."""
+    credit_scores: List[float] = Field(..., min_length=1, max_length=10_000, description="FICO scores (clamped to 300-850)")
+    term_months: Optional[Union[int, List[int]]] = Field(None, description="One term for all, or one per score")
+    vehicle_condition: VehicleCondition = Field("new", description="new or used vehicle")
+    as_of: Optional[date] = Field(None, description="Date for promotional rate cards (default today)")
 
 
 
@@ -105,6 +145,77 @@ class LeaseChartRequest(BaseModel):
     acquisition_fee: Optional[float] = Field(695.0, ge=0, description="Acquisition fee to roll into cap cost")
 
 
+class CompareRequest(BaseModel):
+    """Request body for /compare: one vehicle and term priced as both a loan and a lease."""
+    vehicle_amount: float = Field(..., gt=0, description="Vehicle price")
+    term_months: int = Field(..., gt=0, description="Loan and lease term in months")
+    apr_percent: float = Field(..., ge=0, description="Loan APR percentage, e.g., 4.5 for 4.5% APR")
+    down_payment_cash: float = Field(0, ge=0, description="Loan cash down payment")
+    tax_rate: float = Field(0.0825, ge=0, description="Loan tax rate (lease stays tax-free)")
+    money_factor: float = Field(0.00190, ge=0, description="Lease money factor (MF ~ APR/2400)")
+    acquisition_fee: float = Field(695.0, ge=0, description="Lease acquisition fee rolled into cap cost")
+
+
+class LeaseBulkRequest(BaseModel):
+    """Request body for /lease/calculator/bulk: many lease tuples priced in one call."""
+    quotes: List[LeaseChartRequest] = Field(..., min_length=1, description="Lease inputs to price")
+
+
+class LoanAffordabilityRequest(BaseModel):
+    """Request body for /loan/affordability: the most vehicle each monthly budget buys, per term."""
+    monthly_budgets: List[Annotated[float, Field(ge=0, le=1_000_000)]] = Field(
+        ..., min_length=1, description="Monthly payments (tax included) to invert")
+    term_months: List[Annotated[int, Field(ge=1, le=120)]] = Field(
+        [36, 48, 60, 72, 84], min_length=1, description="Loan terms in months")
+    apr_percent: float = Field(..., ge=0, description="APR percentage, e.g., 4.5 for 4.5% APR")
+    down_payment_cash: float = Field(0, ge=0, description="Cash paid today")
+    tax_rate: float = Field(0.0825, ge=0, description="Default Dallas combined tax 8.25% (applied monthly for demo)")
+
+
+class LeaseAffordabilityRequest(BaseModel):
+    """Request body for /lease/affordability: the most vehicle each monthly budget leases, per term."""
+    monthly_budgets: List[Annotated[float, Field(ge=0, le=1_000_000)]] = Field(
+        ..., min_length=1, description="Monthly lease payments to invert")
+    term_months: List[Annotated[int, Field(ge=1, le=120)]] = Field(
+        [24, 36, 48, 60], min_length=1, description="Lease terms in months")
+    money_factor: float = Field(0.00190, ge=0, description="Lease money factor (MF ~ APR/2400)")
+    acquisition_fee: float = Field(695.0, ge=0, description="Acquisition fee to roll into cap cost")
+    down_payment: float = Field(0, ge=0, description="Cap cost reduction paid at signing")
+
+
+class ProfileRequest(BaseModel):
+    """A customer_finance_inputs row for POST /profiles (ProfileForm); `id` updates an existing profile."""
+    id: Optional[str] = Field(None, description="Profile id; generated when omitted")
+    income_annual_usd: float = Field(..., ge=0, description="Annual income")
+    credit_score: int = Field(..., ge=300, le=850, description="FICO score (300-850)")
+    down_payment_usd: float = Field(0, ge=0, description="Cash down payment")
+    monthly_budget_usd: float = Field(..., ge=250, description="Most the customer wants to pay per month")
+    lease_term_months: Optional[Literal[24, 36, 48, 60]] = None
+    loan_term_months: Optional[Literal[36, 48, 60, 72, 84]] = None
+    zipcode: Optional[str] = Field(None, max_length=10)
+    employment_status: Optional[Literal["student", "employed", "self_employed", "unemployed", "retired", "other"]] = None
+    preferred_body_style: Optional[Literal["sedan", "suv", "truck", "minivan", "hatchback", "coupe", "other"]] = None
+    preferred_fuel_type: Optional[Literal["gas", "hybrid", "electric", "diesel", "other"]] = None
+    consent: bool = Field(True, description="Customer agreed to be used for recommendations")
+
+
+class ProfileBulkRequest(BaseModel):
+    """Request body for POST /profiles/bulk: profiles upserted in one transaction per batch."""
+    profiles: List[ProfileRequest] = Field(..., min_length=1, max_length=10_000, description="Profiles to import")
+
+
+class RecommendationRequest(BaseModel):
+    """Request body for POST /recommendations: an ad-hoc profile shaped like a customer_finance_inputs row."""
+    credit_score: int = Field(..., ge=300, le=850, description="FICO score (300-850)")
+    monthly_budget_usd: float = Field(..., gt=0, description="Most the customer wants to pay per month")
+    down_payment_usd: float = Field(0, ge=0, description="Cash down payment for a loan")
+    loan_term_months: Optional[int] = Field(None, gt=0, description="Preferred loan term (default 60)")
+    lease_term_months: Optional[int] = Field(None, gt=0, description="Preferred lease term (default 36)")
+    preferred_body_style: Optional[str] = Field(None, description="sedan, suv, truck, minivan, hatchback, coupe")
+    preferred_fuel_type: Optional[str] = Field(None, description="gas, hybrid, electric, diesel")
+    top_k: int = Field(3, ge=1, le=20, description="Vehicles to return per product")
+
+
 # Rebuild models to resolve any postponed annotations when using __future__ annotations
 LoanCore.model_rebuild()
 LeaseCore.model_rebuild()
@@ -112,6 +223,16 @@ CompareLeaseLoan.model_rebuild()
 Turn.model_rebuild()
 ChatRequest.model_rebuild()
 LoanChartRequest.model_rebuild()
+LoanGrid.model_rebuild()
+LoanBatchRequest.model_rebuild()
+LeaseChartRequest.model_rebuild()
+LeaseBulkRequest.model_rebuild()
+CompareRequest.model_rebuild()
+LoanAffordabilityRequest.model_rebuild()
+LeaseAffordabilityRequest.model_rebuild()
+ProfileRequest.model_rebuild()
+ProfileBulkRequest.model_rebuild()
+RecommendationRequest.model_rebuild()
 
 __all__ = [
     "UserRole",
@@ -121,5 +242,15 @@ __all__ = [
     "CompareLeaseLoan",
     "Turn",
     "ChatRequest",
-    "LoanChartRequest"
+    "LoanChartRequest",
+    "LoanGrid",
+    "LoanBatchRequest",
+    "LeaseChartRequest",
+    "LeaseBulkRequest",
+    "CompareRequest",
+    "LoanAffordabilityRequest",
+    "LeaseAffordabilityRequest",
+    "ProfileRequest",
+    "ProfileBulkRequest",
+    "RecommendationRequest",
 ]
@@ -0,0 +1,258 @@
+"""
+Key/value state shared by every worker process: rate-limit counters and the
+second-level (cross-worker) tier of the quote and chat response caches.
+
+Backends, selected by SHARED_STATE_BACKEND:
+- memory: per process (the default; enough for a single worker)
+- sqlite: one WAL-mode database file on local disk (SHARED_STATE_DB), for
+  several workers on one host; each thread of each process gets its own
+  connection
+- redis: any Redis-compatible server (SHARED_STATE_REDIS_URL); needs the
+  `redis` package
+
+Keys are namespaced with SHARED_STATE_PREFIX. Values are bytes; every key
+has a TTL.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "shared_state.db"
+
+
+class StateStore(ABC):
+    """Expiring byte values plus fixed-window counters"""
+
+    shared = True  # visible to other processes
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Value for `key`, or None when missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        """Store `value` for `ttl_seconds`"""
+
+    @abstractmethod
+    def incr(self, key: str, ttl_seconds: float) -> int:
+        """Increment a counter and return it; a new (or expired) counter starts at 1 and lives `ttl_seconds`"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store, bounded LRU"""
+
+    shared = False
+
+    def __init__(self, prefix: str = "", max_entries: int = 100_000):
+        super().__init__(prefix)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _put(self, key: str, entry: Tuple[float, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(self.prefix + key, time.monotonic())
+            return entry[1] if entry is not None else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        with self._lock:
+            self._put(self.prefix + key, (time.monotonic() + ttl_seconds, value))
+
+    def incr(self, key: str, ttl_seconds: float) -> int:
+        key = self.prefix + key
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            count = entry[1] + 1 if entry is not None else 1
+            self._put(key, (entry[0] if entry is not None else now + ttl_seconds, count))
+            return count
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(self.prefix + key, None)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Store in a local SQLite file (WAL, so readers never block the writer).
+    Expiry uses wall-clock time because it is compared across processes;
+    expired rows are purged every `purge_interval` seconds.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_DB_PATH, prefix: str = "", purge_interval: float = 60.0):
+        super().__init__(prefix)
+        self.path = str(path)
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS shared_state (
+                     key TEXT PRIMARY KEY,
+                     value BLOB NOT NULL,
+                     expires_at REAL NOT NULL
+                   ) WITHOUT ROWID"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_shared_state_expires ON shared_state (expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (connections must not cross processes)
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn = self._connect()
+            self._local.pid = pid
+        return self._local.conn
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self._conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn.execute(
+            "SELECT value FROM shared_state WHERE key = ? AND expires_at > ?", (self.prefix + key, time.time())
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (self.prefix + key, value, now + ttl_seconds),
+        )
+        self._maybe_purge(now)
+
+    def incr(self, key: str, ttl_seconds: float) -> int:
+        now = time.time()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """INSERT INTO shared_state (key, value, expires_at) VALUES (?, 1, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                     value = CASE WHEN expires_at <= ? THEN 1 ELSE value + 1 END,
+                     expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END""",
+                (self.prefix + key, now + ttl_seconds, now, now),
+            )
+            (count,) = conn.execute("SELECT value FROM shared_state WHERE key = ?", (self.prefix + key,)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return int(count)
+
+    def delete(self, key: str) -> None:
+        self._conn.execute("DELETE FROM shared_state WHERE key = ?", (self.prefix + key,))
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+            self._local.conn = None
+            self._local.pid = None
+
+
+class RedisStateStore(StateStore):
+    """Store on a Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly)"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "", client=None):
+        super().__init__(prefix)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError("redis package not installed. Run: pip install redis")
+            client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self._redis = client  # redis-py pools connections per process and resets the pool after fork
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._redis.set(self.prefix + key, value, px=max(1, int(ttl_seconds * 1000)))
+
+    def incr(self, key: str, ttl_seconds: float) -> int:
+        key = self.prefix + key
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.set(key, 0, px=max(1, int(ttl_seconds * 1000)), nx=True)  # start the window; INCR keeps the TTL
+        pipe.incr(key)
+        return int(pipe.execute()[1])
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(self.prefix + key)
+
+    def close(self) -> None:
+        self._redis.close()
+
+
+def create_state_store() -> StateStore:
+    """Build the store selected by SHARED_STATE_BACKEND (memory | sqlite | redis)"""
+    backend = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+    prefix = os.getenv("SHARED_STATE_PREFIX", "toyota:")
+    if backend == "sqlite":
+        return SQLiteStateStore(os.getenv("SHARED_STATE_DB", str(DEFAULT_DB_PATH)), prefix=prefix)
+    if backend == "redis":
+        return RedisStateStore(os.getenv("SHARED_STATE_REDIS_URL", "redis://localhost:6379/0"), prefix=prefix)
+    return MemoryStateStore(prefix=prefix)
+
+
+_store: Optional[StateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """The process-wide store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_state_store()
+    return _store
+
+
+def shared_store() -> Optional[StateStore]:
+    """The process-wide store when it is shared across workers, else None (caches stay process-local)"""
+    store = get_state_store()
+    return store if store.shared else None
+
+
+def state_stats() -> Dict[str, Any]:
+    store = get_state_store()
+    return {"backend": type(store).__name__, "shared": store.shared}
@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+import pytest
+from hypothesis import given, settings, strategies as st
+from pydantic import ValidationError
+
+from affordability_calculator import MAX_MONTHLY_BUDGET, lease_affordability, loan_affordability
+from lease_calculator import build_lease_chartjs_data_no_tax
+from loan_calculator import build_loan_chartjs_data
+
+budgets = st.lists(st.integers(5_000, 250_000).map(lambda c: c / 100), min_size=1, max_size=5)
+
+
+def _loan_payment(amount, kw):
+    return build_loan_chartjs_data(vehicle_amount=Decimal(str(amount)), **kw)["totals"]["monthly_payment_total"]
+
+
+@settings(max_examples=40, deadline=None)
+@given(budgets, st.integers(0, 2500).map(lambda bp: bp / 100), st.integers(0, 500_000).map(lambda c: c / 100),
+       st.lists(st.integers(12, 96), min_size=1, max_size=3, unique=True))
+def test_loan_affordability_is_the_exact_maximum(monthly_budgets, apr, down, terms):
+    kw = {"down_payment_cash": down, "apr_percent": apr, "tax_rate": 0.0825}
+    rows = loan_affordability(monthly_budgets=monthly_budgets, term_months=terms, **kw)
+    for budget, row in zip(monthly_budgets, rows):
+        for quote in row["terms"]:
+            kw_n = dict(kw, term_months=quote["term_months"])
+            amount = quote["max_vehicle_amount"]
+            paid = _loan_payment(amount, kw_n)
+            assert paid == quote["monthly_payment_total"] and paid <= budget
+            assert _loan_payment(round(amount + 0.01, 2), kw_n) > budget
+
+
+@settings(max_examples=40, deadline=None)
+@given(budgets, st.integers(0, 400).map(lambda m: m / 100_000), st.integers(0, 1_000).map(float),
+       st.integers(0, 300_000).map(lambda c: c / 100), st.lists(st.integers(12, 60), min_size=1, max_size=3, unique=True))
+def test_lease_affordability_is_the_exact_maximum(monthly_budgets, money_factor, fee, down, terms):
+    rows = lease_affordability(monthly_budgets=monthly_budgets, term_months=terms, money_factor=money_factor,
+                               acquisition_fee=fee, down_payment=down)
+    # The down payment is a cap cost reduction: the same as lowering the fee by it
+    kw = {"money_factor": Decimal(str(money_factor)), "acquisition_fee": Decimal(str(fee)) - Decimal(str(down))}
+    for budget, row in zip(monthly_budgets, rows):
+        for quote in row["terms"]:
+            amount = quote["max_vehicle_amount"]
+            if amount is None:
+                continue
+            kw_n = dict(kw, term_months=quote["term_months"])
+            totals = build_lease_chartjs_data_no_tax(vehicle_amount=Decimal(str(amount)), **kw_n)["totals"]
+            assert totals["monthly_payment_total"] == quote["monthly_payment_total"] <= budget
+            assert totals["residual_value"] == quote["residual_value"]
+            over = build_lease_chartjs_data_no_tax(vehicle_amount=Decimal(str(amount)) + Decimal("0.01"), **kw_n)
+            assert over["totals"]["monthly_payment_total"] > budget
+
+
+def test_huge_budgets_are_rejected_instead_of_hanging():
+    from schemas import LeaseAffordabilityRequest, LoanAffordabilityRequest
+
+    for model, extra in ((LoanAffordabilityRequest, {"apr_percent": 5}), (LeaseAffordabilityRequest, {})):
+        with pytest.raises(ValidationError):
+            model(monthly_budgets=[1e16], term_months=[60], **extra)
+        with pytest.raises(ValidationError):
+            model(monthly_budgets=[500], term_months=[0], **extra)
+        with pytest.raises(ValidationError):
+            model(monthly_budgets=[500], term_months=[121], **extra)
+    with pytest.raises(ValueError, match="monthly budgets"):
+        loan_affordability(monthly_budgets=[1e16], term_months=[60], apr_percent=5)
+    with pytest.raises(ValueError, match="out of range"):
+        loan_affordability(monthly_budgets=[500], term_months=[60], apr_percent=5, down_payment_cash=1e16)
+    with pytest.raises(ValueError, match="out of range"):
+        lease_affordability(monthly_budgets=[500], term_months=[60], down_payment=1e16)
+
+
+def test_the_largest_budget_is_still_exact():
+    [row] = loan_affordability(monthly_budgets=[MAX_MONTHLY_BUDGET], term_months=[120], apr_percent=29.99)
+    quote = row["terms"][0]
+    kw = {"term_months": 120, "apr_percent": 29.99, "tax_rate": 0.0825}
+    assert _loan_payment(quote["max_vehicle_amount"], kw) == quote["monthly_payment_total"] <= MAX_MONTHLY_BUDGET
+    assert _loan_payment(round(quote["max_vehicle_amount"] + 0.01, 2), kw) > MAX_MONTHLY_BUDGET
+
+
+def test_affordability_endpoint_returns_400_for_out_of_range_amounts():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    client = TestClient(app)
+    assert client.post("/loan/affordability",
+                       json={"monthly_budgets": [1e16], "term_months": [60], "apr_percent": 5}).status_code == 422
+    response = client.post("/loan/affordability", json={"monthly_budgets": [500], "term_months": [60],
+                                                        "apr_percent": 5, "down_payment_cash": 1e16})
+    assert response.status_code == 400
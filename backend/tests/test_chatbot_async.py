@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from history_store import InMemoryHistoryStore
+
+
+class _SlowHistoryStore(InMemoryHistoryStore):
+    """Stands in for a SQLite store stuck behind another writer"""
+
+    def append(self, user_id, role, content):
+        time.sleep(0.2)
+        super().append(user_id, role, content)
+
+
+def test_history_writes_do_not_block_the_event_loop(monkeypatch):
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_API_KEY", "AZURE_OPENAI_API_KEY"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("CHATBOT_PROVIDER", "openai")
+    monkeypatch.setenv("CHATBOT_HISTORY_BACKEND", "memory")
+    from chatbot import ToyotaFinanceChatbot
+
+    bot = ToyotaFinanceChatbot()
+    bot.history_store = _SlowHistoryStore()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        reply = await bot.achat("u1", "What is a money factor?")
+        events = [e async for e in bot.astream_chat("u1", "And the residual value?")]
+        task.cancel()
+        return reply, events, ticks
+
+    reply, events, ticks = asyncio.run(run())
+    assert reply["response"] and events[-1]["done"]
+    # Four 0.2 s appends ran on worker threads while the loop kept ticking
+    assert ticks >= 40
+    assert len(bot.history_store.history("u1")) == 4
+
+
+class _RecordingOpenAI:
+    """Sync OpenAI client stand-in that records the request it was given"""
+
+    def __init__(self):
+        self.kwargs = None
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.kwargs = kwargs
+        message = type("Message", (), {"content": "ok"})
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+def test_sync_requests_carry_the_router_timeout(monkeypatch):
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_API_KEY", "AZURE_OPENAI_API_KEY"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("CHATBOT_PROVIDER", "openai")
+    monkeypatch.setenv("CHATBOT_HISTORY_BACKEND", "memory")
+    monkeypatch.setenv("CHATBOT_PROVIDER_TIMEOUT_SECONDS", "7.5")
+    from chatbot import ToyotaFinanceChatbot
+
+    bot = ToyotaFinanceChatbot()
+    client = _RecordingOpenAI()
+    monkeypatch.setattr(bot, "_client_for", lambda provider: client)
+    provider, text = bot.router.call(lambda p: bot._request(p, "u1", "hi"))
+    assert (provider, text) == ("openai", "ok")
+    assert client.kwargs["timeout"] == 7.5
+
+
+class _FakeAnthropic:
+    """Sync Anthropic client stand-in"""
+
+    def __init__(self):
+        self.messages = self
+
+    def create(self, **kwargs):
+        return type("Response", (), {"content": [type("Block", (), {"text": "from claude"})]})
+
+
+def test_an_unconfigured_primary_fails_over_to_a_configured_fallback(monkeypatch):
+    for name in ("OPENAI_API_KEY", "GOOGLE_API_KEY", "AZURE_OPENAI_API_KEY"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("CHATBOT_PROVIDER", "openai")
+    monkeypatch.setenv("CHATBOT_FALLBACK_PROVIDERS", "anthropic")
+    monkeypatch.setenv("CHATBOT_HISTORY_BACKEND", "memory")
+    from chatbot import MockLLMClient, ToyotaFinanceChatbot
+
+    bot = ToyotaFinanceChatbot()
+    clients = {"openai": MockLLMClient(), "anthropic": _FakeAnthropic()}
+    monkeypatch.setattr(bot, "_client_for", clients.__getitem__)
+    monkeypatch.setattr(bot, "_async_client_for", lambda provider: None)
+    assert bot.providers == ["openai", "anthropic"]
+    assert bot.chat("u1", "What is a money factor?")["response"] == "from claude"
+    assert asyncio.run(bot.achat("u2", "What is a money factor?"))["response"] == "from claude"
+
+    async def stream():
+        return [e async for e in bot.astream_chat("u3", "What is a money factor?")]
+
+    assert asyncio.run(stream())[0]["delta"] == "from claude"
+    stats = bot.router.stats()["providers"]
+    assert stats["openai"]["requests"] == 0 and stats["anthropic"]["wins"] == 3
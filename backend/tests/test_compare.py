@@ -0,0 +1,35 @@
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from compare_calculator import build_lease_loan_comparison
+from lease_calculator import build_lease_chartjs_data_no_tax
+from loan_calculator import build_loan_chartjs_data
+
+cents = lambda lo, hi: st.integers(lo * 100, hi * 100).map(lambda c: c / 100)
+
+
+@settings(max_examples=100, deadline=None)
+@given(vehicle_amount=cents(5_000, 120_000), down_payment_cash=cents(0, 20_000), term_months=st.integers(1, 84),
+       apr_percent=st.integers(0, 3000).map(lambda bp: bp / 100), tax_rate=st.integers(0, 1200).map(lambda b: b / 10000),
+       money_factor=st.integers(0, 400).map(lambda m: m / 100_000), acquisition_fee=cents(0, 1000))
+def test_comparison_cores_match_the_single_calculators(vehicle_amount, down_payment_cash, term_months, apr_percent,
+                                                       tax_rate, money_factor, acquisition_fee):
+    out = build_lease_loan_comparison(
+        vehicle_amount=vehicle_amount, down_payment_cash=down_payment_cash, term_months=term_months,
+        apr_percent=apr_percent, tax_rate=tax_rate, money_factor=money_factor, acquisition_fee=acquisition_fee,
+    )
+    loan = build_loan_chartjs_data(vehicle_amount=vehicle_amount, down_payment_cash=down_payment_cash,
+                                   term_months=term_months, apr_percent=apr_percent, tax_rate=tax_rate)
+    lease = build_lease_chartjs_data_no_tax(vehicle_amount=vehicle_amount, term_months=term_months,
+                                            money_factor=money_factor, acquisition_fee=acquisition_fee)
+    assert out["loanCore"]["data"] == loan
+    assert out["leaseCore"]["data"] == lease
+    totals = out["comparison"]["totals"]
+    assert totals["monthly_payment_difference"] == pytest.approx(
+        loan["totals"]["monthly_payment_total"] - lease["totals"]["monthly_payment_total"], abs=1e-9)
+    assert totals["lease_total_cost"] == pytest.approx(lease["totals"]["total_paid"], abs=1e-9)
+
+
+def test_comparison_rejects_a_zero_term():
+    with pytest.raises(ValueError, match="term_months"):
+        build_lease_loan_comparison(vehicle_amount=30000, term_months=0, apr_percent=5)
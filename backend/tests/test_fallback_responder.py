@@ -0,0 +1,27 @@
+import pytest
+
+from fallback_responder import INTENTS, fallback_responder
+
+REPLIES = {name: reply for name, _, reply in INTENTS}
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("any recommendations for me?", "vehicle_recommendation"),
+    ("What would you recommend?", "vehicle_recommendation"),
+    ("I was recommended the RAV4", "vehicle_recommendation"),
+    ("got any suggestions?", "vehicle_recommendation"),
+    ("I leased my last one", "lease"),
+    ("are rentals an option", "lease"),
+    ("Is there a prepayment penalty?", "financing"),
+    ("how is the fuel efficiency", "hybrid_electric"),
+    ("anything cheaper?", "pricing"),
+    ("what does ToyotaCare cover", "warranty_service"),
+    ("how is the reliability", "warranty_service"),
+])
+def test_derived_forms_reach_their_intent(message, intent):
+    assert fallback_responder.respond(message) == REPLIES[intent]
+
+
+@pytest.mark.parametrize("message", ["this is confusing", "where is the nearest dealership", "what about the current offers"])
+def test_keywords_do_not_match_inside_other_words(message):
+    assert fallback_responder.classify(message) == []
@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from history_store import SQLiteHistoryStore
+
+
+class _FlakyConnection:
+    """Delegates to a real connection; BEGIN fails while `locked` is set (SQLITE_BUSY)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.locked = True
+
+    def execute(self, sql, *args):
+        if self.locked and sql.startswith("BEGIN"):
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _stored(store, user_id):
+    (count,) = store._conn.execute("SELECT COUNT(*) FROM chat_messages WHERE user_id = ?", (user_id,)).fetchone()
+    return count
+
+
+def test_failed_turn_flush_keeps_rows_pending(tmp_path):
+    store = SQLiteHistoryStore(tmp_path / "history.db", flush_interval=0, flush_per_turn=True)
+    store._conn = flaky = _FlakyConnection(store._conn)
+    store.append("u1", "user", "hi")
+    store.append("u1", "assistant", "hello")   # must not raise into the chat path
+    assert [m["content"] for m in store.history("u1")] == ["hi", "hello"]
+    assert _stored(store, "u1") == 0
+
+    flaky.locked = False
+    store.flush()
+    assert _stored(store, "u1") == 2 and not store._pending
+    store.close()
+
+
+def test_flusher_survives_failures(tmp_path):
+    store = SQLiteHistoryStore(tmp_path / "history.db", flush_interval=0.02)
+    store._conn = flaky = _FlakyConnection(store._conn)
+    store.append("u1", "user", "hi")
+    time.sleep(0.1)                             # several failed ticks
+    assert _stored(store, "u1") == 0
+    flaky.locked = False
+    deadline = time.monotonic() + 2
+    while _stored(store, "u1") == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _stored(store, "u1") == 1
+    store.close()
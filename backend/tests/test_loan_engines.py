@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from hypothesis import given, settings, strategies as st
+
+from lease_calculator import build_lease_chartjs_data_no_tax, build_lease_quotes_bulk
+from loan_calculator import build_loan_batch, build_loan_chartjs_data
+
+cents = lambda lo, hi: st.integers(lo * 100, hi * 100).map(lambda c: Decimal(c) / 100)
+
+loan_scenarios = st.fixed_dictionaries({
+    "vehicle_amount": cents(0, 150_000),
+    "down_payment_cash": cents(0, 20_000),
+    "term_months": st.integers(1, 96),
+    "apr_percent": st.integers(0, 3000).map(lambda bp: Decimal(bp) / 100),   # 0-30%
+    "tax_rate": st.integers(0, 1200).map(lambda bp: Decimal(bp) / 10_000),
+})
+
+lease_quotes = st.fixed_dictionaries({
+    "vehicle_amount": cents(5_000, 120_000),
+    "term_months": st.integers(12, 72),
+    "money_factor": st.integers(0, 400).map(lambda m: Decimal(m) / 100_000),
+    "acquisition_fee": cents(0, 1_000),
+})
+
+
+@settings(max_examples=300, deadline=None)
+@given(loan_scenarios)
+def test_cents_engine_matches_decimal_engine(scenario):
+    assert build_loan_chartjs_data(**scenario, engine="cents") == build_loan_chartjs_data(**scenario, engine="decimal")
+
+
+@settings(max_examples=50, deadline=None)
+@given(st.lists(loan_scenarios, min_size=1, max_size=20))
+def test_loan_batch_matches_single_quotes(scenarios):
+    for scenario, row in zip(scenarios, build_loan_batch(scenarios, include_schedule=True)):
+        single = build_loan_chartjs_data(**scenario, engine="decimal")
+        assert row["totals"] == single["totals"]
+        # The single builder keeps schedule money as Decimal; the batch returns floats
+        assert row["schedule"] == [{k: float(v) for k, v in p.items()} for p in single["schedule"]]
+
+
+@settings(max_examples=50, deadline=None)
+@given(st.lists(lease_quotes, min_size=1, max_size=20))
+def test_lease_bulk_matches_single_quotes(quotes):
+    for quote, totals in zip(quotes, build_lease_quotes_bulk(quotes)):
+        assert totals == build_lease_chartjs_data_no_tax(**quote)["totals"]
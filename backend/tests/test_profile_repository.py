@@ -0,0 +1,77 @@
+import hashlib
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from profile_repository import DEFAULT_DB_PATH, INDEXES, ProfileRepository
+
+
+def _digest(path):
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def test_opening_and_reading_leave_the_file_unchanged(tmp_path):
+    path = tmp_path / "finance_inputs.db"
+    shutil.copyfile(DEFAULT_DB_PATH, path)
+    before = _digest(path)
+    repo = ProfileRepository(path)
+    repo.count()
+    repo.find(min_credit_score=700, limit=5)
+    repo.close()
+    assert _digest(path) == before
+    assert not (tmp_path / "finance_inputs.db-wal").exists()
+
+
+def test_migrate_adds_indexes_once(tmp_path):
+    path = tmp_path / "profiles.db"
+    repo = ProfileRepository(path)
+    assert repo.migrate() == list(INDEXES)
+    assert repo.migrate() == []
+    repo.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(INDEXES) <= names
+
+
+class _WriteDuringRead:
+    """Connection proxy: after the profile read runs, another thread updates that profile"""
+
+    def __init__(self, conn, write):
+        self._conn = conn
+        self._write = write
+
+    def execute(self, sql, params=()):
+        rows = self._conn.execute(sql, params).fetchall()
+        if sql.startswith("SELECT id,") and self._write is not None:
+            write, self._write = self._write, None
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+        return _Rows(rows)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _Rows(list):
+    def fetchone(self):
+        return self[0] if self else None
+
+    def fetchall(self):
+        return list(self)
+
+
+PROFILE = {"id": "p1", "income_annual_usd": 80_000, "credit_score": 700, "monthly_budget_usd": 600}
+
+
+@pytest.mark.parametrize("read", [lambda repo: repo.get("p1"), lambda repo: repo.get_many(["p1"])["p1"]])
+def test_a_read_racing_a_write_does_not_cache_the_old_row(tmp_path, read):
+    repo = ProfileRepository(tmp_path / "profiles.db")
+    repo.upsert(PROFILE)
+    repo._local.conn = _WriteDuringRead(repo._conn, lambda: repo.upsert({**PROFILE, "credit_score": 780}))
+    assert read(repo)["credit_score"] == 700   # read before the write landed
+    assert repo.get("p1")["credit_score"] == 780
+    assert repo.get_many(["p1"])["p1"]["credit_score"] == 780
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from provider_router import CircuitBreaker, NoProviderAvailable, ProviderRouter
+
+
+def _open_router(reset_seconds=0.0):
+    router = ProviderRouter(["a", "b"], failure_threshold=1, reset_seconds=reset_seconds)
+    for provider in ("a", "b"):
+        router.record(provider, None, RuntimeError("down"))
+    return router
+
+
+def test_available_does_not_move_breakers_to_half_open():
+    router = _open_router()
+    assert router.available() == ["a", "b"]
+    assert [router._breakers[p].state for p in "ab"] == [CircuitBreaker.OPEN] * 2
+
+
+def test_only_the_dispatched_provider_gets_the_probe():
+    router = _open_router()
+    assert router.call(lambda p: p.upper()) == ("a", "A")
+    assert router._breakers["a"].state == CircuitBreaker.CLOSED
+    assert router._breakers["b"].state == CircuitBreaker.OPEN
+
+
+def test_async_calls_admit_only_what_they_dispatch():
+    router = _open_router()
+
+    async def request(provider):
+        return provider.upper()
+
+    assert asyncio.run(router.acall(request)) == ("a", "A")
+    assert router._breakers["b"].state == CircuitBreaker.OPEN
+
+
+def test_calls_can_be_limited_to_some_providers():
+    router = ProviderRouter(["a", "b"])
+    assert router.call(lambda p: p, providers=["b"]) == ("b", "b")
+    with pytest.raises(NoProviderAvailable):
+        router.call(lambda p: p, providers=[])
@@ -0,0 +1,62 @@
+import csv
+import io
+import threading
+
+from loan_calculator import build_loan_batch
+from profile_repository import ProfileRepository
+from quote_export import SCHEDULE_COLUMNS, iter_export, scenarios_from_profiles
+
+
+def _repository(tmp_path, count=7):
+    repo = ProfileRepository(tmp_path / "profiles.db")
+    repo.upsert_many(
+        {"income_annual_usd": 90_000, "credit_score": 640 + 20 * k, "monthly_budget_usd": 900 + 100 * k,
+         "down_payment_usd": 1000 * k, "loan_term_months": (36, 48, 60, 72, 84)[k % 5]}
+        for k in range(count)
+    )
+    return repo
+
+
+def _next_on_new_thread(it):
+    out = {}
+
+    def step():
+        try:
+            out["value"] = next(it, None)
+        except Exception as exc:
+            out["error"] = exc
+
+    thread = threading.Thread(target=step)
+    thread.start()
+    thread.join()
+    if "error" in out:
+        raise out["error"]
+    return out["value"]
+
+
+def test_profile_scenarios_resume_on_any_thread(tmp_path):
+    # StreamingResponse resumes a sync generator on whichever threadpool thread is free
+    repo = _repository(tmp_path)
+    it = scenarios_from_profiles(repo, batch_size=2)
+    ids = []
+    while (scenario := _next_on_new_thread(it)) is not None:
+        ids.append(scenario["scenario_id"])
+    assert len(ids) == 7 and len(set(ids)) == 7
+
+
+def test_schedule_export_matches_loan_batch():
+    scenarios = [
+        {"scenario_id": f"s{k}", "vehicle_amount": 18_000 + 3_517.37 * k, "down_payment_cash": 500 * k,
+         "term_months": (12, 36, 60, 72, 84)[k % 5], "apr_percent": (0, 2.9, 6.49, 11.5)[k % 4]}
+        for k in range(23)
+    ]
+    body = b"".join(iter_export(iter(scenarios), fmt="csv", chunk_size=5))
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert tuple(rows[0]) == SCHEDULE_COLUMNS
+    expected = [
+        (sc["scenario_id"], p["period"], p["payment_base"], p["interest"], p["principal"], p["tax"],
+         p["payment_total"], p["balance_end"])
+        for sc, row in zip(scenarios, build_loan_batch(scenarios, include_schedule=True))
+        for p in row["schedule"]
+    ]
+    assert [(r[0], int(r[1]), *map(float, r[2:])) for r in rows[1:]] == expected
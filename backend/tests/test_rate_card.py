@@ -0,0 +1,105 @@
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from rate_card import DEFAULT_RATE_CARDS_PATH, RateCards, RateCardStore, load_rate_cards, parse_card
+
+SPRING = (date(2026, 3, 1), date(2026, 5, 31))
+
+CARDS = [
+    {"name": "base", "tiers": [{"min_score": 300, "apr_percent": 20.0}, {"min_score": 700, "apr_percent": 6.5}]},
+    {"name": "used", "condition": "used",
+     "tiers": [{"min_score": 300, "apr_percent": 24.0}, {"min_score": 650, "apr_percent": 9.0}]},
+    {"name": "long-term", "min_term": 73, "max_term": 96,
+     "tiers": [{"min_score": 300, "apr_percent": 21.5}, {"min_score": 700, "apr_percent": 8.0}]},
+    {"name": "spring-promo", "condition": "new", "min_term": 36, "max_term": 60,
+     "starts": SPRING[0].isoformat(), "ends": SPRING[1].isoformat(),
+     "tiers": [{"min_score": 720, "apr_percent": 1.9}, {"min_score": 660, "apr_percent": 3.9}]},
+]
+
+
+def _reference(specs, score, term, condition, on):
+    """The documented rule, card by card: the last card that covers the score wins"""
+    score = min(850, max(300, int(score)))
+    apr = None
+    for card in map(parse_card, specs):
+        if condition not in card.conditions or not card.active_on(on.toordinal()):
+            continue
+        if card.min_term is not None and (term is None or not card.min_term <= term <= card.max_term):
+            continue
+        tiers = [a for s, a in zip(card.min_scores, card.aprs) if s <= score]
+        if tiers:
+            apr = tiers[-1]
+    return apr
+
+
+compiled = RateCards([parse_card(spec) for spec in CARDS])
+days = st.integers(-30, 120).map(lambda n: SPRING[0] + timedelta(days=n))
+
+
+@settings(max_examples=500, deadline=None)
+@given(st.floats(0, 1000), st.none() | st.integers(1, 120), st.sampled_from(["new", "used"]), days)
+def test_compiled_lookup_matches_card_rules(score, term, condition, on):
+    assert compiled.lookup(score, term, condition, on) == _reference(CARDS, score, term, condition, on)
+
+
+@settings(max_examples=100, deadline=None)
+@given(st.lists(st.tuples(st.floats(0, 1000), st.integers(1, 120)), min_size=1, max_size=50),
+       st.sampled_from(["new", "used"]), days)
+def test_lookup_many_matches_lookup(applicants, condition, on):
+    scores, terms = zip(*applicants)
+    expected = [compiled.lookup(s, t, condition, on) for s, t in applicants]
+    assert compiled.lookup_many(scores, terms, condition, on).tolist() == expected
+    assert compiled.lookup_many(np.array(scores), None, condition, on).tolist() == [
+        compiled.lookup(s, None, condition, on) for s in scores
+    ]
+
+
+def _old_buckets(score):
+    # The hard-coded tiers the default card file replaced
+    s = max(300, min(850, int(score)))
+    if s >= 781:
+        return 5.9
+    if s >= 661:
+        return 7.9
+    if s >= 601:
+        return 11.5
+    if s >= 501:
+        return 16.9
+    return 22.9
+
+
+def test_default_cards_match_the_old_buckets():
+    cards = load_rate_cards(DEFAULT_RATE_CARDS_PATH)
+    for score in np.arange(250, 900, 0.5):
+        assert cards.lookup(score) == _old_buckets(score)
+        assert cards.lookup(score, 60) == _old_buckets(score)
+
+
+def test_uncovered_scores_are_rejected():
+    with pytest.raises(ValueError, match="no rate card covers score 300"):
+        RateCards([parse_card({"name": "prime", "tiers": [{"min_score": 660, "apr_percent": 5.0}]})])
+
+
+def test_lookup_coerces_and_checks_terms_and_conditions():
+    assert compiled.lookup(750, 80.0) == compiled.lookup(750, np.int64(80)) == compiled.lookup(750, 80.9) == 8.0
+    for term in (0, 121, -5):
+        with pytest.raises(ValueError, match="term_months"):
+            compiled.lookup(750, term)
+    with pytest.raises(ValueError, match="condition"):
+        compiled.lookup(750, condition="certified")
+
+
+def test_store_swaps_in_a_changed_file(tmp_path):
+    path = tmp_path / "cards.json"
+    path.write_text(json.dumps({"version": "a", "cards": CARDS[:1]}))
+    store = RateCardStore(path, reload_seconds=0)
+    assert store.current().version == "a"
+    path.write_text(json.dumps({"version": "b", "cards": CARDS[:2]}))
+    os.utime(path, ns=(1, 1))
+    assert store.current().version == "a"   # reloading off: current() never re-checks
+    assert store.reload() and store.current().version == "b"
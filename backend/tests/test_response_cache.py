@@ -0,0 +1,57 @@
+import pytest
+
+from response_cache import MIN_SIMILARITY_THRESHOLD, ResponseCache, normalize_message
+
+# Pairs whose trigram MinHash similarity is high but whose answers differ
+DIFFERENT_QUESTIONS = [
+    ("What are the monthly payments on a Camry Hybrid lease for 36 months?",
+     "What are the monthly payments on a Prius Hybrid lease for 36 months?"),
+    ("Can I still get approved for a car loan with bad credit?",
+     "Can I still get approved for a car loan with good credit?"),
+    ("Should I lease if I drive a lot every year?",
+     "Should I lease if I drive a little every year?"),
+    ("Is a loan better than a lease for someone like me?",
+     "Is a lease better than a loan for someone like me?"),
+    ("What vehicle do you recommend for a family of five on a budget?",
+     "What vehicle do you recommend for a family of two on a budget?"),
+    ("Is it smarter to put more money down on a car loan?",
+     "Is it smarter to put less money down on a car loan?"),
+    ("I don't want a lease, what are my options for financing?",
+     "I want a lease, what are my options for financing?"),
+]
+
+
+def _similar_cache() -> ResponseCache:
+    return ResponseCache(similar=True)
+
+
+@pytest.mark.parametrize("cached, asked", DIFFERENT_QUESTIONS)
+def test_similar_tier_never_answers_a_different_question(cached, asked):
+    cache = _similar_cache()
+    cache.store("openai", "scope", cached, [], "answer for the cached question")
+    assert cache.lookup("openai", "scope", asked, []) is None
+
+
+@pytest.mark.parametrize("cached, asked", DIFFERENT_QUESTIONS)
+def test_guard_tokens_differ(cached, asked):
+    assert normalize_message(cached)[1] != normalize_message(asked)[1]
+
+
+def test_similar_tier_matches_a_rephrasing():
+    cache = _similar_cache()
+    cache.store("openai", "scope", "Can you explain how the money factor on a lease turns into an interest rate?", [], "reply")
+    hit = cache.lookup("openai", "scope", "Can you explain how the money factor on a lease turns into an interest rate please?", [])
+    assert hit is not None and hit.tier == "similar" and hit.similarity >= MIN_SIMILARITY_THRESHOLD
+
+
+def test_exact_only_by_default():
+    cache = ResponseCache()
+    assert not cache.similarity_enabled
+    cache.store("openai", "scope", "What's the APR?", [], "reply")
+    assert cache.lookup("openai", "scope", "whats the apr", []).tier == "exact"
+    assert cache.lookup("openai", "scope", "whats the apr please", []) is None
+
+
+def test_low_threshold_rejected():
+    with pytest.raises(ValueError):
+        ResponseCache(similar=True, similarity_threshold=0.85)
@@ -0,0 +1,19 @@
+import pytest
+from pydantic import ValidationError
+
+from schemas import LoanBatchRequest
+
+
+@pytest.mark.parametrize("axis, value", [
+    ("term_months", 0), ("term_months", -12), ("apr_percents", -1.0),
+    ("vehicle_amounts", -5000.0), ("down_payments", -1.0),
+])
+def test_loan_grid_rejects_what_a_single_scenario_rejects(axis, value):
+    grid = {"vehicle_amounts": [30000], "term_months": [60], "apr_percents": [4.9], axis: [value]}
+    with pytest.raises(ValidationError):
+        LoanBatchRequest(grid=grid)
+
+
+def test_loan_grid_accepts_valid_axes():
+    grid = {"vehicle_amounts": [0, 30000], "down_payments": [0, 2500], "term_months": [36, 60], "apr_percents": [0, 4.9]}
+    assert LoanBatchRequest(grid=grid).grid.term_months == [36, 60]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+from tracing import TracingMiddleware
+
+
+class _SlowKeeper:
+    """ProfileKeeper stand-in whose render and write take a while"""
+
+    def __init__(self):
+        self.stopped_on = None
+        self.written_on = None
+        self.written = threading.Event()
+
+    def sample(self):
+        return True
+
+    def start(self):
+        keeper = self
+
+        class Profiler:
+            def stop(self):
+                keeper.stopped_on = threading.get_ident()
+
+        return Profiler()
+
+    def finish(self, trace, profiler, thread_sessions):
+        time.sleep(0.3)
+        self.written_on = threading.get_ident()
+        self.written.set()
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_profiles_are_written_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("TRACING", "true")
+    middleware = TracingMiddleware(_app)
+    middleware.profiles = keeper = _SlowKeeper()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        start = time.perf_counter()
+        await middleware({"type": "http", "method": "GET", "path": "/", "headers": []}, None, send)
+        return time.perf_counter() - start, threading.get_ident()
+
+    elapsed, loop_thread = asyncio.run(run())
+    assert elapsed < 0.2 and sent[-1]["body"] == b"ok"
+    assert keeper.written.wait(2)
+    assert keeper.stopped_on == loop_thread != keeper.written_on
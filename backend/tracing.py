@@ -0,0 +1,336 @@
+"""
+Request tracing and an opt-in sampling profiler.
+
+Every HTTP request gets a trace: its ID continues an incoming W3C
+`traceparent` header or is generated, and is returned in the `X-Trace-Id`
+and `traceparent` response headers. Code on the request path opens spans
+with `span(name, **attributes)`. Spans follow the OpenTelemetry model
+(32-hex trace id, 16-hex span ids, parent links, attributes, status) and
+are kept in memory for the request; metrics.stage()/calculator() and the
+provider router open them, so a trace breaks down into history, context,
+provider and fallback time, calculator compute, and each provider attempt
+(hedged requests included).
+
+- Requests slower than TRACE_SLOW_MS (default 2000, 0 = off) are logged as
+  one JSON line holding the trace.
+- PROFILE_SLOW_REQUESTS=true samples requests (PROFILE_SAMPLE_RATE) with
+  pyinstrument and keeps the PROFILE_TOP_N slowest in PROFILE_DIR as
+  speedscope flame graphs (https://speedscope.app) next to their trace,
+  rendered and written from a worker thread after the response.
+  Async handlers are profiled across awaits; sync handlers are profiled in
+  their worker thread and merged into the same profile.
+"""
+
+import asyncio
+import functools
+import heapq
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = "x-trace-id"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+# (profile keeper, sessions recorded by worker threads) while the request is being profiled
+_profiling: ContextVar[Optional[Tuple["ProfileKeeper", list]]] = ContextVar("profiling", default=None)
+
+
+def _enabled(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes", "status")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round((self.start - origin) * 1e3, 3),
+            "duration_ms": round((end - self.start) * 1e3, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans of one request; the first span is the request itself"""
+
+    def __init__(self, trace_id: Optional[str] = None, remote_parent_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.remote_parent_id = remote_parent_id
+        self.started_at = time.time()
+        self.spans: List[Span] = []  # appended from worker threads too; list.append is atomic
+
+    @classmethod
+    def from_headers(cls, headers: List[Tuple[bytes, bytes]]) -> "Trace":
+        for name, value in headers:
+            if name == b"traceparent":
+                match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+                if match and match.group(1) != "0" * 32:
+                    return cls(match.group(1), match.group(2))
+        return cls()
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    @property
+    def duration(self) -> float:
+        root = self.root
+        return (root.end if root.end is not None else time.perf_counter()) - root.start
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.root.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.root.start
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1e3, 3),
+            "spans": [s.to_dict(origin) for s in self.spans],
+        }
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record `name` as a child of the current span; a no-op outside a traced request"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span.get()
+    current = Span(name, parent.span_id if parent is not None else trace.remote_parent_id, attributes)
+    trace.spans.append(current)
+    # Restore by value, not token: async generators may resume in another context
+    _span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "cancelled" if isinstance(e, (GeneratorExit, asyncio.CancelledError)) else "error"
+        if current.status == "error":
+            current.attributes["error"] = repr(e)
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _span.set(parent)
+
+
+class ProfileKeeper:
+    """Keeps the profiles of the `top_n` slowest sampled requests on disk"""
+
+    def __init__(self, directory: str, top_n: int = 10, sample_rate: float = 1.0,
+                 interval: float = 0.001, min_seconds: float = 0.0):
+        self.directory = Path(directory)
+        self.top_n = top_n
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.min_seconds = min_seconds
+        self._kept: List[Tuple[float, str, List[Path]]] = []  # min-heap on duration
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        return self.top_n > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    def start_thread(self):
+        from pyinstrument import Profiler
+
+        # The request's async profiler owns this context; a worker thread needs its own
+        profiler = Profiler(interval=self.interval, async_mode="disabled")
+        profiler.start()
+        return profiler
+
+    def _qualifies(self, seconds: float) -> bool:
+        return seconds >= self.min_seconds and (len(self._kept) < self.top_n or seconds > self._kept[0][0])
+
+    def finish(self, trace: Trace, profiler, thread_sessions: list) -> Optional[Path]:
+        """Write the (stopped) profile if the request is among the slowest so far; blocking I/O"""
+        seconds = trace.duration
+        with self._lock:
+            if not self._qualifies(seconds):
+                return None
+        from pyinstrument.renderers import SpeedscopeRenderer
+        from pyinstrument.session import Session
+
+        session = profiler.last_session
+        for extra in thread_sessions:
+            session = Session.combine(session, extra)
+        route = re.sub(r"[^A-Za-z0-9]+", "_", trace.root.name).strip("_")
+        stem = f"{seconds * 1e3:09.1f}ms-{route}-{trace.trace_id}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        flame = self.directory / f"{stem}.speedscope.json"
+        spans = self.directory / f"{stem}.trace.json"
+        flame.write_text(SpeedscopeRenderer().render(session))
+        spans.write_text(json.dumps(trace.to_dict(), indent=2, default=str))
+
+        with self._lock:
+            heapq.heappush(self._kept, (seconds, trace.trace_id, [flame, spans]))
+            evicted = heapq.heappop(self._kept) if len(self._kept) > self.top_n else None
+        if evicted is not None:
+            for path in evicted[2]:
+                path.unlink(missing_ok=True)
+            if evicted[1] == trace.trace_id:
+                return None
+        return flame
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens the request's trace and root span, adds the
+    trace headers to the response, and feeds the slow-request log and profiler.
+    Pure ASGI (not BaseHTTPMiddleware) so the handler runs in this task and
+    the async profiler sees it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = _enabled("TRACING", "true")
+        self.slow_seconds = float(os.getenv("TRACE_SLOW_MS", "2000")) / 1e3
+        self.profiles: Optional[ProfileKeeper] = None
+        if _enabled("PROFILE_SLOW_REQUESTS", "false"):
+            self.profiles = ProfileKeeper(
+                os.getenv("PROFILE_DIR", "profiles"),
+                top_n=int(os.getenv("PROFILE_TOP_N", "10")),
+                sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "1.0")),
+                interval=float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1e3,
+                min_seconds=float(os.getenv("PROFILE_MIN_MS", "0")) / 1e3,
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace.from_headers(scope.get("headers", []))
+        root = Span(f"{scope['method']} {scope['path']}", trace.remote_parent_id,
+                    {"http.method": scope["method"], "http.target": scope["path"]})
+        trace.spans.append(root)
+        headers = [(TRACE_ID_HEADER.encode(), trace.trace_id.encode()), (b"traceparent", trace.traceparent().encode())]
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        profiler = None
+        thread_sessions: list = []
+        if self.profiles is not None and self.profiles.sample():
+            profiler = self.profiles.start()
+        previous = _trace.get(), _span.get(), _profiling.get()
+        _trace.set(trace)
+        _span.set(root)
+        _profiling.set((self.profiles, thread_sessions) if profiler is not None else None)
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            root.status = "error"
+            root.attributes["error"] = repr(e)
+            raise
+        finally:
+            root.end = time.perf_counter()
+            _trace.set(previous[0])
+            _span.set(previous[1])
+            _profiling.set(previous[2])
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+            if profiler is not None:
+                profiler = self._stop(profiler)
+            if profiler is not None or 0 < self.slow_seconds <= trace.duration:
+                # Rendering the flame graph and writing the files stays off the event loop
+                asyncio.get_running_loop().run_in_executor(None, self._finish, trace, profiler, thread_sessions)
+
+    @staticmethod
+    def _stop(profiler):
+        # On the loop thread that started it; None if it cannot be stopped cleanly
+        try:
+            profiler.stop()
+            return profiler
+        except Exception as e:  # never fail a request over diagnostics
+            logger.error(f"tracing: {e}")
+            return None
+
+    def _finish(self, trace: Trace, profiler, thread_sessions: list) -> None:
+        """Write the profile and the slow-request log; runs in the default executor"""
+        try:
+            if profiler is not None:
+                path = self.profiles.finish(trace, profiler, thread_sessions)
+                if path is not None:
+                    logger.info(f"profile for slow request {trace.root.name} written to {path}")
+            if self.slow_seconds > 0 and trace.duration >= self.slow_seconds:
+                logger.warning("slow request %s", json.dumps(trace.to_dict(), default=str))
+        except Exception as e:  # never fail a request over diagnostics
+            logger.error(f"tracing: {e}")
+
+
+def _profiled_in_thread(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        profiling = _profiling.get()
+        if profiling is None:
+            return endpoint(*args, **kwargs)
+        keeper, sessions = profiling
+        profiler = keeper.start_thread()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.stop()
+            sessions.append(profiler.last_session)
+
+    # FastAPI reads parameters from the signature; resolve string annotations
+    # against the endpoint's own module rather than this one
+    run.__signature__ = inspect.signature(endpoint, eval_str=True)
+    return run
+
+
+class TracedRoute(APIRoute):
+    """APIRoute whose sync endpoints join the request's profile from their worker thread"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = _profiled_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
@@ -0,0 +1,142 @@
+"""
+Per-user ordering and de-duplication of chat turns.
+
+Turns for one user run one at a time, in arrival order, so each turn's
+user/assistant messages land in history as a contiguous pair and the next
+turn sees the previous answer. A message identical to one already queued
+or running for the same user (a double-submit) does not start a second
+turn: it waits for the first one and shares its result.
+
+Async turns (the /chat and /chat/stream path) and sync turns (chat()) are
+coordinated separately; a process serves one or the other.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+class TurnAbandoned(RuntimeError):
+    """The turn a duplicate was waiting on ended without a reply (e.g. client disconnect)"""
+
+
+class TurnCoordinator:
+    """Per-user FIFO turn locks plus sharing of identical in-flight messages"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user_id -> [lock, holders + waiters]; dropped when the count reaches zero
+        self._async_users: Dict[str, List[Any]] = {}
+        self._sync_users: Dict[str, List[Any]] = {}
+        self._async_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._sync_inflight: Dict[Tuple[str, str], concurrent.futures.Future] = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(user_id: str, message: str) -> Tuple[str, str]:
+        return user_id, " ".join(message.split()).lower()
+
+    def _claim(self, inflight: Dict, key: Tuple[str, str], new_future: Callable[[], Any]) -> Tuple[Any, bool]:
+        with self._lock:
+            shared = inflight.get(key)
+            if shared is not None:
+                self.coalesced += 1
+                return shared, False
+            shared = inflight[key] = new_future()
+            return shared, True
+
+    def _release(self, inflight: Dict, key: Tuple[str, str], shared: Any, result: Any) -> None:
+        with self._lock:
+            if inflight.get(key) is shared:
+                del inflight[key]
+        if shared.done():
+            return
+        if result is None:
+            shared.set_exception(TurnAbandoned("turn ended without a reply"))
+            if isinstance(shared, asyncio.Future):
+                shared.exception()  # retrieved here so an unawaited failure is not logged
+        else:
+            shared.set_result(result)
+
+    # async turns
+
+    def begin(self, user_id: str, message: str) -> Tuple[asyncio.Future, bool]:
+        """(shared future, True if this caller runs the turn); call finish() when the leader is done"""
+        return self._claim(self._async_inflight, self._key(user_id, message),
+                           lambda: asyncio.get_running_loop().create_future())
+
+    def finish(self, user_id: str, message: str, shared: asyncio.Future, result: Any) -> None:
+        """Publish the leader's result (None if it produced none) to any duplicates"""
+        self._release(self._async_inflight, self._key(user_id, message), shared, result)
+
+    @asynccontextmanager
+    async def user_turn(self, user_id: str):
+        """Hold `user_id`'s turn; waiters are served in arrival order"""
+        with self._lock:
+            entry = self._async_users.get(user_id)
+            if entry is None:
+                entry = self._async_users[user_id] = [asyncio.Lock(), 0]
+            entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._async_users[user_id]
+
+    async def arun(self, user_id: str, message: str, turn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `turn` in order for the user, or share an identical in-flight one; returns (result, coalesced)"""
+        shared, leader = self.begin(user_id, message)
+        if not leader:
+            return await asyncio.shield(shared), True
+        result = None
+        try:
+            async with self.user_turn(user_id):
+                result = await turn()
+            return result, False
+        finally:
+            self.finish(user_id, message, shared, result)
+
+    # sync turns
+
+    @contextmanager
+    def sync_user_turn(self, user_id: str):
+        with self._lock:
+            entry = self._sync_users.get(user_id)
+            if entry is None:
+                entry = self._sync_users[user_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._sync_users[user_id]
+
+    def run(self, user_id: str, message: str, turn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Thread-based counterpart of arun()"""
+        key = self._key(user_id, message)
+        shared, leader = self._claim(self._sync_inflight, key, concurrent.futures.Future)
+        if not leader:
+            return shared.result(), True
+        result = None
+        try:
+            with self.sync_user_turn(user_id):
+                result = turn()
+            return result, False
+        finally:
+            self._release(self._sync_inflight, key, shared, result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users_waiting_or_running": len(self._async_users) + len(self._sync_users),
+                "in_flight_messages": len(self._async_inflight) + len(self._sync_inflight),
+                "coalesced": self.coalesced,
+            }